@@ -0,0 +1,306 @@
+import os
+import time
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+import cancellation
+import instrument
+from artifact import TimetableArtifact, archive_artifact, render_firestore
+from depart_model import TimetableScheduler
+from extract import decode_candidate_index, decode_one_hot
+from greedy import LOCAL_SEARCH, SOFT
+from lab_model import LabTimetableScheduler
+from publish import publish_document
+
+# ========== DIVERSE SOLUTION POOLS ==========
+# Offers the UI several different timetables from one run instead of a full
+# re-solve per "give me another one". A DiversePool solution callback sees
+# every timetable CP-SAT finds and keeps one only if it differs from each
+# timetable already kept in at least `min_distance` cells (Hamming distance
+# over the whole grid), stopping the search once `size` are kept.
+#
+# The pool is filled in two phases on a clone of the scheduler's model:
+#
+#   enumerate  one search with enumerate_all_solutions, filtered by the
+#              callback. Consecutive solutions of one search tend to differ
+#              in a few cells only, and enumeration runs without presolve,
+#              so this phase gets `enumerate_share` of the time budget.
+#   cuts       for whatever is still missing, re-solve with a "differ in at
+#              least min_distance cells" constraint per kept timetable; every
+#              solution found then qualifies. Each cut is one linear
+#              constraint over the Booleans that reproduce a kept cell.
+#
+# Soft schedulers (soft.py) draw from their last model without its
+# objective: alternatives only have to be valid, and after a relaxed solve
+# each relaxed limit may be exceeded by no more than in the offered
+# timetable. Local search (localsearch.py) has no model to draw from.
+#
+# The timetable already produced by the stage (greedy or CP-SAT) can be
+# passed as `seed`; it stays alternative 1 and the others keep their distance
+# from it. The pool is stored together: one artifact whose cells array has
+# shape (alternatives, rows, days, periods) (save_pool / pool_artifacts), and
+# one Firestore document holding every alternative (publish_pool).
+
+DEFAULT_DISTANCE = 0.2  # of the grid's cells, when min_distance is not given
+
+# lab.py / depart.py offer this many alternatives (0 = off) within this many seconds.
+ALTERNATIVES = int(os.environ.get("TIMETABLE_ALTERNATIVES", "0"))
+ALTERNATIVES_TIME = float(os.environ.get("TIMETABLE_ALTERNATIVES_TIME", "30"))
+
+
+def hamming(a, b):
+    """Number of cells in which two entry-id grids differ."""
+    return int(np.count_nonzero(np.asarray(a) != np.asarray(b)))
+
+
+class DiversePool(cp_model.CpSolverSolutionCallback):
+    """Solution callback keeping up to `size` timetables pairwise >= min_distance apart."""
+
+    def __init__(self, decode, size, min_distance, seeds=()):
+        super().__init__()
+        self.decode = decode
+        self.size = size
+        self.min_distance = min_distance
+        self.solutions = [np.asarray(cells) for cells in seeds]
+        self.seen = 0
+        self.rejected = 0
+
+    def accept(self, cells):
+        if len(self.solutions) >= self.size:
+            return False
+        if any(hamming(cells, kept) < self.min_distance for kept in self.solutions):
+            self.rejected += 1
+            return False
+        self.solutions.append(cells)
+        return True
+
+    @property
+    def full(self):
+        return len(self.solutions) >= self.size
+
+    def OnSolutionCallback(self):
+        self.seen += 1
+        self.accept(self.decode(np.asarray(self.Response().solution, dtype=np.int64)))
+        if self.full:
+            self.StopSearch()
+
+
+class _DepartmentPoolModel:
+    """Decoding and Hamming cuts for a department TimetableScheduler."""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        # Every candidate index of an entry id: a subject listed twice places the same entry.
+        self.positions = []
+        for year in scheduler.years:
+            positions = {}
+            for idx, (entry_id, _) in enumerate(scheduler.candidate_entries[year]):
+                positions.setdefault(entry_id, []).append(idx)
+            self.positions.append(positions)
+
+    def prepare(self, model):
+        """Soft schedulers: no objective, relaxed limits capped at the offered timetable's excess."""
+        s = self.scheduler
+        if s.engine != SOFT:
+            return
+        model.ClearObjective()
+        for rule in s.relaxed:
+            terms = s.penalties.get(rule)
+            if terms:
+                model.Add(sum(model.GetIntVarFromProtoIndex(var.Index()) for var in terms) <= s.breakdown[rule])
+
+    def decode(self, values):
+        s = self.scheduler
+        return decode_candidate_index(values, s.X_index, s.entry_table, fixed=s.block_cells)
+
+    def cells(self):
+        return int(np.asarray(self.scheduler.X_index).size)
+
+    def cut(self, cells, min_distance):
+        """
+        (Booleans, bound): sum(Booleans) <= bound forces >= min_distance cells
+        to differ from `cells`. A Boolean is true where a decision cell repeats
+        its value through any candidate index of that entry id (at most one
+        per cell holds); blocked cells never differ, so only decision cells count.
+        """
+        s = self.scheduler
+        literals = []
+        for (year, d, p) in s.X:
+            y = s.years.index(year)
+            for idx in self.positions[y].get(int(cells[y, d, p]), ()):
+                if (year, d, p, idx) in s.assign_bool:
+                    literals.append(s.assign_bool[(year, d, p, idx)])
+        return literals, len(s.X) - min_distance
+
+
+class _LabPoolModel:
+    """Decoding and Hamming cuts for a LabTimetableScheduler."""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    def decode(self, values):
+        s = self.scheduler
+        return decode_one_hot(values, s.timetable_index, s.entry_ids)[None]
+
+    def cells(self):
+        return len(self.scheduler.days) * len(self.scheduler.periods)
+
+    def prepare(self, model):
+        pass
+
+    def cut(self, cells, min_distance):
+        """
+        (Booleans, bound) over the placements of `cells`. A cell that stays
+        the same either keeps its class or was empty before, so giving up
+        min_distance placements moves at least min_distance cells.
+        """
+        s = self.scheduler
+        literals = []
+        for d, day in enumerate(s.days):
+            for p, period in enumerate(s.periods):
+                key = (day, period, int(cells[0, d, p]))
+                if key in s.timetable:
+                    literals.append(s.timetable[key])
+        return literals, len(literals) - min_distance
+
+
+def _pool_model(scheduler):
+    if isinstance(scheduler, LabTimetableScheduler):
+        return _LabPoolModel(scheduler)
+    if isinstance(scheduler, TimetableScheduler) and scheduler.engine != LOCAL_SEARCH:
+        return _DepartmentPoolModel(scheduler)
+    raise ValueError(f"No CP-SAT model to draw alternatives from for {type(scheduler).__name__}.")
+
+
+def _add_cut(model, pool_model, cells, min_distance):
+    literals, bound = pool_model.cut(cells, min_distance)
+    if literals:
+        model.Add(sum(model.GetBoolVarFromProtoIndex(var.Index()) for var in literals) <= bound)
+    elif bound < 0:
+        model.AddBoolOr([])  # nothing to move: no timetable is that far away
+
+
+def diverse_solutions(scheduler, size=5, min_distance=None, time_limit=30.0, enumerate_share=0.5, seed=None):
+    """
+    Up to `size` timetables (entry-id grids shaped like scheduler.cells),
+    pairwise at least `min_distance` cells apart; `seed` (e.g. the stage's own
+    solution) comes first. Fewer come back when the time runs out or no more
+    exist. The scheduler's own model is left untouched.
+    """
+    pool_model = _pool_model(scheduler)
+    if scheduler.model is None:
+        with instrument.span("build"):
+            scheduler.build_model()
+    if min_distance is None:
+        min_distance = max(1, int(DEFAULT_DISTANCE * pool_model.cells()))
+    seeds = [seed] if seed is not None else []
+    pool = DiversePool(pool_model.decode, size, min_distance, seeds)
+    deadline = time.perf_counter() + time_limit
+
+    exhausted = False
+    if enumerate_share > 0:
+        with instrument.span("pool_enumerate"):
+            solver = cp_model.CpSolver()
+            solver.parameters.enumerate_all_solutions = True
+            solver.parameters.max_time_in_seconds = time_limit * enumerate_share
+            with cancellation.stoppable(solver):
+                model = scheduler.model.Clone()
+                pool_model.prepare(model)
+                status = solver.Solve(model, pool)
+        # Enumeration only ends on its own once every solution has been seen.
+        exhausted = status in (cp_model.OPTIMAL, cp_model.INFEASIBLE) and not pool.full
+
+    with instrument.span("pool_cuts"):
+        model = scheduler.model.Clone()
+        pool_model.prepare(model)
+        cut = 0
+        while not pool.full and not exhausted:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            for cells in pool.solutions[cut:]:
+                _add_cut(model, pool_model, cells, min_distance)
+            cut = len(pool.solutions)
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = remaining
+            solver.parameters.random_seed = cut
+            kept = len(pool.solutions)
+            with cancellation.stoppable(solver):
+                solver.Solve(model, pool)
+            if len(pool.solutions) == kept:
+                break  # no timetable that far from all the others, or out of time
+    print(f"Solution pool: {len(pool.solutions)}/{size} timetables at least {min_distance} cells apart "
+          f"({pool.seen} solutions seen, {pool.rejected} too similar).")
+    return pool.solutions
+
+
+def distances(solutions):
+    """Pairwise Hamming distance matrix of a pool."""
+    flat = np.asarray(solutions).reshape(len(solutions), -1)
+    return (flat[:, None, :] != flat[None, :, :]).sum(axis=-1)
+
+
+def save_pool(scheduler, solutions, stage):
+    """
+    Archives the pool as one artifact, cells (alternatives, rows, days,
+    periods), named pool-<stage>-<timestamp>.tta so it never passes for the
+    stage's own solve (freeslots.latest_artifact globs <stage>-*). Returns the path.
+    """
+    base = scheduler.to_artifact()
+    artifact = TimetableArtifact(
+        np.stack([np.asarray(cells) for cells in solutions]), base.registry, base.rows, base.days, base.periods,
+        cell_format=base.cell_format, meta={"alternatives": len(solutions)},
+    )
+    return archive_artifact(artifact, f"pool-{stage}")
+
+
+def pool_artifacts(artifact):
+    """Splits a pool artifact into one TimetableArtifact per alternative."""
+    return [
+        TimetableArtifact(cells, artifact.registry, artifact.rows, artifact.days, artifact.periods,
+                          cell_format=artifact.cell_format)
+        for cells in np.asarray(artifact.cells)
+    ]
+
+
+def pool_payload(scheduler, solutions):
+    """
+    One document holding every alternative, numbered from "1":
+    {"count", "min_distance", "1": <labsolution or generaltimetable layout>, ...}.
+    """
+    base = scheduler.to_artifact()
+    matrix = distances(solutions)
+    payload = {
+        "count": len(solutions),
+        "min_distance": int(matrix[np.triu_indices(len(solutions), 1)].min()) if len(solutions) > 1 else 0,
+    }
+    for i, cells in enumerate(solutions, start=1):
+        payload[str(i)] = render_firestore(TimetableArtifact(
+            np.asarray(cells), base.registry, base.rows, base.days, base.periods,
+            cell_format=base.cell_format,
+        ))
+    return payload
+
+
+def publish_pool(db, scheduler, solutions, path, manifest=None):
+    """Writes the pool document at `path` (see departments.Department.alternatives_path)."""
+    return publish_document(db, path, pool_payload(scheduler, solutions), manifest)
+
+
+def offer_alternatives(db, scheduler, stage, department, size=ALTERNATIVES, time_limit=ALTERNATIVES_TIME,
+                       manifest=None):
+    """
+    Stage hook: a pool seeded with the scheduler's published timetable,
+    archived and written to department.alternatives_path(stage). Returns the
+    pool, or None when the scheduler has no CP-SAT model (local search).
+    """
+    try:
+        solutions = diverse_solutions(scheduler, size, time_limit=time_limit, seed=scheduler.cells)
+    except ValueError as e:
+        print(f"No alternatives: {e}")
+        return None
+    print(f"Archived alternatives to {save_pool(scheduler, solutions, stage)}")
+    publish_pool(db, scheduler, solutions, department.alternatives_path(stage), manifest)
+    return solutions
@@ -0,0 +1,224 @@
+import json
+import os
+import struct
+from datetime import datetime
+
+import numpy as np
+
+from csvio import write_table
+from registry import Registry
+
+# ========== BINARY TIMETABLE ARTIFACT ==========
+# One file per solve:
+#
+#   b"TTA1" | uint32 header length | JSON header | padding | raw arrays
+#
+# The JSON header carries the day/period/row labels, the registry name
+# tables and, for every array, its dtype, shape and byte offset. Arrays are
+# 64-byte aligned so load_artifact() can hand them out as np.memmap views
+# without reading the file. CSV and Firestore renderings are produced from
+# the artifact on demand (render_csv / render_firestore).
+#
+# `cells` has shape (rows, days, periods) and holds registry entry ids.
+# Rows are the years for the department stage and a single "Lab" row for
+# the lab stage; `cell_format` says which string form to render.
+
+MAGIC = b"TTA1"
+ALIGN = 64
+VERSION = 1
+
+LAB_FORMAT = "lab"      # "1st Year_C++ Lab"
+FINAL_FORMAT = "final"  # "c++ Lab (geetha)"
+
+ARTIFACT_DIR = "timetable_artifacts"
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class TimetableArtifact:
+    """A solved timetable: entry-id cells plus the registry that names them."""
+
+    def __init__(self, cells, registry, rows, days, periods, cell_format=FINAL_FORMAT, meta=None):
+        self.cells = cells
+        self.registry = registry
+        self.rows = list(rows)
+        self.days = list(days)
+        self.periods = list(periods)
+        self.cell_format = cell_format
+        self.meta = meta or {}
+
+    def subject_ids(self):
+        """(rows, days, periods) array of subject ids."""
+        return self.registry.subject_of()[self.cells]
+
+    def teacher_ids(self):
+        """(rows, days, periods) array of teacher ids (0 = no teacher)."""
+        return self.registry.teacher_of()[self.cells]
+
+    def render(self, eid):
+        if self.cell_format == LAB_FORMAT:
+            return self.registry.render_lab_cell(int(eid))
+        return self.registry.render_cell(int(eid))
+
+    def row_table(self, row):
+        """Rendered [[cell, ...], ...] (days x periods) for one row label."""
+        r = self.rows.index(row)
+        rendered = {int(eid): self.render(eid) for eid in np.unique(self.cells[r])}
+        return [[rendered[eid] for eid in day] for day in self.cells[r].tolist()]
+
+
+# ========== WRITE ==========
+
+def save_artifact(artifact, path):
+    """Writes `artifact` to `path` in the TTA1 layout. Returns the path."""
+    names, entries = artifact.registry.to_tables()
+    arrays = {
+        "cells": np.ascontiguousarray(artifact.cells, dtype=np.int32),
+        "entries": np.ascontiguousarray(entries, dtype=np.int32),
+    }
+
+    specs = {}
+    offset = 0
+    for name, arr in arrays.items():
+        specs[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset = _align(offset + arr.nbytes)
+
+    header = json.dumps({
+        "version": VERSION,
+        "rows": artifact.rows,
+        "days": artifact.days,
+        "periods": artifact.periods,
+        "cell_format": artifact.cell_format,
+        "meta": artifact.meta,
+        "names": names,
+        "arrays": specs,
+    }).encode("utf-8")
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, arr in arrays.items():
+            f.seek(data_start + specs[name]["offset"])
+            f.write(arr.tobytes())
+    return path
+
+
+def archive_artifact(artifact, stage, output_dir=ARTIFACT_DIR):
+    """Saves under timetable_artifacts/<stage>-<timestamp>.tta and returns the path."""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    artifact.meta.setdefault("stage", stage)
+    artifact.meta.setdefault("created", stamp)
+    return save_artifact(artifact, os.path.join(output_dir, f"{stage}-{stamp}.tta"))
+
+
+# ========== READ ==========
+
+def read_header(path):
+    """Returns (header dict, data start offset) without touching the arrays."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a timetable artifact")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length).decode("utf-8"))
+    return header, _align(len(MAGIC) + 4 + length)
+
+
+def load_artifact(path, mmap=True):
+    """
+    Loads an artifact. With mmap=True the cell array is a read-only
+    np.memmap, so opening many archived runs for comparison is cheap.
+    """
+    header, data_start = read_header(path)
+    if header["version"] != VERSION:
+        raise ValueError(f"Unsupported artifact version {header['version']} in {path}")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        if mmap and int(np.prod(shape)):
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + spec["offset"], shape=shape)
+        else:
+            with open(path, "rb") as f:
+                f.seek(data_start + spec["offset"])
+                count = int(np.prod(shape))
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+
+    registry = Registry.from_tables(header["names"], np.asarray(arrays["entries"]))
+    return TimetableArtifact(
+        arrays["cells"], registry, header["rows"], header["days"], header["periods"],
+        cell_format=header["cell_format"], meta=header.get("meta"),
+    )
+
+
+# ========== RENDER ON DEMAND ==========
+
+def render_csv(artifact, output_dir, suffix="_final"):
+    """Writes one CSV per row (year) in the Final_Yearly_Timetables layout."""
+    return [
+        write_table(
+            os.path.join(output_dir, f"{row.replace(' ', '_')}{suffix}.csv"),
+            artifact.row_table(row), artifact.periods, artifact.days,
+        )
+        for row in artifact.rows
+    ]
+
+
+def render_firestore(artifact):
+    """
+    Builds Firestore payloads from the artifact.
+    Lab artifacts give the labsolution layout {day: {period: cell}};
+    department artifacts give the generaltimetable layout
+    {year: [{"dayName", "periods": [{"periodName", "subject", "teacher"}]}]}.
+    """
+    if artifact.cell_format == LAB_FORMAT:
+        table = artifact.row_table(artifact.rows[0])
+        return {
+            day: dict(zip(artifact.periods, cells))
+            for day, cells in zip(artifact.days, table)
+        }
+
+    registry = artifact.registry
+    doc = {}
+    for r, row in enumerate(artifact.rows):
+        day_list = []
+        for d, day in enumerate(artifact.days):
+            period_list = []
+            for p, period in enumerate(artifact.periods):
+                eid = int(artifact.cells[r, d, p])
+                teacher = registry.teacher_name(eid)
+                period_list.append({
+                    "periodName": period,
+                    "subject": registry.subject_name(eid),
+                    "teacher": teacher if teacher is not None else "",
+                })
+            day_list.append({"dayName": day, "periods": period_list})
+        doc[row] = day_list
+    return doc
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render a timetable artifact (.tta) to CSV or Firestore JSON.")
+    parser.add_argument("path")
+    parser.add_argument("--csv", metavar="DIR", help="write one CSV per year into DIR")
+    parser.add_argument("--json", action="store_true", help="print the Firestore payload as JSON")
+    args = parser.parse_args()
+
+    artifact = load_artifact(args.path)
+    if args.csv:
+        for path in render_csv(artifact, args.csv):
+            print(f"Saved {path} successfully.")
+    if args.json or not args.csv:
+        print(json.dumps(render_firestore(artifact), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+
+from grid import DAYS, PERIODS
+
+# ========== TEACHER AVAILABILITY ==========
+# Stored per teacher as the slots they can NOT teach, either as
+#
+#   {"kaliraj": {"Day 3": [4, 5]}}                  day label -> periods (1-based
+#                                                   numbers or "Period N" labels),
+#                                                   a comma-separated string such
+#                                                   as "4, 5", or "all" / "*"
+#   {"kaliraj": 1572864}                            bitmask, bit d * P + p set
+#                                                   when unavailable
+#
+# in the /depart_request/availability document or a JSON file. In memory it
+# becomes {teacher: (days, periods) bool array, True = available}; teachers
+# not listed are available everywhere.
+
+
+def to_bitmask(available):
+    """(days, periods) availability array -> int with a bit set per unavailable slot."""
+    bits = np.flatnonzero(~np.asarray(available, dtype=bool).ravel())
+    return sum(1 << int(b) for b in bits)
+
+
+def from_bitmask(mask, num_days, num_periods):
+    unavailable = [(mask >> b) & 1 for b in range(num_days * num_periods)]
+    return ~np.array(unavailable, dtype=bool).reshape(num_days, num_periods)
+
+
+def _period_index(period, periods):
+    if isinstance(period, int):
+        return period - 1
+    if period in periods:
+        return periods.index(period)
+    try:
+        return int(str(period).split()[-1]) - 1
+    except (ValueError, IndexError):
+        raise ValueError(f"Unknown period {period!r}; expected a number or one of {periods}") from None
+
+
+def _split_periods(day_periods):
+    """A day's periods as a list; strings are comma-separated ("4, 5", "Period 4,Period 5")."""
+    if isinstance(day_periods, str):
+        return [part.strip() for part in day_periods.split(",") if part.strip()]
+    if isinstance(day_periods, int):
+        return [day_periods]
+    return day_periods
+
+
+def parse_availability(data, days=DAYS, periods=PERIODS):
+    """Stored form (see module comment) -> {teacher: (days, periods) bool array}."""
+    days, periods = list(days), list(periods)
+    availability = {}
+    for teacher, blocked in (data or {}).items():
+        if isinstance(blocked, int):
+            availability[teacher] = from_bitmask(blocked, len(days), len(periods))
+            continue
+        available = np.ones((len(days), len(periods)), dtype=bool)
+        for day, day_periods in blocked.items():
+            if day not in days:
+                continue
+            d = days.index(day)
+            if day_periods in ("all", "*"):
+                available[d, :] = False
+                continue
+            for period in _split_periods(day_periods):
+                p = _period_index(period, periods)
+                if 0 <= p < len(periods):
+                    available[d, p] = False
+        availability[teacher] = available
+    return availability
+
+
+def serialize_availability(availability, days=DAYS, periods=PERIODS):
+    """{teacher: bool array} -> {teacher: {day: [period numbers]}} for storage."""
+    data = {}
+    for teacher, available in availability.items():
+        blocked = {}
+        for d, p in zip(*np.nonzero(~available)):
+            blocked.setdefault(days[d], []).append(int(p) + 1)
+        if blocked:
+            data[teacher] = blocked
+    return data
+
+
+def load_availability(path, days=DAYS, periods=PERIODS):
+    with open(path, encoding="utf-8") as f:
+        return parse_availability(json.load(f), days, periods)
+
+
+def save_availability(availability, path, days=DAYS, periods=PERIODS):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(serialize_availability(availability, days, periods), f, indent=2)
+    return path
+
+
+def fetch_availability(db, days=DAYS, periods=PERIODS):
+    """Reads /depart_request/availability; an absent document means everyone is available."""
+    doc = db.collection("depart_request").document("availability").get()
+    if not doc.exists:
+        return {}
+    return parse_availability(doc.to_dict(), days, periods)
+
+
+def teacher_masks(availability, registry, num_days, num_periods):
+    """
+    (teachers, days, periods) bool array indexed by registry teacher id, so a
+    whole candidate list can be looked up at once with teacher_of[entry_ids].
+    """
+    masks = np.ones((len(registry.teachers), num_days, num_periods), dtype=bool)
+    for teacher, available in (availability or {}).items():
+        if teacher in registry.teachers:
+            masks[registry.teachers.id(teacher)] = available[:num_days, :num_periods]
+    return masks
@@ -0,0 +1,150 @@
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from departments import Department
+from worker import _db, warm_up
+
+# ========== MULTI-DEPARTMENT BATCH RUNS ==========
+# Regenerates a whole college: each department's lab -> general -> depart
+# pipeline runs as one task on a process pool (the worker.py warm-up pays
+# the ortools/NumPy imports once per process), reading and writing that
+# department's Firestore paths (departments.py).
+#
+# The stages keep their local outputs (final_schedules/, timetable_artifacts/,
+# publish_manifest.json, ...) in the working directory, so each department
+# runs in its own directory, <workdir>/<academic year>_<department>/, with
+# its stage output in run.log there. Departments are independent; one that
+# fails stops at that stage and the others carry on.
+#
+#   python batch.py BCA BSc BCom --academic-year 2025 --workers 4
+#
+# The throughput report (printed, and written with --report) gives
+# departments per minute over the whole batch and the mean / max time of
+# each stage, plus the summed department time so the parallel speed-up is
+# visible.
+
+STAGES = ("lab", "general", "depart")
+DEFAULT_WORKDIR = "departments"
+LOG_FILE = "run.log"
+
+
+def run_department(name, academic_year, workdir=DEFAULT_WORKDIR, stages=STAGES):
+    """
+    Pool task: runs one department's stages in its own directory.
+    Returns {"department", "academic_year", "ok", "failed_stage", "error",
+    "stages": {stage: seconds}, "seconds", "directory"}.
+    """
+    department = Department(name, academic_year)
+    db = _db()  # before chdir: the service account key path is relative
+    directory = os.path.join(os.path.abspath(workdir), department.slug)
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    record = {"department": department.name, "academic_year": department.academic_year, "ok": True,
+              "failed_stage": None, "error": None, "stages": {}, "directory": directory}
+    start = time.perf_counter()
+    with open(LOG_FILE, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        for stage in stages:
+            stage_start = time.perf_counter()
+            try:
+                result = importlib.import_module(stage).run(db, department=department)
+            except Exception as e:
+                traceback.print_exc(file=log)
+                record["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+                result = None
+            record["stages"][stage] = time.perf_counter() - stage_start
+            if result is None:
+                record.update(ok=False, failed_stage=stage)
+                break
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def throughput_report(records, wall_seconds, workers, academic_year, stages=STAGES):
+    """Batch summary: departments per minute and per-stage timings."""
+    per_stage = {}
+    for stage in stages:
+        times = [r["stages"][stage] for r in records if stage in r["stages"]]
+        if times:
+            per_stage[stage] = {"runs": len(times), "mean_seconds": sum(times) / len(times),
+                                "max_seconds": max(times), "total_seconds": sum(times)}
+    busy = sum(r["seconds"] for r in records)
+    return {
+        "academic_year": academic_year,
+        "workers": workers,
+        "departments": len(records),
+        "succeeded": sum(r["ok"] for r in records),
+        "failed": {r["department"]: r["failed_stage"] for r in records if not r["ok"]},
+        "wall_seconds": wall_seconds,
+        "departments_per_minute": len(records) * 60.0 / wall_seconds if wall_seconds > 0 else 0.0,
+        "department_seconds": busy,
+        "speedup": busy / wall_seconds if wall_seconds > 0 else 0.0,
+        "stages": per_stage,
+        "records": sorted(records, key=lambda r: r["department"]),
+    }
+
+
+def format_report(report):
+    lines = [
+        f"{report['departments']} departments ({report['academic_year']}) in {report['wall_seconds']:.2f}s "
+        f"on {report['workers']} workers: {report['departments_per_minute']:.1f} departments/min, "
+        f"{report['speedup']:.2f}x over running them one after another",
+    ]
+    for stage, t in report["stages"].items():
+        lines.append(f"  {stage:<8} mean {t['mean_seconds']:.3f}s  max {t['max_seconds']:.3f}s  ({t['runs']} runs)")
+    for r in report["records"]:
+        status = "ok" if r["ok"] else f"failed at {r['failed_stage']}" + (f": {r['error']}" if r["error"] else "")
+        lines.append(f"  {r['department']:<10} {r['seconds']:.2f}s  {status}")
+    return "\n".join(lines)
+
+
+def run_batch(departments, academic_year, workers=None, workdir=DEFAULT_WORKDIR, stages=STAGES, init_firebase=True):
+    """
+    Runs every department's pipeline on a pool of `workers` processes (default:
+    one per CPU, at most one per department). Returns throughput_report().
+    """
+    departments = list(dict.fromkeys(departments))
+    workdir = os.path.abspath(workdir)  # pool processes chdir into department directories
+    workers = max(1, min(workers or os.cpu_count() or 1, len(departments) or 1))
+    records = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_up, initargs=(init_firebase,)) as pool:
+        futures = {pool.submit(run_department, name, academic_year, workdir, stages): name for name in departments}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"department": name, "academic_year": str(academic_year), "ok": False,
+                          "failed_stage": None, "error": str(e), "stages": {}, "seconds": 0.0, "directory": None}
+            records.append(record)
+            print(f"{'✅' if record['ok'] else '❌'} {name} done in {record['seconds']:.2f}s")
+    return throughput_report(records, time.perf_counter() - start, workers, str(academic_year), stages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schedule several departments at once on a process pool.")
+    parser.add_argument("departments", nargs="+", help="department names, e.g. BCA BSc BCom")
+    parser.add_argument("--academic-year", default=Department().academic_year)
+    parser.add_argument("--workers", type=int, default=None, help="pool processes (default: CPU count)")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="parent of the per-department directories")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--report", help="write the throughput report as JSON here")
+    args = parser.parse_args()
+
+    report = run_batch(args.departments, args.academic_year, args.workers, args.workdir,
+                       tuple(stage for stage in STAGES if stage in args.stages))
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["succeeded"] == report["departments"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
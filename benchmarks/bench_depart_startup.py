@@ -0,0 +1,139 @@
+"""
+Cold-start benchmark for the department stage's file I/O.
+
+Each sample is a fresh interpreter that imports depart.py, solves a small
+department greedily (not timed as I/O) and then does what the stage does
+with the yearly CSVs: read the final_schedules/*.csv labels and write the
+three Final_Yearly_Timetables/*_final.csv files.
+
+  before  - pandas.read_csv / DataFrame.to_csv of the same cells (the old path)
+  after   - depart.load_day_period_labels / depart.save_final_timetables
+            (csvio + export.CsvSink, the code the stage runs)
+
+Two numbers per variant: the whole interpreter run and the I/O section
+alone. The whole run sits on an ortools import floor: depart.py imports
+ortools, and recent ortools releases import pandas themselves, so pandas'
+own import cost is paid either way and the cold-start saving is far smaller
+than a pandas-free interpreter would suggest. The I/O column is the part
+the csvio/CsvSink path actually removes. depart.py also imports
+firebase_admin, so run this where the stage's requirements are installed.
+
+Usage:
+    python benchmarks/bench_depart_startup.py [--repeat 15] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+YEARS = ["1st Year", "2nd Year", "3rd Year"]
+PERIODS = [f"Period {p}" for p in range(1, 6)]
+DAYS = [f"Day {d}" for d in range(1, 7)]
+
+SETUP = """
+import os, sys, time
+sys.path.insert(0, {root!r})
+import depart
+from depart_model import TimetableScheduler
+from greedy import solve_department_fast
+candidates = {{
+    year: [("c++", 5, f"geetha{{y}}"), ("c++ Lab", 6, f"geetha{{y}}"), ("VE", 2, f"suganthi{{y}}"),
+           ("Tamil", 6, None), ("English", 6, None), ("Maths", 5, None)]
+    for y, year in enumerate({years!r})
+}}
+scheduler = TimetableScheduler(candidates, rules=[])
+assert solve_department_fast(scheduler) is not None
+"""
+
+BEFORE = SETUP + """
+import pandas as pd
+start = time.perf_counter()
+labels = {{}}
+for year in {years!r}:
+    df = pd.read_csv(os.path.join("final_schedules", year.replace(" ", "_") + ".csv"), index_col=0)
+    labels[year] = (list(df.index), list(df.columns))
+days, periods = labels["1st Year"]
+os.makedirs("Final_Yearly_Timetables", exist_ok=True)
+rows = {{}}
+for year, _, day, period, cell in scheduler.iter_cells():
+    rows.setdefault(year, {{}}).setdefault(day, []).append(cell)
+for year, table in rows.items():
+    pd.DataFrame(list(table.values()), columns=periods, index=days).to_csv(
+        os.path.join("Final_Yearly_Timetables", year.replace(" ", "_") + "_final.csv"))
+print(time.perf_counter() - start)
+"""
+
+AFTER = SETUP + """
+start = time.perf_counter()
+days, periods = depart.load_day_period_labels()
+depart.save_final_timetables(scheduler)
+print(time.perf_counter() - start)
+"""
+
+
+
+def make_inputs(workdir):
+    os.makedirs(os.path.join(workdir, "final_schedules"), exist_ok=True)
+    for year in YEARS:
+        path = os.path.join(workdir, "final_schedules", year.replace(" ", "_") + ".csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(",".join(["Day/Period"] + PERIODS) + "\n")
+            for day in DAYS:
+                f.write(",".join([day] + ["Empty"] * len(PERIODS)) + "\n")
+
+
+def time_script(source, workdir, repeat):
+    """Runs `source` in fresh interpreters; its last stdout line is the I/O time."""
+    total, io = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", source], cwd=workdir, check=True,
+                             capture_output=True, text=True).stdout
+        total.append(time.perf_counter() - start)
+        io.append(float(out.strip().splitlines()[-1]))
+    return {
+        "median_s": statistics.median(total),
+        "min_s": min(total),
+        "max_s": max(total),
+        "io_median_s": statistics.median(io),
+        "repeat": repeat,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args()
+
+    variants = {
+        "before": BEFORE.format(root=REPO_ROOT, years=YEARS),
+        "after": AFTER.format(root=REPO_ROOT, years=YEARS),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        make_inputs(workdir)
+        for name, source in variants.items():
+            results[name] = time_script(source, workdir, args.repeat)
+            r = results[name]
+            print(f"{name:>8}: median {r['median_s'] * 1000:8.1f} ms "
+                  f"(min {r['min_s'] * 1000:.1f}, max {r['max_s'] * 1000:.1f}), "
+                  f"I/O {r['io_median_s'] * 1000:.1f} ms")
+
+    saved = results["before"]["median_s"] - results["after"]["median_s"]
+    saved_io = results["before"]["io_median_s"] - results["after"]["io_median_s"]
+    print(f"saved: {saved * 1000:.1f} ms per cold start (ortools import included), {saved_io * 1000:.1f} ms of I/O")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Microbenchmark: per-cell solver.Value() extraction vs bulk NumPy decoding.
+
+Builds a lab-style model for N sections (each section a one-hot Boolean per
+day/period/class, with the same count / once-per-day / one-class-per-slot
+rules as lab.py), solves it once, then times both ways of reading the answer:
+
+  loop  - nested Python loops calling solver.Value() until a class matches
+  bulk  - extract.solution_values() + extract.decode_one_hot()
+
+Usage:
+    python benchmarks/bench_extraction.py [--sections 20 40 80] [--repeat 5] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from extract import decode_one_hot, solution_values, var_indices
+
+NUM_DAYS = 6
+NUM_PERIODS = 5
+CLASS_COUNTS = [5, 2, 5, 4, 6]  # the lab.py sample load per section
+
+
+def build(num_sections):
+    model = cp_model.CpModel()
+    variables = {}
+    for s in range(num_sections):
+        for d in range(NUM_DAYS):
+            for p in range(NUM_PERIODS):
+                for c in range(len(CLASS_COUNTS)):
+                    variables[(s, d, p, c)] = model.NewBoolVar(f"s{s}_d{d}_p{p}_c{c}")
+        for c, count in enumerate(CLASS_COUNTS):
+            model.Add(sum(variables[(s, d, p, c)] for d in range(NUM_DAYS) for p in range(NUM_PERIODS)) == count)
+            for d in range(NUM_DAYS):
+                model.Add(sum(variables[(s, d, p, c)] for p in range(NUM_PERIODS)) <= 1)
+        for d in range(NUM_DAYS):
+            for p in range(NUM_PERIODS):
+                model.Add(sum(variables[(s, d, p, c)] for c in range(len(CLASS_COUNTS))) <= 1)
+    index = var_indices(
+        [variables[(s, d, p, c)]
+         for s in range(num_sections) for d in range(NUM_DAYS)
+         for p in range(NUM_PERIODS) for c in range(len(CLASS_COUNTS))],
+        (num_sections, NUM_DAYS, NUM_PERIODS, len(CLASS_COUNTS)),
+    )
+    return model, variables, index
+
+
+def extract_loop(solver, variables, num_sections):
+    cells = np.zeros((num_sections, NUM_DAYS, NUM_PERIODS), dtype=np.int32)
+    for s in range(num_sections):
+        for d in range(NUM_DAYS):
+            for p in range(NUM_PERIODS):
+                for c in range(len(CLASS_COUNTS)):
+                    if solver.Value(variables[(s, d, p, c)]):
+                        cells[s, d, p] = c + 1
+                        break
+    return cells
+
+
+def extract_bulk(solver, index):
+    return decode_one_hot(solution_values(solver), index, np.arange(1, len(CLASS_COUNTS) + 1))
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", type=int, nargs="+", default=[20, 40, 80])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for num_sections in args.sections:
+        model, variables, index = build(num_sections)
+        solver = cp_model.CpSolver()
+        solver.parameters.num_workers = 8
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            print(f"{num_sections} sections: no solution ({solver.StatusName(status)})")
+            continue
+        loop_cells, loop_s = timed(lambda: extract_loop(solver, variables, num_sections), args.repeat)
+        bulk_cells, bulk_s = timed(lambda: extract_bulk(solver, index), args.repeat)
+        assert (loop_cells == bulk_cells).all(), "bulk decoding disagrees with solver.Value()"
+        results.append({
+            "sections": num_sections,
+            "variables": len(variables),
+            "solve_s": solver.WallTime(),
+            "loop_s": loop_s,
+            "bulk_s": bulk_s,
+            "speedup": loop_s / bulk_s if bulk_s else None,
+        })
+        print(f"{num_sections:4d} sections, {len(variables):6d} vars: loop {loop_s * 1000:8.2f} ms, "
+              f"bulk {bulk_s * 1000:6.2f} ms ({loop_s / bulk_s:.0f}x), solve {solver.WallTime():.2f} s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
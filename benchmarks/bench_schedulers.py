@@ -0,0 +1,208 @@
+"""
+Benchmark suite for the lab, general and department stages.
+
+For every instance size it generates a seeded synthetic instance
+(instances.generate_instance) and times each stage's phases:
+
+  lab      build (LabTimetableScheduler.build_model), solve, export (CSV)
+  general  build (lab grid + year split), solve (fill extra subjects), export (CSV)
+  depart   build (TimetableScheduler.build_model), solve, export (CSV)
+  local    solve (localsearch.LocalSearchScheduler from a random start), export
+           (CSV); opt-in with --stages ... local
+
+One JSON object per (instance, stage) is appended to the results file
+(JSON lines), so runs from different commits can be compared directly. Lab
+and depart records carry a "model_report" (modelstats.report) with the
+model size per constraint family, year and teacher; every solved stage
+carries "violations" (validate.py, by rule; empty when valid).
+
+Usage:
+    python benchmarks/bench_schedulers.py [--sizes small medium] [--seeds 0 1]
+                                          [--time-limit 30] [--out bench_results.jsonl]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from ortools.sat.python import cp_model
+
+from depart_model import TimetableScheduler
+from export import CsvSink, export_cells, iter_grid_cells
+from grid import fill_extra_subjects_grid, schedule_to_grid, split_by_year
+from instances import generate_instance
+from lab_model import LabTimetableScheduler
+from localsearch import LocalSearchScheduler
+from validate import check_department, check_general, check_lab
+from registry import DEFAULT_SECTION, Registry
+
+SIZES = {
+    "small": dict(years=3, sections=1, teachers=8),
+    "medium": dict(years=3, sections=2, teachers=14, shared_teacher_density=0.4),
+    "large": dict(years=3, sections=4, teachers=28, shared_teacher_density=0.4),
+    "xlarge": dict(years=5, sections=6, teachers=60, shared_teacher_density=0.5),
+}
+
+
+class Timer:
+    def __init__(self):
+        self.phases = {}
+
+    def __call__(self, name):
+        timer = self
+
+        class _Span:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                timer.phases[f"{name}_s"] = time.perf_counter() - self.start
+
+        return _Span()
+
+
+def make_solver(time_limit, workers):
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = workers
+    return solver
+
+
+def model_size(model):
+    proto = model.Proto()
+    return {"variables": len(proto.variables), "constraints": len(proto.constraints)}
+
+
+def bench_lab(instance, workdir, solver):
+    timer = Timer()
+    with timer("build"):
+        scheduler = LabTimetableScheduler(instance["lab_classes"], days=instance["days"])
+        scheduler.build_model()
+    with timer("solve"):
+        solution = scheduler.solve(solver)
+    with timer("export"):
+        if solution is not None:
+            cells = iter_grid_cells(
+                scheduler.cells, ["Lab"], scheduler.days, scheduler.period_labels(),
+                scheduler.registry.render_lab_cell,
+            )
+            export_cells(cells, CsvSink(os.path.join(workdir, "lab")))
+    record = dict(timer.phases, status=solver.StatusName(scheduler.status), **model_size(scheduler.model))
+    record["model_report"] = scheduler.model_report()
+    if solution is not None:
+        record["violations"] = check_lab(scheduler, scheduler.cells).by_rule()
+    return record, solution
+
+
+def bench_general(instance, lab_solution, workdir):
+    timer = Timer()
+    registry = Registry(instance["years"])
+    with timer("build"):
+        lab_grid, days, periods = schedule_to_grid(lab_solution, registry)
+        year_grids = split_by_year(lab_grid, registry)
+    with timer("solve"):
+        for y, year in enumerate(instance["years"]):
+            extra = [(registry.entry(year, DEFAULT_SECTION, subject), count)
+                     for subject, count in instance["extra_subjects"].get(year, {}).items()]
+            fill_extra_subjects_grid(year_grids[:, :, y], extra)
+    with timer("export"):
+        names = registry.subject_names()
+        cells = iter_grid_cells(year_grids.transpose(2, 0, 1), instance["years"], days, periods, lambda eid: names[eid])
+        export_cells(cells, CsvSink(os.path.join(workdir, "general")))
+    report = check_general(year_grids, registry, instance["extra_subjects"], days, periods, instance["years"])
+    return dict(timer.phases, status="OK", cells=int(year_grids.size), violations=report.by_rule())
+
+
+def bench_depart(instance, workdir, solver):
+    timer = Timer()
+    with timer("build"):
+        scheduler = TimetableScheduler(
+            instance["candidates"], instance["days"], instance["periods"], instance["rows"]
+        )
+        scheduler.build_model()
+    with timer("solve"):
+        solution = scheduler.solve(solver)
+    with timer("export"):
+        if solution is not None:
+            export_cells(scheduler.iter_cells(), CsvSink(os.path.join(workdir, "depart")))
+    record = dict(timer.phases, status=solver.StatusName(scheduler.status), **model_size(scheduler.model))
+    record["model_report"] = scheduler.model_report()
+    if solution is not None:
+        record["violations"] = check_department(scheduler, scheduler.cells).by_rule()
+    return record
+
+
+def bench_local(instance, workdir, time_limit, seed):
+    timer = Timer()
+    with timer("solve"):
+        scheduler = LocalSearchScheduler(
+            instance["candidates"], instance["days"], instance["periods"], instance["rows"],
+            time_limit=time_limit, seed=seed, initial="random",
+        )
+        solution = scheduler.solve()
+    with timer("export"):
+        if solution is not None:
+            export_cells(scheduler.iter_cells(), CsvSink(os.path.join(workdir, "local")))
+    record = dict(timer.phases, status="FEASIBLE" if solution is not None else "UNKNOWN",
+                  iterations=scheduler.iterations, penalty=scheduler.penalty)
+    if solution is not None:
+        record["violations"] = check_department(scheduler, scheduler.cells).by_rule()
+    return record
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium"], choices=sorted(SIZES))
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--stages", nargs="+", default=["lab", "general", "depart"])
+    parser.add_argument("--time-limit", type=float, default=30.0, help="CP-SAT / local-search limit per solve, seconds")
+    parser.add_argument("--workers", type=int, default=8, help="CP-SAT search workers")
+    parser.add_argument("--out", default="bench_results.jsonl")
+    args = parser.parse_args()
+
+    common = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "run_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(args.out, "a", encoding="utf-8") as out, tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            for seed in args.seeds:
+                instance = generate_instance(seed=seed, **SIZES[size])
+                base = dict(common, size=size, seed=seed, params=instance["params"])
+                lab_record, lab_solution = bench_lab(instance, workdir, make_solver(args.time_limit, args.workers))
+                records = {"lab": lab_record}
+                if "general" in args.stages and lab_solution is not None:
+                    records["general"] = bench_general(instance, lab_solution, workdir)
+                if "depart" in args.stages:
+                    records["depart"] = bench_depart(instance, workdir, make_solver(args.time_limit, args.workers))
+                if "local" in args.stages:
+                    records["local"] = bench_local(instance, workdir, args.time_limit, seed)
+                for stage, record in records.items():
+                    if stage not in args.stages:
+                        continue
+                    out.write(json.dumps(dict(base, stage=stage, **record)) + "\n")
+                    phases = "  ".join(f"{k[:-2]} {v * 1000:8.1f} ms" for k, v in record.items() if k.endswith("_s"))
+                    print(f"{size:>7} seed {seed} {stage:>8}: {phases}  [{record['status']}]")
+    print(f"Results appended to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
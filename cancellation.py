@@ -0,0 +1,47 @@
+import threading
+from contextlib import contextmanager
+
+# ========== CANCELLING IN-FLIGHT SOLVES ==========
+# One stop flag per process. request() sets it and calls StopSearch() on
+# every CP-SAT solver currently running inside stoppable(); a solver that
+# enters stoppable() after the request gets a zero time limit, so it returns
+# at once. The local search polls requested() in its loop. A stopped solve
+# ends like a timeout with nothing found: the stage returns None and
+# publishes nothing.
+#
+# worker.py watches the queue while a job runs and calls request() once the
+# job has been superseded, then reset() before the next job.
+
+_stop = threading.Event()
+_lock = threading.Lock()
+_solvers = set()
+
+
+def requested():
+    return _stop.is_set()
+
+
+def request():
+    """Stops every running solve in this process and any started before reset()."""
+    with _lock:
+        _stop.set()
+        for solver in _solvers:
+            solver.StopSearch()
+
+
+def reset():
+    _stop.clear()
+
+
+@contextmanager
+def stoppable(solver):
+    """Lets request() stop `solver` while its Solve() runs inside the block."""
+    with _lock:
+        if _stop.is_set():
+            solver.parameters.max_time_in_seconds = 0.0
+        _solvers.add(solver)
+    try:
+        yield solver
+    finally:
+        with _lock:
+            _solvers.discard(solver)
@@ -0,0 +1,141 @@
+import json
+import os
+
+import numpy as np
+
+from grid import EMPTY_NAME
+
+# ========== PINNED / BLOCKED CELL RULES ==========
+# Declarative replacement for cells hardcoded inside the model builders
+# (previously: 3rd Year's last two periods of the first and last day forced
+# to 'Free' in depart.py). Rules live in cell_rules.json next to this module:
+#
+#   {"rules": [
+#     {"kind": "pin",    "year": "3rd Year", "subject": "Free",
+#      "days": [1, -1], "periods": [-2, -1], "stages": ["depart"]},
+#     {"kind": "block",  "label": "Assembly", "days": [1], "periods": [1]},
+#     {"kind": "forbid", "subject": "Maths", "periods": [5]}
+#   ]}
+#
+#   pin     the cell must hold `subject` (for the lab, that class must be placed)
+#   block   no class at all; the department timetable shows `label` (not
+#           "Empty", which is the empty-cell sentinel), the lab leaves the
+#           room empty
+#   forbid  `subject` may not go in the cell
+#
+# Optional "year" / "section" / "subject" (any case) narrow a rule; "stages" limits it
+# to "depart" and/or "lab" (default: both). "days" / "periods" take labels,
+# 1-based positions or negative positions counted from the end; leaving one
+# out means every day / period.
+#
+# compile_rules() turns the rules for one timetable row into NumPy arrays
+# once, before the model is built; the builders then only ask
+# allowed[d, p, idx], so adding rules adds no branching to their loops.
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cell_rules.json")
+
+PIN = "pin"
+BLOCK = "block"
+FORBID = "forbid"
+KINDS = (PIN, BLOCK, FORBID)
+
+
+def load_rules(path=RULES_FILE):
+    """Rule list from a rules file; a missing file means no rules."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    rules = data.get("rules", []) if isinstance(data, dict) else data
+    for rule in rules:
+        if rule.get("kind") not in KINDS:
+            raise ValueError(f"Unknown cell rule kind {rule.get('kind')!r} in {path}")
+        if rule["kind"] in (PIN, FORBID) and not rule.get("subject"):
+            raise ValueError(f"A {rule['kind']} rule needs a subject: {rule}")
+    return rules
+
+
+def select(selector, labels):
+    """Positions picked by a days/periods selector (see module comment)."""
+    if selector is None or selector == "all":
+        return list(range(len(labels)))
+    picked = []
+    for item in selector if isinstance(selector, list) else [selector]:
+        if isinstance(item, int):
+            position = item - 1 if item > 0 else len(labels) + item
+        else:
+            position = labels.index(item) if item in labels else -1
+        if 0 <= position < len(labels):
+            picked.append(position)
+    return picked
+
+
+class CompiledRules:
+    """
+    Rules applied to one row of a timetable.
+
+    allowed  (days, periods, candidates) bool - may candidate idx go in the cell?
+    pinned   (days, periods) bool             - must the cell be filled (by an allowed candidate)?
+    blocked  {(d, p): label}                  - cells that get no variables at all
+    """
+
+    def __init__(self, num_days, num_periods, num_candidates):
+        self.allowed = np.ones((num_days, num_periods, num_candidates), dtype=bool)
+        self.pinned = np.zeros((num_days, num_periods), dtype=bool)
+        self.blocked = {}
+
+    def is_blocked(self, d, p):
+        return (d, p) in self.blocked
+
+
+def _matches(rule, year, section, subject=None):
+    # Subjects compare case-insensitively: Firestore data has "Free", "free" and "FREE".
+    return (
+        rule.get("year") in (None, year)
+        and rule.get("section") in (None, section)
+        and (subject is None or rule.get("subject") is None or str(rule["subject"]).lower() == str(subject).lower())
+    )
+
+
+def compile_rules(rules, stage, days, periods, candidates, row_year=None, row_section=None):
+    """
+    Compiles `rules` for one row.
+    candidates: [(year, section, subject), ...] in candidate-index order.
+    row_year / row_section: what the whole row belongs to (a department
+    year row), or None when the row mixes years (the lab room).
+    """
+    days, periods = list(days), list(periods)
+    compiled = CompiledRules(len(days), len(periods), len(candidates))
+    for rule in rules:
+        if stage not in rule.get("stages", (stage,)):
+            continue
+        if row_year is not None and not _matches(rule, row_year, row_section):
+            continue
+        day_positions, period_positions = select(rule.get("days"), days), select(rule.get("periods"), periods)
+        if not day_positions or not period_positions:
+            continue
+        cells = np.ix_(day_positions, period_positions)
+        in_scope = np.array([_matches(rule, y, s) for y, s, _ in candidates], dtype=bool)
+        hits = np.array([_matches(rule, y, s, subject) for y, s, subject in candidates], dtype=bool)
+        kind = rule["kind"]
+
+        if kind == FORBID:
+            compiled.allowed[cells] &= ~hits
+        elif kind == PIN:
+            if not hits.any():
+                where = row_year or stage
+                raise ValueError(f"No '{rule['subject']}' candidate found in {where} for a pinned cell.")
+            compiled.allowed[cells] &= hits
+            compiled.pinned[cells] = True
+        elif kind == BLOCK:
+            compiled.allowed[cells] &= ~in_scope
+            if row_year is not None or (rule.get("year") is None and rule.get("section") is None):
+                label = rule.get("label", "Blocked")
+                if label is None or label == EMPTY_NAME:
+                    # It would intern to the EMPTY entry id and read back as an open cell.
+                    raise ValueError(f"A block rule needs a label other than {EMPTY_NAME!r}: {rule}")
+                compiled.pinned[cells] = False
+                for d in day_positions:
+                    for p in period_positions:
+                        compiled.blocked[(d, p)] = label
+    return compiled
@@ -0,0 +1,62 @@
+import csv
+import os
+
+# ========== LIGHTWEIGHT TIMETABLE CSV I/O ==========
+# The yearly timetable CSVs are tiny labelled tables:
+#
+#   <corner>,Period 1,Period 2,...
+#   Day 1,<cell>,<cell>,...
+#
+# These helpers read and write that layout with the standard library so the
+# department stage does not need pandas. pandas is only used by
+# to_dataframe(), an optional convenience for analysis.
+
+
+def read_table(path):
+    """
+    Reads a labelled timetable CSV.
+    Returns (index, columns, rows): the day labels, the period labels and a
+    list of row lists (cells as strings).
+    """
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return [], [], []
+        columns = header[1:]
+        index, rows = [], []
+        for record in reader:
+            if not record:
+                continue
+            index.append(record[0])
+            rows.append(record[1:])
+    return index, columns, rows
+
+
+def read_labels(path):
+    """Returns only (index, columns) — all depart.py needs from final_schedules."""
+    index, columns, _ = read_table(path)
+    return index, columns
+
+
+def write_table(path, rows, columns, index, corner=""):
+    """
+    Writes rows in the same layout pandas' DataFrame.to_csv produced
+    (empty corner cell, "\\n" line endings), so existing files diff cleanly.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, mode="w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile, lineterminator="\n")
+        writer.writerow([corner] + list(columns))
+        for label, row in zip(index, rows):
+            writer.writerow([label] + list(row))
+    return path
+
+
+def to_dataframe(path):
+    """Optional: load a timetable CSV as a pandas DataFrame for analysis."""
+    try:
+        import pandas as pd
+    except ImportError as e:
+        raise ImportError("to_dataframe() needs pandas; install it for analysis use only.") from e
+    return pd.read_csv(path, index_col=0)
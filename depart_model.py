@@ -0,0 +1,324 @@
+import numpy as np
+from ortools.sat.python import cp_model
+
+import cancellation
+import instrument
+from artifact import FINAL_FORMAT, TimetableArtifact
+from availability import teacher_masks
+from cellrules import compile_rules, load_rules
+from extract import candidate_table, decode_candidate_index, solution_values
+from grid import DAYS, DEFAULT_SECTION, GRID_DTYPE, PERIODS, YEARS
+from modelstats import FamilyTracker, report
+from registry import NO_TEACHER, Registry
+
+MAX_PER_DAY = 2
+MAX_CONSECUTIVE = 2
+MAX_TEACHER_LOAD = 18
+
+# Limits that relax= may turn into penalties (names as in validate.py / model_report()).
+RELAXABLE = ("per_day", "consecutive", "teacher_load")
+
+
+def convert_candidate_data(raw_data):
+    """
+    Converts a raw candidate dictionary into a list of tuples sorted by the numeric suffix of keys.
+    Each tuple is of the form: (name, credits, teacher)
+    For example, given:
+    {
+        'subject_5': {'credits': 6, 'teacher': None, 'name': 'English'},
+        'subject_4': {'credits': 6, 'teacher': None, 'name': 'Tamil'},
+        'subject_3': {'credits': 2, 'teacher': 'suganthi', 'name': 'VE'},
+        'subject_6': {'credits': 5, 'teacher': None, 'name': 'Maths'},
+        'subject_2': {'credits': 6, 'teacher': 'geetha', 'name': 'c++ Lab'},
+        'subject_1': {'credits': 5, 'teacher': 'geetha', 'name': 'c++'}
+    }
+    it produces:
+    [('c++', 5, 'geetha'),
+     ('c++ Lab', 6, 'geetha'),
+     ('VE', 2, 'suganthi'),
+     ('Tamil', 6, None),
+     ('English', 6, None),
+     ('Maths', 5, None)]
+    """
+    # Sort items by the numeric suffix of the key, e.g. 'subject_1', 'subject_2', ...
+    sorted_items = sorted(raw_data.items(), key=lambda x: int(x[0].split('_')[-1]))
+    # Build and return the list of tuples
+    return [
+        (info.get("name"), info.get("credits"), info.get("teacher"))
+        for key, info in sorted_items
+    ]
+
+
+class TimetableScheduler:
+    """
+    Department timetable model (the CP-SAT part of depart.py).
+
+    candidates: {year: [(subject, credits, teacher), ...]}. Each (year, day,
+    period) cell gets an integer variable X choosing a candidate index, with
+    reified Booleans per candidate for the counting rules.
+
+    availability: {teacher: (days, periods) bool array} (see availability.py).
+    A candidate whose teacher is unavailable in a slot is left out of that
+    cell's X domain and gets no Boolean there.
+
+    rules: pinned/blocked cell rules (see cellrules.py); defaults to
+    cell_rules.json. Blocked cells get no variables and show the block label.
+
+    relax: RELAXABLE limits to model as penalties instead of constraints:
+    each bounded sum gets an excess variable (sum - limit <= excess) listed
+    in self.penalties[rule], for soft.py to put in an objective.
+    """
+
+    def __init__(self, candidates, days=DAYS, periods=PERIODS, years=YEARS, registry=None, section=DEFAULT_SECTION,
+                 availability=None, rules=None, relax=()):
+        self.years = list(years)
+        self.days = list(days)
+        self.periods = list(periods)
+        self.section = section
+        self.registry = registry or Registry()
+        # Intern every (year, section, subject, teacher) once. From here on the model
+        # works on entry ids; candidate_entries[year][idx] = (entry_id, credits).
+        self.candidate_entries = self.registry.load_candidates(
+            {year: candidates.get(year, []) for year in self.years}, section
+        )
+        self.availability = availability or {}
+        self.rules = load_rules() if rules is None else rules
+        unknown = set(relax) - set(RELAXABLE)
+        if unknown:
+            raise ValueError(f"Cannot relax {sorted(unknown)}; relaxable limits are {list(RELAXABLE)}")
+        self.relax = frozenset(relax)
+        self.penalties = {}
+        self.model = None
+        self.cells = None
+        self.status = None
+        self.engine = None  # "greedy" or "cp-sat" when solved through greedy.solve_department_fast()
+
+    def compiled_rules(self):
+        """{year: cellrules.CompiledRules} for this scheduler's cell rules."""
+        registry = self.registry
+        return {
+            year: compile_rules(
+                self.rules, "depart", self.days, self.periods,
+                [(year, self.section, registry.subject_name(entry_id)) for entry_id, _ in self.candidate_entries[year]],
+                row_year=year, row_section=self.section,
+            )
+            for year in self.years
+        }
+
+    def allowed_candidates(self, compiled=None):
+        """
+        {year: (days, periods, candidates) bool array}: may candidate idx go in
+        cell (d, p)? Combines teacher availability with the cell rules.
+        """
+        compiled = compiled or self.compiled_rules()
+        masks = teacher_masks(self.availability, self.registry, len(self.days), len(self.periods))
+        teacher_of = self.registry.teacher_of()
+        allowed = {}
+        for year in self.years:
+            entry_ids = np.array([entry_id for entry_id, _ in self.candidate_entries[year]], dtype=np.int64)
+            allowed[year] = masks[teacher_of[entry_ids]].transpose(1, 2, 0) & compiled[year].allowed
+        return allowed
+
+    def _at_most(self, model, rule, terms, limit):
+        """sum(terms) <= limit, or for a relaxed rule an excess variable in self.penalties."""
+        if rule not in self.relax:
+            model.Add(sum(terms) <= limit)
+        elif len(terms) > limit:
+            excess = model.NewIntVar(0, len(terms) - limit, f"{rule}_excess_{len(self.penalties.setdefault(rule, []))}")
+            model.Add(sum(terms) - limit <= excess)
+            self.penalties[rule].append(excess)
+
+    def build_model(self):
+        registry = self.registry
+        candidate_entries = self.candidate_entries
+        years_list = self.years
+        num_days = len(self.days)
+        num_periods = len(self.periods)
+        teacher_of = registry.teacher_of()
+
+        # Cell rules (cell_rules.json) and teacher availability, compiled once into
+        # allowed[year][d, p, idx]; blocked cells get no variables at all.
+        compiled = self.compiled_rules()
+        allowed = self.allowed_candidates(compiled)
+        blocked = {year: compiled[year].blocked for year in years_list}
+
+        # === CP MODEL CREATION ===
+        model = cp_model.CpModel()
+        self.penalties = {}
+        # Records which rule each variable/constraint belongs to, for model_report().
+        tracker = FamilyTracker(model)
+
+        # Decision variables:
+        # X[(year, d, p)] is an integer variable representing the candidate index for that cell.
+        X = {}
+        for year in years_list:
+            tracker.switch("cell_vars", year)
+            for d in range(num_days):
+                for p in range(num_periods):
+                    if (d, p) in blocked[year]:
+                        continue
+                    cell_allowed = allowed[year][d, p]
+                    if cell_allowed.all():
+                        X[(year, d, p)] = model.NewIntVar(0, len(candidate_entries[year]) - 1, f"{year}_{d}_{p}")
+                        continue
+                    # Pinned cells and unavailable teachers: drop those candidates from the domain.
+                    values = np.flatnonzero(cell_allowed).tolist()
+                    if not values:
+                        # Rules and availability leave nothing for this cell: no timetable
+                        # exists, so the solve reports it like any other infeasible model.
+                        print(f"No candidate of {year} is allowed on {self.days[d]}, {self.periods[p]}.")
+                        X[(year, d, p)] = model.NewIntVar(0, len(candidate_entries[year]) - 1, f"{year}_{d}_{p}")
+                        model.AddBoolOr([])
+                        continue
+                    X[(year, d, p)] = model.NewIntVarFromDomain(cp_model.Domain.FromValues(values), f"{year}_{d}_{p}")
+
+        # Dictionary to hold reified Boolean variables.
+        # assign_bool[(year, d, p, idx)] is True if candidate at index 'idx' is assigned in cell (d,p) for that year.
+        assign_bool = {}
+
+        # Constraint 1: Each candidate subject appears exactly its required number of times overall.
+        for year in years_list:
+            tracker.switch("occurrence", year)
+            for idx, (entry_id, required_count) in enumerate(candidate_entries[year]):
+                occurrence_vars = []
+                for d in range(num_days):
+                    for p in range(num_periods):
+                        # Blocked, pinned to another subject, or teacher unavailable:
+                        # no Boolean, and idx is not in X's domain.
+                        if not allowed[year][d, p, idx]:
+                            continue
+                        bool_var = model.NewBoolVar(f"{year}_{d}_{p}_{entry_id}")
+                        model.Add(X[(year, d, p)] == idx).OnlyEnforceIf(bool_var)
+                        model.Add(X[(year, d, p)] != idx).OnlyEnforceIf(bool_var.Not())
+                        occurrence_vars.append(bool_var)
+                        assign_bool[(year, d, p, idx)] = bool_var
+                model.Add(sum(occurrence_vars) == required_count)
+
+        # Constraint 2: Each subject appears at most two times per day.
+        for year in years_list:
+            tracker.switch("per_day", year)
+            for idx, (entry_id, required_count) in enumerate(candidate_entries[year]):
+                for d in range(num_days):
+                    day_occurrence = [
+                        assign_bool[(year, d, p, idx)]
+                        for p in range(num_periods)
+                        if (year, d, p, idx) in assign_bool
+                    ]
+                    self._at_most(model, "per_day", day_occurrence, MAX_PER_DAY)
+
+        # Constraint 3: Prevent teacher double booking.
+        # For every day and period across all years, each teacher (ignoring None) is assigned at most once.
+        # teacher_assignments is keyed on the registry teacher id.
+        teacher_assignments = {}
+        for year in years_list:
+            for d in range(num_days):
+                for p in range(num_periods):
+                    for idx, (entry_id, req_number) in enumerate(candidate_entries[year]):
+                        teacher = int(teacher_of[entry_id])
+                        if teacher == NO_TEACHER:
+                            continue
+                        if (year, d, p, idx) not in assign_bool:
+                            continue
+                        teacher_assignments.setdefault(teacher, {}).setdefault((d, p), []).append(assign_bool[(year, d, p, idx)])
+
+        for teacher, time_slots in teacher_assignments.items():
+            tracker.switch("teacher_clash", registry.teachers.name(teacher))
+            for time_slot, bool_vars in time_slots.items():
+                model.Add(sum(bool_vars) <= 1)
+
+        # Constraint 4: Prevent a teacher from being assigned for three consecutive periods on the same day.
+        # For each teacher, on each day, for every three consecutive periods, the total assignments must be at most 2.
+        for teacher, time_slots in teacher_assignments.items():
+            tracker.switch("consecutive", registry.teachers.name(teacher))
+            for d in range(num_days):
+                for p in range(num_periods - 2):
+                    triple_vars = []
+                    # Collect Boolean variables for periods p, p+1, and p+2, if any.
+                    for pp in [p, p + 1, p + 2]:
+                        if (d, pp) in time_slots:
+                            triple_vars.extend(time_slots[(d, pp)])
+                    if triple_vars:
+                        self._at_most(model, "consecutive", triple_vars, MAX_CONSECUTIVE)
+
+        # Constraint 5: Ensure total assignments per teacher are <= 18.
+        for teacher, time_slots in teacher_assignments.items():
+            tracker.switch("teacher_load", registry.teachers.name(teacher))
+            all_assignments = []
+            for (d, p), bool_vars in time_slots.items():
+                all_assignments.extend(bool_vars)
+            self._at_most(model, "teacher_load", all_assignments, MAX_TEACHER_LOAD)
+        tracker.close()
+
+        self.model = model
+        self.tracker = tracker
+        self.X = X
+        self.assign_bool = assign_bool
+        self.teacher_assignments = teacher_assignments
+        # Proto indices of X as a (year, day, period) array, and the candidate index -> entry id table,
+        # so the solution can be decoded in bulk. Blocked cells have no X; block_cells holds the
+        # entry id of their label instead.
+        self.block_cells = np.zeros((len(years_list), num_days, num_periods), dtype=GRID_DTYPE)
+        for y, year in enumerate(years_list):
+            for (d, p), label in blocked[year].items():
+                self.block_cells[y, d, p] = registry.entry(year, self.section, label)
+        self.X_index = np.zeros((len(years_list), num_days, num_periods), dtype=np.int64)
+        for y, year in enumerate(years_list):
+            for d in range(num_days):
+                for p in range(num_periods):
+                    if (year, d, p) in X:
+                        self.X_index[y, d, p] = X[(year, d, p)].Index()
+        self.entry_table = candidate_table(
+            [[entry_id for entry_id, _ in candidate_entries[year]] for year in years_list]
+        )
+        return model
+
+    def model_report(self):
+        """Variables/constraints/terms per rule, year and teacher (see modelstats.report)."""
+        if self.model is None:
+            self.build_model()
+        return report(self.tracker)
+
+    def solve(self, solver=None):
+        """
+        Solves the model. Returns {year: {section: [[cell, ...], ...]}} with
+        rendered 'subject (teacher)' rows, or None when no timetable exists.
+        The entry-id grid (year, day, period) is kept in self.cells.
+        """
+        if self.model is None:
+            with instrument.span("build"):
+                self.build_model()
+        solver = solver or cp_model.CpSolver()
+        with instrument.span("solve"):
+            log_lines = instrument.watch_solver(solver)
+            with cancellation.stoppable(solver):
+                self.status = solver.Solve(self.model)
+            instrument.solver_stats(solver, self.status, log_lines)
+        if self.status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+        with instrument.span("extract"):
+            self.cells = decode_candidate_index(
+                solution_values(solver), self.X_index, self.entry_table, fixed=self.block_cells
+            )
+            return self.solution()
+
+    def rendered(self):
+        """{entry_id: 'subject (teacher)'} for every id in the solved grid."""
+        return {int(eid): self.registry.render_cell(int(eid)) for eid in np.unique(self.cells)}
+
+    def solution(self):
+        rendered = self.rendered()
+        return {
+            year: {self.section: [[rendered[eid] for eid in day] for day in self.cells[y].tolist()]}
+            for y, year in enumerate(self.years)
+        }
+
+    def iter_cells(self):
+        """Streams (year, section, day, period, cell) from the solved grid, for export.py."""
+        rendered = self.rendered()
+        for y, year in enumerate(self.years):
+            for d, day in enumerate(self.days):
+                for p, period in enumerate(self.periods):
+                    yield year, None, day, period, rendered[int(self.cells[y, d, p])]
+
+    def to_artifact(self):
+        return TimetableArtifact(self.cells, self.registry, self.years, self.days, self.periods, cell_format=FINAL_FORMAT)
@@ -0,0 +1,73 @@
+# ========== DEPARTMENT-SCOPED FIRESTORE PATHS ==========
+# Every stage used to read and write one department's documents at fixed
+# paths (2025/labsolutionBCA, 2025/generaltimetable, ...). A Department names
+# them for any department and academic year, so the same scripts schedule
+# BCA, BSc and BCom side by side:
+#
+#                        BCA (default)                     any other department, e.g. BSc
+#   lab request          timetableLAB_request/classes      timetableLAB_request/classes_BSc
+#   lab solution         <ay>/labsolutionBCA/<day>/schedule <ay>/labsolutionBSc/<day>/schedule
+#   extra subjects       general_request/extra_subject     general_request/extra_subject_BSc
+#   general timetable    <ay>/generaltimetable             <ay>/generaltimetable_BSc
+#   candidates           depart_request/candidate/<y>/<s>  depart_request/candidate_BSc/<y>/<s>
+#   teacher / lab views  <ay>/views                        <ay>/views_BSc
+#   alternatives         <ay>/alternatives/<stage>/pool    <ay>/alternatives_BSc/<stage>/pool
+#
+# Department() is BCA in 2025, i.e. exactly the paths the stages always used,
+# so existing clients and Firestore rules keep working. Teacher availability
+# (depart_request/availability) stays college-wide: a teacher is unavailable
+# in a slot whichever department asks.
+
+DEFAULT_DEPARTMENT = "BCA"
+DEFAULT_ACADEMIC_YEAR = "2025"
+
+
+class Department:
+    def __init__(self, name=DEFAULT_DEPARTMENT, academic_year=DEFAULT_ACADEMIC_YEAR):
+        if not name or "/" in str(name):
+            raise ValueError(f"Invalid department name: {name!r}")
+        self.name = str(name)
+        self.academic_year = str(academic_year)
+        # The default department keeps the unsuffixed legacy paths.
+        self.suffix = "" if self.name == DEFAULT_DEPARTMENT else f"_{self.name}"
+
+    def __repr__(self):
+        return f"Department({self.name!r}, {self.academic_year!r})"
+
+    @property
+    def slug(self):
+        """Directory name for this department's local outputs."""
+        return f"{self.academic_year}_{self.name}"
+
+    @property
+    def lab_classes_path(self):
+        return f"timetableLAB_request/classes{self.suffix}"
+
+    def lab_solution_path(self, day):
+        return f"{self.academic_year}/labsolution{self.name}/{day}/schedule"
+
+    @property
+    def extra_subjects_path(self):
+        return f"general_request/extra_subject{self.suffix}"
+
+    @property
+    def general_timetable_path(self):
+        return f"{self.academic_year}/generaltimetable{self.suffix}"
+
+    def candidate_path(self, year, section):
+        return f"depart_request/candidate{self.suffix}/{year}/{section}"
+
+    @property
+    def views_base(self):
+        return f"{self.academic_year}/views{self.suffix}"
+
+    def alternatives_path(self, stage):
+        """Solution pool document of a stage ("lab" / "depart"), see alternatives.py."""
+        return f"{self.academic_year}/alternatives{self.suffix}/{stage}/pool"
+
+
+def as_department(value=None, academic_year=None):
+    """A Department from a Department, a name or None (the default department)."""
+    if isinstance(value, Department):
+        return value
+    return Department(value or DEFAULT_DEPARTMENT, academic_year or DEFAULT_ACADEMIC_YEAR)
@@ -0,0 +1,223 @@
+import csv
+import json
+import os
+
+# ========== STREAMING TIMETABLE EXPORT ==========
+# Exports consume a stream of cells
+#
+#     (year, section, day, period, cell)
+#
+# in timetable order (all cells of one (year, section) together, days in
+# order, periods in order within a day) and hand complete day rows to one or
+# more sinks. Only the current row is held in memory, so exporting every
+# section of a full-college run does not need the timetables resident at
+# once. Cells are usually produced straight off the solver or an artifact.
+
+NO_SECTION = None
+
+
+def year_slug(year):
+    return year.replace(" ", "_")
+
+
+def default_shard_name(year, section, suffix="", ext=".csv"):
+    """'1st_Year.csv' for the default layout, '1st_Year_B.csv' with a section."""
+    section_part = "" if section in (NO_SECTION, "") else f"_{section}"
+    return f"{year_slug(year)}{section_part}{suffix}{ext}"
+
+
+def iter_rows(cells):
+    """
+    Groups a cell stream into day rows:
+    yields (year, section, day, [(period, cell), ...]).
+    """
+    current = None
+    row = []
+    for year, section, day, period, cell in cells:
+        key = (year, section, day)
+        if key != current:
+            if row:
+                yield current + (row,)
+            current = key
+            row = []
+        row.append((period, cell))
+    if row:
+        yield current + (row,)
+
+
+def iter_schedule_cells(schedule, year, section=NO_SECTION):
+    """Cell stream for one {day: {period: subject}} schedule dict."""
+    for day, periods in schedule.items():
+        for period, subject in periods.items():
+            yield year, section, day, period, subject
+
+
+def iter_grid_cells(cells, rows, days, periods, render, section=NO_SECTION):
+    """Cell stream for a (rows, days, periods) id grid, rendering lazily."""
+    for r, row in enumerate(rows):
+        for d, day in enumerate(days):
+            for p, period in enumerate(periods):
+                yield row, section, day, period, render(int(cells[r, d, p]))
+
+
+# ========== SINKS ==========
+
+class CsvSink:
+    """
+    Writes timetable rows as CSV.
+
+    sharded (default): one file per (year, section) in the yearly layout
+        <corner>,Period 1,...
+        Day 1,<cell>,...
+    combined: a single file with leading year/section/day columns.
+    """
+
+    def __init__(self, output_dir, combined=False, filename=None, corner="", combined_name="timetables.csv"):
+        self.output_dir = output_dir
+        self.combined = combined
+        self.filename = filename or default_shard_name
+        self.corner = corner
+        self.combined_name = combined_name
+        self.paths = []
+        self._file = None
+        self._writer = None
+        self._key = None
+        self._seen = set()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open(self, name, header):
+        self._close_file()
+        path = os.path.join(self.output_dir, name)
+        self._file = open(path, mode="w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file, lineterminator="\n")
+        self._writer.writerow(header)
+        self.paths.append(path)
+
+    def write_row(self, year, section, day, row):
+        periods = [period for period, _ in row]
+        values = [cell for _, cell in row]
+        if self.combined:
+            if self._writer is None:
+                self._open(self.combined_name, ["year", "section", "day"] + periods)
+            self._writer.writerow([year, section or "", day] + values)
+            return
+        key = (year, section)
+        if key != self._key:
+            if key in self._seen:
+                raise ValueError(f"Cells for {year} {section or ''} are not contiguous in the stream")
+            self._seen.add(key)
+            self._key = key
+            self._open(self.filename(year, section), [self.corner] + periods)
+        self._writer.writerow([day] + values)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def close(self):
+        self._close_file()
+
+
+class JsonLinesSink:
+    """Writes one JSON object per day row, combined or sharded per (year, section)."""
+
+    def __init__(self, output_dir, combined=True, filename=None, combined_name="timetables.jsonl"):
+        self.output_dir = output_dir
+        self.combined = combined
+        self.filename = filename or (lambda year, section: default_shard_name(year, section, ext=".jsonl"))
+        self.combined_name = combined_name
+        self.paths = []
+        self._file = None
+        self._key = None
+        self._seen = set()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open(self, name):
+        self.close()
+        path = os.path.join(self.output_dir, name)
+        self._file = open(path, mode="w", encoding="utf-8")
+        self.paths.append(path)
+
+    def write_row(self, year, section, day, row):
+        if self.combined:
+            if self._file is None:
+                self._open(self.combined_name)
+        elif (year, section) != self._key:
+            key = (year, section)
+            if key in self._seen:
+                raise ValueError(f"Cells for {year} {section or ''} are not contiguous in the stream")
+            self._seen.add(key)
+            self._key = key
+            self._open(self.filename(year, section))
+        record = {"year": year, "section": section, "day": day, "periods": dict(row)}
+        self._file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FirestoreSink:
+    """
+    Writes each day row as its own document, committing in batches so that
+    at most `batch_size` payloads are pending at a time.
+    `doc_path(year, section, day)` returns the document path to write.
+    Payloads use the period-object layout of general.convert_schedule_dict_to_list.
+    """
+
+    def __init__(self, db, doc_path, batch_size=400):
+        self.db = db
+        self.doc_path = doc_path
+        self.batch_size = batch_size
+        self.written = 0
+        self._batch = None
+        self._pending = 0
+
+    @staticmethod
+    def payload(day, row):
+        return {
+            "dayName": day,
+            "periods": [
+                {"periodName": period, "subject": cell.get("subject", "Empty"), "teacher": cell.get("teacher", "")}
+                if isinstance(cell, dict)
+                else {"periodName": period, "subject": cell, "teacher": ""}
+                for period, cell in row
+            ],
+        }
+
+    def write_row(self, year, section, day, row):
+        if self._batch is None:
+            self._batch = self.db.batch()
+        self._batch.set(self.db.document(self.doc_path(year, section, day)), self.payload(day, row))
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._commit()
+
+    def _commit(self):
+        if self._batch is not None and self._pending:
+            self._batch.commit()
+            self.written += self._pending
+        self._batch = None
+        self._pending = 0
+
+    def close(self):
+        self._commit()
+
+
+# ========== DRIVER ==========
+
+def export_cells(cells, *sinks):
+    """Streams `cells` into every sink row by row, then closes the sinks. Returns the row count."""
+    count = 0
+    try:
+        for year, section, day, row in iter_rows(cells):
+            for sink in sinks:
+                sink.write_row(year, section, day, row)
+            count += 1
+    finally:
+        for sink in sinks:
+            sink.close()
+    return count
@@ -0,0 +1,63 @@
+import numpy as np
+
+from grid import EMPTY, GRID_DTYPE
+
+# ========== BULK SOLUTION EXTRACTION ==========
+# Reading a CP-SAT answer with solver.Value() costs one Python call per
+# variable. Instead, every model records the proto index of its decision
+# variables in an integer array when it is built; after Solve() the whole
+# assignment is read once from the response proto and decoded with NumPy
+# indexing (argmax over the candidate axis for one-hot Booleans, a direct
+# lookup for integer "candidate index" variables).
+
+
+def var_indices(variables, shape):
+    """Array of proto indices for a flat list of CP-SAT variables, reshaped to `shape`."""
+    return np.fromiter((v.Index() for v in variables), dtype=np.int64, count=len(variables)).reshape(shape)
+
+
+def solution_values(solver):
+    """All variable values of the last solve, as one int64 array indexed by proto index."""
+    return np.asarray(solver.ResponseProto().solution, dtype=np.int64)
+
+
+def decode_one_hot(values, index_grid, candidate_ids, empty=EMPTY):
+    """
+    Decodes one-hot Boolean assignments.
+    `index_grid` has shape (..., K) with the proto index of the Boolean that
+    puts candidate k in that cell; `candidate_ids` (length K) maps k to the
+    id to emit. Cells with no true Boolean become `empty`; a negative index
+    means the model has no Boolean for that candidate there.
+    """
+    if index_grid.shape[-1] == 0:
+        return np.full(index_grid.shape[:-1], empty, dtype=GRID_DTYPE)
+    chosen = np.where(index_grid >= 0, values[index_grid], 0)
+    picked = np.asarray(candidate_ids, dtype=GRID_DTYPE)[chosen.argmax(axis=-1)]
+    return np.where(chosen.any(axis=-1), picked, empty).astype(GRID_DTYPE)
+
+
+def decode_candidate_index(values, index_grid, candidate_table, fixed=None):
+    """
+    Decodes integer "candidate index" variables (depart.py's X).
+    `index_grid` has shape (rows, ...) and `candidate_table` shape
+    (rows, max_candidates) mapping (row, candidate index) -> id.
+    `fixed`, if given, has index_grid's shape; cells where it is not EMPTY
+    have no variable (their index_grid entry is ignored) and take that id.
+    """
+    if fixed is None:
+        chosen = values[index_grid]
+    else:
+        has_var = fixed == EMPTY
+        chosen = np.where(has_var, values[np.where(has_var, index_grid, 0)], 0)
+    rows = np.arange(index_grid.shape[0]).reshape((-1,) + (1,) * (index_grid.ndim - 1))
+    decoded = np.asarray(candidate_table, dtype=GRID_DTYPE)[rows, chosen]
+    return decoded if fixed is None else np.where(has_var, decoded, fixed).astype(GRID_DTYPE)
+
+
+def candidate_table(candidate_lists, fill=EMPTY):
+    """Pads per-row candidate id lists into a (rows, max_candidates) array."""
+    width = max((len(ids) for ids in candidate_lists), default=0) or 1
+    table = np.full((len(candidate_lists), width), fill, dtype=GRID_DTYPE)
+    for r, ids in enumerate(candidate_lists):
+        table[r, :len(ids)] = ids
+    return table
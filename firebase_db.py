@@ -0,0 +1,17 @@
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+# Replace 'serviceAccountKey.json' with your actual Firebase service account key file.
+SERVICE_ACCOUNT_KEY = "serviceAccountKey.json"
+
+
+def get_db():
+    """
+    Returns a Firestore client, initializing the Firebase app on first use.
+    Initialization is lazy so the stage modules can be imported (e.g. by the
+    worker's process pool) without touching the network.
+    """
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(SERVICE_ACCOUNT_KEY)
+        firebase_admin.initialize_app(cred)
+    return firestore.client()
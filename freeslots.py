@@ -0,0 +1,228 @@
+import glob
+import os
+
+import numpy as np
+
+from artifact import ARTIFACT_DIR, load_artifact
+from cellrules import select
+from grid import EMPTY
+from views import teacher_index
+
+# ========== FREE-SLOT INDEX ==========
+# "Which lab is free Day 4 period 2?", "when are geetha and narmadha both
+# free?", "who can cover Web on Day 2 period 3?" - answered from occupancy
+# bitsets instead of re-reading labsolutionBCA and the yearly CSVs.
+#
+# Each lab room and teacher gets one Python int with bit d * P + p set when
+# the slot is taken (the availability.py bitmask layout, so unavailability
+# masks OR straight in). A query is a handful of AND/OR/popcount operations,
+# i.e. microseconds. The index is built from the latest archived solutions
+# (timetable_artifacts/lab-*.tta and depart-*.tta) and keeps a count per
+# (teacher, slot), so update_teacher_cell() / update_room_cell() can apply a
+# single changed cell without a rebuild - a clash that gets resolved leaves
+# the teacher busy until the last class in the slot goes.
+#
+#   python freeslots.py rooms "Day 4" 2
+#   python freeslots.py common geetha narmadha
+#   python freeslots.py substitutes "Day 2" 3 --subject Web
+#   python freeslots.py free geetha
+
+
+class FreeSlotIndex:
+    def __init__(self, days, periods):
+        self.days = list(days)
+        self.periods = list(periods)
+        self.full = (1 << (len(self.days) * len(self.periods))) - 1
+        self.rooms = {}
+        self.teachers = {}
+        self.unavailable = {}
+        self.subjects = {}    # teacher -> {subject: periods taught}
+        self._counts = {}     # (teacher, bit) -> classes in that slot
+        self._teacher_cells = {}  # (row, bit) -> (teacher, subject) of department cells
+
+    # ---------- building ----------
+
+    def bit(self, day, period):
+        """Bit of a slot; day/period as labels, 1-based or negative positions (see cellrules.select)."""
+        d, p = select(day, self.days), select(period, self.periods)
+        if len(d) != 1 or len(p) != 1:
+            raise ValueError(f"Unknown slot {day!r}, {period!r}")
+        return d[0] * len(self.periods) + p[0]
+
+    def slot(self, bit):
+        return self.days[bit // len(self.periods)], self.periods[bit % len(self.periods)]
+
+    def add_lab(self, artifact):
+        """Room occupancy from a lab artifact (rows = rooms)."""
+        cells = np.asarray(artifact.cells)
+        for r, room in enumerate(artifact.rows):
+            bits = np.flatnonzero(cells[r].ravel() != EMPTY)
+            self.rooms[room] = sum(1 << int(b) for b in bits)
+
+    def add_department(self, artifact):
+        """Teacher occupancy from a department artifact, through the views.py inverted index."""
+        registry = artifact.registry
+        num_periods = len(self.periods)
+        for teacher, (rows, ds, ps, eids) in teacher_index(artifact.cells, registry).items():
+            name = registry.teachers.name(teacher)
+            for r, d, p, eid in zip(rows.tolist(), ds.tolist(), ps.tolist(), eids.tolist()):
+                self._add_class(r, d * num_periods + p, name, registry.subject_name(eid))
+
+    def set_unavailable(self, availability):
+        """{teacher: (days, periods) bool array, True = available} as parsed by availability.py."""
+        for teacher, available in availability.items():
+            bits = np.flatnonzero(~np.asarray(available, dtype=bool).ravel())
+            self.unavailable[teacher] = sum(1 << int(b) for b in bits)
+
+    def _add_class(self, row, bit, teacher, subject):
+        self._teacher_cells[(row, bit)] = (teacher, subject)
+        key = (teacher, bit)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self.teachers[teacher] = self.teachers.get(teacher, 0) | (1 << bit)
+        taught = self.subjects.setdefault(teacher, {})
+        taught[subject] = taught.get(subject, 0) + 1
+
+    def _remove_class(self, row, bit):
+        teacher, subject = self._teacher_cells.pop((row, bit))
+        key = (teacher, bit)
+        self._counts[key] -= 1
+        if not self._counts[key]:
+            del self._counts[key]
+            self.teachers[teacher] &= ~(1 << bit)
+        taught = self.subjects[teacher]
+        taught[subject] -= 1
+        if not taught[subject]:
+            del taught[subject]
+
+    # ---------- incremental updates ----------
+
+    def update_teacher_cell(self, row, day, period, teacher=None, subject=None):
+        """Department cell (row index, day, period) now holds `subject` taught by `teacher` (None = no teacher)."""
+        bit = self.bit(day, period)
+        if (row, bit) in self._teacher_cells:
+            self._remove_class(row, bit)
+        if teacher is not None:
+            self._add_class(row, bit, teacher, subject)
+
+    def update_room_cell(self, room, day, period, occupied):
+        mask = 1 << self.bit(day, period)
+        self.rooms[room] = (self.rooms.get(room, 0) | mask) if occupied else (self.rooms.get(room, 0) & ~mask)
+
+    # ---------- queries ----------
+
+    def _busy(self, teacher):
+        return self.teachers.get(teacher, 0) | self.unavailable.get(teacher, 0)
+
+    def _slots(self, mask):
+        bits, b = [], 0
+        while mask:
+            if mask & 1:
+                bits.append(self.slot(b))
+            mask >>= 1
+            b += 1
+        return bits
+
+    def free_rooms(self, day, period):
+        mask = 1 << self.bit(day, period)
+        return [room for room, busy in self.rooms.items() if not busy & mask]
+
+    def free_slots(self, teacher=None, room=None):
+        busy = self.rooms.get(room, 0) if room is not None else self._busy(teacher)
+        return self._slots(self.full & ~busy)
+
+    def common_free(self, *teachers, rooms=()):
+        """Slots where every named teacher (and room) is free."""
+        busy = 0
+        for teacher in teachers:
+            busy |= self._busy(teacher)
+        for room in rooms:
+            busy |= self.rooms.get(room, 0)
+        return self._slots(self.full & ~busy)
+
+    def is_free(self, teacher, day, period):
+        return not self._busy(teacher) & (1 << self.bit(day, period))
+
+    def substitutes(self, day, period, subject=None, exclude=()):
+        """
+        Teachers free (and available) in the slot, best first: those who
+        already teach `subject`, then the lightest weekly load.
+        """
+        mask = 1 << self.bit(day, period)
+        free = [t for t in self.teachers if t not in exclude and not self._busy(t) & mask]
+        return sorted(free, key=lambda t: (subject not in self.subjects.get(t, {}), self.teachers[t].bit_count(), t))
+
+    def load(self, teacher):
+        return self.teachers.get(teacher, 0).bit_count()
+
+
+def latest_artifact(stage, archive_dir=ARTIFACT_DIR):
+    """Newest archived artifact of a stage ('lab' / 'depart'), or None."""
+    paths = sorted(glob.glob(os.path.join(archive_dir, f"{stage}-*.tta")))
+    return load_artifact(paths[-1]) if paths else None
+
+
+def build_index(depart_artifact=None, lab_artifact=None, availability=None):
+    reference = depart_artifact if depart_artifact is not None else lab_artifact
+    if reference is None:
+        raise ValueError("No solution to index: archive a lab or department solve first.")
+    index = FreeSlotIndex(reference.days, reference.periods)
+    if lab_artifact is not None:
+        index.add_lab(lab_artifact)
+    if depart_artifact is not None:
+        index.add_department(depart_artifact)
+    if availability:
+        index.set_unavailable(availability)
+    return index
+
+
+def load_latest(archive_dir=ARTIFACT_DIR, availability=None):
+    """FreeSlotIndex over the newest archived lab and department solves."""
+    return build_index(latest_artifact("depart", archive_dir), latest_artifact("lab", archive_dir), availability)
+
+
+def _slot_arg(value):
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Free-slot queries over the latest archived solutions.")
+    parser.add_argument("--archive-dir", default=ARTIFACT_DIR)
+    parser.add_argument("--availability", help="availability JSON (availability.py layout)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rooms = commands.add_parser("rooms", help="lab rooms free in a slot")
+    free = commands.add_parser("free", help="free slots of a teacher (or --room)")
+    common = commands.add_parser("common", help="slots where all the teachers are free")
+    subs = commands.add_parser("substitutes", help="teachers who can cover a slot")
+    for sub in (rooms, subs):
+        sub.add_argument("day", type=_slot_arg)
+        sub.add_argument("period", type=_slot_arg)
+    free.add_argument("teacher", nargs="?")
+    free.add_argument("--room")
+    common.add_argument("teachers", nargs="+")
+    subs.add_argument("--subject")
+    subs.add_argument("--exclude", nargs="*", default=[])
+    args = parser.parse_args()
+
+    index = load_latest(args.archive_dir)
+    if args.availability:
+        from availability import load_availability
+
+        index.set_unavailable(load_availability(args.availability, index.days, index.periods))
+    if args.command == "rooms":
+        result = index.free_rooms(args.day, args.period)
+    elif args.command == "free":
+        result = index.free_slots(teacher=args.teacher, room=args.room)
+    elif args.command == "common":
+        result = index.common_free(*args.teachers)
+    else:
+        result = index.substitutes(args.day, args.period, subject=args.subject, exclude=args.exclude)
+    for item in result:
+        print(", ".join(item) if isinstance(item, tuple) else item)
+    if not result:
+        print("(none)")
+
+
+if __name__ == "__main__":
+    main()
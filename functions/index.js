@@ -1,22 +1,19 @@
 const functions = require("firebase-functions");
 const admin = require("firebase-admin");
-const axios = require("axios");
 
 admin.initializeApp();
 
+// Requests are no longer forwarded to a per-request Cloud Run job. The
+// long-running Python worker (worker.py --queue firestore) pulls documents
+// with status "pending" from this collection and moves them through
+// processing -> done/failed itself. This trigger only stamps the enqueue time.
 exports.triggerCloudRun = functions.firestore
     .document("timetableLAB_request/{docId}")
     .onCreate(async (snap, context) => {
         const data = snap.data();
         if (data.status !== "pending") return;
 
-        const cloudRunURL = "https://your-cloud-run-url/run-timetable";  // Replace with actual URL
-
-        try {
-            const response = await axios.post(cloudRunURL, { year: data.year, type: data.type });
-            await snap.ref.update({ status: "processing", run_id: response.data.run_id });
-        } catch (error) {
-            console.error("Error triggering Cloud Run:", error);
-            await snap.ref.update({ status: "failed" });
-        }
+        await snap.ref.update({
+            queued_at: admin.firestore.FieldValue.serverTimestamp(),
+        });
     });
@@ -1,19 +1,27 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import json
-import re
 import csv
 
-# ========== STEP 1: FIREBASE SETUP & FETCH SCHEDULE ==========
-
-# Initialize Firebase Admin SDK (Replace 'serviceAccountKey.json' with your key file)
-cred = credentials.Certificate("serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
+import instrument
+from departments import as_department
+from export import NO_SECTION, CsvSink, default_shard_name, export_cells, iter_grid_cells, iter_schedule_cells
+from firebase_db import get_db
+from grid import (
+    DEFAULT_SECTION,
+    YEARS,
+    fill_extra_subjects_grid,
+    grid_to_schedule_dict,
+    schedule_dict_to_grid,
+    schedule_to_grid,
+    split_by_year,
+)
+from publish import Manifest, PublishStats, publish_document
+from registry import Registry
+from shards import write_shards
+from validate import check_general
 
-# Firestore database reference
-db = firestore.client()
+# ========== STEP 1: FIREBASE SETUP & FETCH SCHEDULE ==========
 
-def fetch_schedule_for_all_days():
+def fetch_schedule_for_all_days(db=None, department=None):
     """
     Fetches and sorts schedule data for Day 1 to Day 6 from Firestore.
     Returns a dict:
@@ -24,14 +32,11 @@ def fetch_schedule_for_all_days():
         "Day 6": { ... }
     }
     """
+    db = db or get_db()
+    department = as_department(department)
     schedule_data = {}
     for i in range(1, 7):  # Day 1 to Day 6
-        schedule_ref = (
-            db.collection("2025")
-            .document("labsolutionBCA")
-            .collection(f"Day {i}")
-            .document("schedule")
-        )
+        schedule_ref = db.document(department.lab_solution_path(f"Day {i}"))
         try:
             doc = schedule_ref.get()
             if doc.exists:
@@ -48,14 +53,7 @@ def fetch_schedule_for_all_days():
             print(f"Error fetching data for Day {i}: {e}")
     return schedule_data
 
-def remove_year_prefix(subject):
-    """
-    Removes '1st Year', '2nd Year', or '3rd Year' prefix from the subject string.
-    e.g. '1st Year_C++ Lab' -> 'C++ Lab'
-    """
-    return re.sub(r"^(1st Year|2nd Year|3rd Year)[_\s]+", "", subject)
-
-def separate_by_year(schedule_data):
+def separate_by_year(schedule_data, registry=None):
     """
     Splits the fetched schedule into three dictionaries:
       - first_year
@@ -63,48 +61,23 @@ def separate_by_year(schedule_data):
       - third_year
     Preserves day/period structure, removing 'Year' prefixes from subjects.
     Periods not matching a year are set to "Empty" in that year's schedule.
-    """
-    first_year = {}
-    second_year = {}
-    third_year = {}
-    
-    for day, periods in schedule_data.items():
-        # Initialize each day in each year
-        first_year[day] = {}
-        second_year[day] = {}
-        third_year[day] = {}
-        
-        if isinstance(periods, dict):
-            for period, subject in periods.items():
-                # 1st Year
-                if "1st Year" in subject:
-                    first_year[day][period] = remove_year_prefix(subject)
-                else:
-                    first_year[day][period] = "Empty"
-                
-                # 2nd Year
-                if "2nd Year" in subject:
-                    second_year[day][period] = remove_year_prefix(subject)
-                else:
-                    second_year[day][period] = "Empty"
-                
-                # 3rd Year
-                if "3rd Year" in subject:
-                    third_year[day][period] = remove_year_prefix(subject)
-                else:
-                    third_year[day][period] = "Empty"
-        else:
-            # If there's no valid dict for the day
-            first_year[day] = periods
-            second_year[day] = periods
-            third_year[day] = periods
 
-    return first_year, second_year, third_year
+    The split itself is done on an id grid (see grid.split_by_year); this
+    wrapper only converts to and from the dict shape.
+    """
+    registry = registry or Registry()
+    lab_grid, days, periods = schedule_to_grid(schedule_data, registry)
+    year_grids = split_by_year(lab_grid, registry)
+    return tuple(
+        grid_to_schedule_dict(year_grids[:, :, y], registry, days, periods)
+        for y in range(len(YEARS))
+    )
 
 # ========== STEP 2: FETCH EXTRA SUBJECTS FROM FIRESTORE ==========
-def fetch_extra_subjects():
+def fetch_extra_subjects(db=None, department=None):
     """
-    Fetch the extra_subject document from /general_request/extra_subject.
+    Fetch the extra_subject document from /general_request/extra_subject
+    (extra_subject_<department> for departments other than BCA).
     Expected structure:
     {
       "1st Year": {"English": 6, "Tamil": 6, "maths": 5},
@@ -113,8 +86,9 @@ def fetch_extra_subjects():
     }
     Returns a dict with these mappings.
     """
+    db = db or get_db()
     try:
-        extra_ref = db.collection("general_request").document("extra_subject")
+        extra_ref = db.document(as_department(department).extra_subjects_path)
         doc = extra_ref.get()
         if doc.exists:
             return doc.to_dict()
@@ -126,7 +100,7 @@ def fetch_extra_subjects():
         return {}
 
 # ========== STEP 3: FILL EMPTY SLOTS WITH EXTRA SUBJECTS ==========
-def fill_extra_subjects(year_schedule, extra_subjects):
+def fill_extra_subjects(year_schedule, extra_subjects, year=None, registry=None):
     """
     For a given year's schedule (day -> period -> subject),
     and a dictionary of extra_subjects = { "English": 6, "Tamil": 6, ... },
@@ -138,32 +112,21 @@ def fill_extra_subjects(year_schedule, extra_subjects):
     """
     # Example: extra_subjects = {"English": 6, "Tamil": 6, "maths": 5}
     # We try to place 'English' 6 times across the week, 1 time max per day in an empty slot.
-
-    for subject, required_count in extra_subjects.items():
-        count_remaining = required_count
-        
-        # Try placing this subject day-by-day until we've placed it required_count times.
-        for day in year_schedule:
-            if count_remaining <= 0:
-                break  # Done placing this subject
-            
-            # Check if this day already has 'subject' (to ensure one occurrence max per day)
-            already_present = any(
-                year_schedule[day][period] == subject for period in year_schedule[day]
-            )
-            if already_present:
-                continue  # Skip this day if subject already placed
-            
-            # Place subject in the first available empty slot
-            placed_in_day = False
-            for period in year_schedule[day]:
-                if year_schedule[day][period] == "Empty" and not placed_in_day:
-                    year_schedule[day][period] = subject
-                    count_remaining -= 1
-                    placed_in_day = True
-                    break  # Only one per day
+    registry = registry or Registry()
+    days = list(year_schedule.keys())
+    periods = list(next(iter(year_schedule.values()), {}).keys())
+    grid = schedule_dict_to_grid(year_schedule, registry, year, days, periods)
+    fill_extra_subjects_grid(grid, intern_extra_subjects(extra_subjects, year, registry))
+    year_schedule.update(grid_to_schedule_dict(grid, registry, days, periods))
     return year_schedule
 
+def intern_extra_subjects(extra_subjects, year, registry):
+    """Turns {"English": 6, ...} into an ordered [(entry_id, 6), ...] list."""
+    return [
+        (registry.entry(year, DEFAULT_SECTION, subject), count)
+        for subject, count in extra_subjects.items()
+    ]
+
 # ========== STEP 4: UPLOAD FINAL SCHEDULES TO FIRESTORE ==========
 
 def convert_schedule_dict_to_list(schedule_dict):
@@ -213,7 +176,8 @@ def convert_schedule_dict_to_list(schedule_dict):
         })
     return day_list
 
-def upload_final_schedules(first_year_schedule, second_year_schedule, third_year_schedule):
+def upload_final_schedules(first_year_schedule, second_year_schedule, third_year_schedule, db=None, manifest=None,
+                           department=None):
     # Convert each schedule dict to a list (to preserve order in Firestore)
     first_year_list = convert_schedule_dict_to_list(first_year_schedule)
     second_year_list = convert_schedule_dict_to_list(second_year_schedule)
@@ -226,64 +190,116 @@ def upload_final_schedules(first_year_schedule, second_year_schedule, third_year
         "3rd Year": third_year_list
     }
 
-    # Reference the document at /2025/generaltimetable
-    doc_ref = db.collection("2025").document("generaltimetable")
-    doc_ref.set(doc_data)
-    print("Uploaded final schedules to /2025/generaltimetable successfully.")
+    # Write the document at /2025/generaltimetable; only years that changed since the last publish
+    db = db or get_db()
+    path = as_department(department).general_timetable_path
+    manifest = manifest or Manifest()
+    stats = PublishStats()
+    changed = publish_document(db, path, doc_data, manifest, stats)
+    if changed:
+        print(f"Uploaded final schedules to /{path} successfully ({', '.join(changed)} changed).")
+    else:
+        print(f"Final schedules unchanged; /{path} not rewritten.")
+    # Sharded copy: one document per year/section plus an index (see shards.py), so readers
+    # can fetch a single section. The combined document above stays for existing clients.
+    shard_stats = write_shards(
+        db, {(year, DEFAULT_SECTION): day_list for year, day_list in doc_data.items()}, base=path, manifest=manifest
+    )
+    print(f"Sharded timetables: {shard_stats.summary()}")
+    manifest.save()
     return doc_data
 
 # ========== STEP 5: STORE OUTPUT TO CSV FILE ==========
-import csv
 import os
-def save_schedule_to_csv(schedule, filename):
+OUTPUT_FOLDER = "final_schedules"
+
+def year_csv_name(year, section=NO_SECTION):
+    """'1st Year' -> '1st_Year.csv' (the names depart.py reads back); '1st_Year_B.csv' with a section."""
+    return default_shard_name(year, section)
+
+def save_schedule_to_csv(schedule, year, section=NO_SECTION):
     """
-    Saves a given schedule dictionary to a CSV file.
+    Saves one year's (section's) schedule dictionary to its final_schedules CSV.
     CSV format:
     Day/Period,Period 1,Period 2,Period 3,Period 4,Period 5
     """
-    # Assume each day has the same period keys
-    sample_day = next(iter(schedule.values()))
-    header = ["Day/Period"] + list(sample_day.keys())
-    
-    # Create output folder if it doesn't exist
-    output_folder = "final_schedules"
-    os.makedirs(output_folder, exist_ok=True)
-    filepath = os.path.join(output_folder, filename)
-    
-    with open(filepath, mode="w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(header)
-        for day, periods in schedule.items():
-            row = [day] + [periods.get(period, "Empty") for period in header[1:]]
-            writer.writerow(row)
-    print(f"Saved {filepath} successfully.")
+    sink = CsvSink(OUTPUT_FOLDER, filename=year_csv_name, corner="Day/Period")
+    export_cells(iter_schedule_cells(schedule, year, section), sink)
+    print(f"Saved {os.path.join(OUTPUT_FOLDER, year_csv_name(year, section))} successfully.")
 
+def save_year_grids_to_csv(year_grids, registry, days, periods):
+    """
+    Streams all three (day, period) year grids into final_schedules/ in one
+    pass, rendering subject names cell by cell.
+    """
+    names = registry.subject_names()
+    cells = iter_grid_cells(
+        year_grids.transpose(2, 0, 1), YEARS, days, periods, lambda eid: names[eid]
+    )
+    sink = CsvSink(OUTPUT_FOLDER, filename=year_csv_name, corner="Day/Period")
+    export_cells(cells, sink)
+    for path in sink.paths:
+        print(f"Saved {path} successfully.")
+
+
+def run(db=None, should_publish=None, department=None):
+    """
+    General stage: lab solution -> per-year schedules with extra subjects filled in.
+    `should_publish`, if given, is asked right before anything is written.
+    `department` (departments.py) picks the Firestore paths; default BCA/2025.
+    """
+    with instrument.span("general"):
+        db = db or get_db()
+        department = as_department(department)
+        registry = Registry()
+
+        # 1) Fetch the weekly schedule from Firestore
+        with instrument.span("fetch"):
+            schedule_data = fetch_schedule_for_all_days(db, department)
+
+        with instrument.span("build"):
+            # 2) Separate into 1st, 2nd, 3rd year grids (day x period x year of registry entry ids)
+            lab_grid, days, periods = schedule_to_grid(schedule_data, registry)
+            year_grids = split_by_year(lab_grid, registry)
+
+        # 3) Fetch extra subjects from /general_request/extra_subject
+        with instrument.span("fetch_extra"):
+            extra_data = fetch_extra_subjects(db, department)
+
+        # 4) Fill empty slots for each year
+        with instrument.span("fill"):
+            for y, year in enumerate(YEARS):
+                if year in extra_data:
+                    fill_extra_subjects_grid(year_grids[:, :, y], intern_extra_subjects(extra_data[year], year, registry))
+            # The filler places what fits; say so when an extra subject falls short.
+            report = check_general(year_grids, registry, extra_data, days, periods)
+            if not report.ok:
+                print(report.summary())
+
+        if should_publish is not None and not should_publish():
+            print("Request superseded; not publishing these schedules.")
+            return None
+
+        # 5) Save schedules to CSV files (streamed straight from the grids)
+        with instrument.span("export"):
+            save_year_grids_to_csv(year_grids, registry, days, periods)
+
+        # Convert back to the dict shape only for the Firestore upload
+        first_year_schedule, second_year_schedule, third_year_schedule = (
+            grid_to_schedule_dict(year_grids[:, :, y], registry, days, periods)
+            for y in range(len(YEARS))
+        )
+
+        # 6) Upload final schedules to Firestore
+        with instrument.span("upload"):
+            result = upload_final_schedules(
+                first_year_schedule, second_year_schedule, third_year_schedule, db, department=department
+            )
+    instrument.flush()
+    return result
 
 def main():
-    # 1) Fetch the weekly schedule from Firestore
-    schedule_data = fetch_schedule_for_all_days()
-    
-    # 2) Separate into 1st, 2nd, 3rd year schedules
-    first_year_schedule, second_year_schedule, third_year_schedule = separate_by_year(schedule_data)
-    
-    # 3) Fetch extra subjects from /general_request/extra_subject
-    extra_data = fetch_extra_subjects()
-    
-    # 4) Fill empty slots for each year
-    if "1st Year" in extra_data:
-        first_year_schedule = fill_extra_subjects(first_year_schedule, extra_data["1st Year"])
-    if "2nd Year" in extra_data:
-        second_year_schedule = fill_extra_subjects(second_year_schedule, extra_data["2nd Year"])
-    if "3rd Year" in extra_data:
-        third_year_schedule = fill_extra_subjects(third_year_schedule, extra_data["3rd Year"])
-    
-    # 5) Save schedules to CSV files
-    save_schedule_to_csv(first_year_schedule, "1st_Year.csv")
-    save_schedule_to_csv(second_year_schedule, "2nd_Year.csv")
-    save_schedule_to_csv(third_year_schedule, "3rd_Year.csv")
-    
-    # 6) Upload final schedules to Firestore
-    upload_final_schedules(first_year_schedule, second_year_schedule, third_year_schedule)
+    return run()
 
 # Run main
 if __name__ == "__main__":
@@ -0,0 +1,249 @@
+import numpy as np
+from ortools.sat.python import cp_model
+
+import instrument
+from depart_model import MAX_CONSECUTIVE, MAX_PER_DAY, MAX_TEACHER_LOAD
+from grid import GRID_DTYPE
+from registry import NO_TEACHER
+from validate import check_department, check_lab
+
+# ========== GREEDY CONSTRUCTIVE FAST PATH ==========
+# Most sections are easy: a degree-ordered greedy placement with a one-step
+# local fix finds a timetable in milliseconds. solve_department_fast() and
+# solve_lab_fast() try that first, check the result with validate.py, and
+# only build and solve the CP-SAT model when the greedy pass fails, passing
+# whatever it did place as a solution hint.
+#
+# Degree order: candidates with the fewest allowed cells go first (pinned
+# cells, unavailable teachers), then those whose teacher carries the most
+# periods overall, then the largest credit counts. Each unit goes to the
+# allowed cell whose day holds the fewest copies of the subject so far. When
+# nothing fits, one placed candidate of the same row is moved to another
+# valid cell to make room (the local fix).
+
+GREEDY = "greedy"
+CP_SAT = "cp-sat"
+LOCAL_SEARCH = "local-search"
+SOFT = "soft"
+
+UNPLACED = -1
+BLOCKED = -2
+
+
+class _DepartmentState:
+    def __init__(self, scheduler):
+        registry = scheduler.registry
+        teacher_of = registry.teacher_of()
+        compiled = scheduler.compiled_rules()
+        self.allowed = scheduler.allowed_candidates(compiled)
+        self.years = scheduler.years
+        self.num_days, self.num_periods = len(scheduler.days), len(scheduler.periods)
+        self.entries = [scheduler.candidate_entries[year] for year in self.years]
+        self.teachers = [[int(teacher_of[entry_id]) for entry_id, _ in entries] for entries in self.entries]
+        self.grid = np.full((len(self.years), self.num_days, self.num_periods), UNPLACED, dtype=np.int64)
+        self.block_cells = np.zeros(self.grid.shape, dtype=GRID_DTYPE)
+        for y, year in enumerate(self.years):
+            for (d, p), label in compiled[year].blocked.items():
+                self.grid[y, d, p] = BLOCKED
+                self.block_cells[y, d, p] = registry.entry(year, scheduler.section, label)
+        self.day_count = [np.zeros((len(entries), self.num_days), dtype=np.int64) for entries in self.entries]
+        num_teachers = len(registry.teachers)
+        self.busy = np.zeros((num_teachers, self.num_days, self.num_periods), dtype=bool)
+        self.load = np.zeros(num_teachers, dtype=np.int64)
+
+    def fits(self, y, k, d, p):
+        if self.grid[y, d, p] != UNPLACED or not self.allowed[self.years[y]][d, p, k]:
+            return False
+        if self.day_count[y][k, d] >= MAX_PER_DAY:
+            return False
+        teacher = self.teachers[y][k]
+        if teacher == NO_TEACHER:
+            return True
+        busy = self.busy[teacher, d]
+        if busy[p] or self.load[teacher] >= MAX_TEACHER_LOAD:
+            return False
+        for start in range(max(0, p - 2), min(p, self.num_periods - 3) + 1):
+            if busy[start:start + 3].sum() + 1 > MAX_CONSECUTIVE:
+                return False
+        return True
+
+    def place(self, y, k, d, p):
+        self.grid[y, d, p] = k
+        self.day_count[y][k, d] += 1
+        teacher = self.teachers[y][k]
+        if teacher != NO_TEACHER:
+            self.busy[teacher, d, p] = True
+            self.load[teacher] += 1
+
+    def remove(self, y, d, p):
+        k = int(self.grid[y, d, p])
+        self.grid[y, d, p] = UNPLACED
+        self.day_count[y][k, d] -= 1
+        teacher = self.teachers[y][k]
+        if teacher != NO_TEACHER:
+            self.busy[teacher, d, p] = False
+            self.load[teacher] -= 1
+        return k
+
+    def cells(self):
+        """The grid as registry entry ids (block labels in blocked cells, EMPTY where unplaced)."""
+        cells = self.block_cells.copy()
+        for y, entries in enumerate(self.entries):
+            ids = np.array([entry_id for entry_id, _ in entries] or [0], dtype=GRID_DTYPE)
+            placed = self.grid[y] >= 0
+            cells[y][placed] = ids[self.grid[y][placed]]
+        return cells
+
+    def best_cell(self, y, k):
+        best, best_key = None, None
+        for d in range(self.num_days):
+            for p in range(self.num_periods):
+                if self.fits(y, k, d, p):
+                    key = (self.day_count[y][k, d], d, p)
+                    if best_key is None or key < best_key:
+                        best, best_key = (d, p), key
+        return best
+
+    def local_fix(self, y, k):
+        """Moves one placed candidate of row y elsewhere and puts k in its cell. Returns that cell or None."""
+        for d in range(self.num_days):
+            for p in range(self.num_periods):
+                other = int(self.grid[y, d, p])
+                if other < 0 or other == k:
+                    continue
+                self.remove(y, d, p)
+                if self.fits(y, k, d, p):
+                    self.place(y, k, d, p)
+                    target = self.best_cell(y, other)
+                    if target is not None:
+                        self.place(y, other, *target)
+                        return d, p
+                    self.remove(y, d, p)
+                self.place(y, other, d, p)
+        return None
+
+
+def greedy_department(scheduler):
+    """
+    Greedy placement for a depart_model.TimetableScheduler. Returns
+    (ok, state); state.grid is (years, days, periods) of candidate indices
+    (-1 unplaced, -2 blocked).
+    """
+    state = _DepartmentState(scheduler)
+    demand = {}
+    for y, entries in enumerate(state.entries):
+        for k, (entry_id, credits) in enumerate(entries):
+            teacher = state.teachers[y][k]
+            if teacher != NO_TEACHER:
+                demand[teacher] = demand.get(teacher, 0) + credits
+    order = []
+    for y, year in enumerate(state.years):
+        for k, (entry_id, credits) in enumerate(state.entries[y]):
+            teacher = state.teachers[y][k]
+            flexibility = int(state.allowed[year][..., k].sum())
+            order.append((flexibility, -demand.get(teacher, 0), -credits, y, k))
+    order.sort()
+
+    ok = True
+    for _, _, _, y, k in order:
+        for _ in range(state.entries[y][k][1]):
+            cell = state.best_cell(y, k) or state.local_fix(y, k)
+            if cell is None:
+                ok = False
+                break
+            if state.grid[y, cell[0], cell[1]] != k:
+                state.place(y, k, *cell)
+    ok = ok and not (state.grid == UNPLACED).any()
+    return ok, state
+
+
+def solve_department_fast(scheduler, solver=None):
+    """Greedy first, CP-SAT (hinted with the greedy cells) if that fails. Same return value as solve()."""
+    if scheduler.engine == SOFT:
+        # soft.SoftTimetableScheduler: optimizes within its deadline, greedy cells as the hint.
+        return scheduler.solve(solver)
+    with instrument.span("greedy"):
+        ok, state = greedy_department(scheduler)
+        grid, cells = state.grid, state.cells()
+        ok = ok and check_department(scheduler, cells).ok
+    if ok:
+        scheduler.cells = cells
+        scheduler.status = cp_model.FEASIBLE
+        scheduler.engine = GREEDY
+        return scheduler.solution()
+    if scheduler.engine == LOCAL_SEARCH:
+        # localsearch.LocalSearchScheduler: no CP-SAT model; it repairs the greedy grid itself.
+        return scheduler.solve(solver)
+
+    if scheduler.model is None:
+        with instrument.span("build"):
+            scheduler.build_model()
+    for y, year in enumerate(scheduler.years):
+        for d in range(grid.shape[1]):
+            for p in range(grid.shape[2]):
+                if grid[y, d, p] >= 0 and (year, d, p) in scheduler.X:
+                    scheduler.model.AddHint(scheduler.X[(year, d, p)], int(grid[y, d, p]))
+    scheduler.engine = CP_SAT
+    return scheduler.solve(solver)
+
+
+# ---------- lab ----------
+
+def greedy_lab(scheduler):
+    """
+    Greedy placement for a lab_model.LabTimetableScheduler. Returns (ok, grid)
+    with grid (days, periods) of class indices into scheduler.entry_ids, -1 empty.
+    """
+    compiled = scheduler.compiled_rules()
+    allowed, pinned = compiled.allowed, compiled.pinned
+    num_days, num_periods = len(scheduler.days), len(scheduler.periods)
+    grid = np.full((num_days, num_periods), UNPLACED, dtype=np.int64)
+    counts = [scheduler.required_counts[entry_id] for entry_id in scheduler.entry_ids]
+    order = sorted(range(len(counts)), key=lambda k: (int(allowed[..., k].sum()), -counts[k], k))
+
+    ok = True
+    for k in order:
+        for _ in range(counts[k]):
+            best, best_key = None, None
+            for d in range(num_days):
+                if (grid[d] == k).any():
+                    continue  # once per day
+                for p in range(num_periods):
+                    if grid[d, p] != UNPLACED or not allowed[d, p, k]:
+                        continue
+                    # Pinned slots first (they must be filled), then the emptiest day.
+                    key = (not pinned[d, p], -(grid[d] == UNPLACED).sum(), d, p)
+                    if best_key is None or key < best_key:
+                        best, best_key = (d, p), key
+            if best is None:
+                ok = False
+                break
+            grid[best] = k
+    ok = ok and not (pinned & (grid == UNPLACED)).any()
+    return ok, grid
+
+
+def solve_lab_fast(scheduler, solver=None):
+    """Lab counterpart of solve_department_fast()."""
+    with instrument.span("greedy"):
+        ok, grid = greedy_lab(scheduler)
+        ids = np.array(scheduler.entry_ids or [0], dtype=GRID_DTYPE)
+        cells = np.where(grid >= 0, ids[np.maximum(grid, 0)], 0).astype(GRID_DTYPE)[None]
+        ok = ok and check_lab(scheduler, cells).ok
+    if ok:
+        scheduler.cells = cells
+        scheduler.status = cp_model.FEASIBLE
+        scheduler.engine = GREEDY
+        return scheduler.solution()
+
+    if scheduler.model is None:
+        with instrument.span("build"):
+            scheduler.build_model()
+    for d, day in enumerate(scheduler.days):
+        for p, period in enumerate(scheduler.periods):
+            for k, entry_id in enumerate(scheduler.entry_ids):
+                var = scheduler.timetable.get((day, period, entry_id))
+                if var is not None:
+                    scheduler.model.AddHint(var, int(grid[d, p] == k))
+    scheduler.engine = CP_SAT
+    return scheduler.solve(solver)
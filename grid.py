@@ -0,0 +1,138 @@
+import re
+
+import numpy as np
+
+# ========== GRID LAYOUT ==========
+# A timetable grid is an integer array indexed (day, period) or, once split
+# by year, (day, period, year). Each cell holds an entry id from the shared
+# registry (registry.Registry), with EMPTY (0) marking a free slot. Strings
+# only appear at the edges: when the lab solution is read in and when
+# schedules are written out.
+
+DAYS = ["Day 1", "Day 2", "Day 3", "Day 4", "Day 5", "Day 6"]
+PERIODS = ["Period 1", "Period 2", "Period 3", "Period 4", "Period 5"]
+YEARS = ["1st Year", "2nd Year", "3rd Year"]
+
+EMPTY = 0
+EMPTY_NAME = "Empty"
+NO_YEAR = -1
+DEFAULT_SECTION = "A"
+
+GRID_DTYPE = np.int32
+
+_YEAR_PREFIX = re.compile(r"^(1st Year|2nd Year|3rd Year)[_\s]+")
+
+
+def remove_year_prefix(subject):
+    """
+    Removes '1st Year', '2nd Year', or '3rd Year' prefix from the subject string.
+    e.g. '1st Year_C++ Lab' -> 'C++ Lab'
+    """
+    return _YEAR_PREFIX.sub("", subject)
+
+
+def label_key(label):
+    """Sort key for 'Day N' / 'Period N' labels (numeric suffix)."""
+    return int(label.split()[-1])
+
+
+# ========== EDGE CONVERSIONS ==========
+
+def schedule_to_grid(schedule_data, registry, days=None, periods=None):
+    """
+    Converts the Firestore lab schedule
+        {"Day 1": {"Period 1": "1st Year_C++ Lab", ...}, ...}
+    into a (day, period) entry-id grid. Missing days or periods become EMPTY.
+    Returns (grid, days, periods).
+    """
+    if days is None:
+        days = sorted(schedule_data.keys(), key=label_key) or list(DAYS)
+    if periods is None:
+        keys = set()
+        for day_periods in schedule_data.values():
+            if isinstance(day_periods, dict):
+                keys.update(day_periods.keys())
+        periods = sorted(keys, key=label_key) or list(PERIODS)
+
+    grid = np.full((len(days), len(periods)), EMPTY, dtype=GRID_DTYPE)
+    period_index = {p: j for j, p in enumerate(periods)}
+    for i, day in enumerate(days):
+        day_periods = schedule_data.get(day)
+        if not isinstance(day_periods, dict):
+            continue
+        for period, subject in day_periods.items():
+            j = period_index.get(period)
+            if j is not None:
+                grid[i, j] = registry.parse_lab_cell(subject)
+    return grid, list(days), list(periods)
+
+
+def grid_to_schedule_dict(grid, registry, days, periods):
+    """Converts a (day, period) entry-id grid back to {day: {period: subject}}."""
+    names = registry.subject_names()[grid]
+    return {
+        day: {period: names[i, j] for j, period in enumerate(periods)}
+        for i, day in enumerate(days)
+    }
+
+
+def schedule_dict_to_grid(schedule, registry, year, days=None, periods=None):
+    """Converts one year's plain {day: {period: subject}} dict to an entry-id grid."""
+    if days is None:
+        days = sorted(schedule.keys(), key=label_key)
+    if periods is None:
+        periods = sorted(next(iter(schedule.values()), {}).keys(), key=label_key)
+    grid = np.full((len(days), len(periods)), EMPTY, dtype=GRID_DTYPE)
+    for i, day in enumerate(days):
+        for j, period in enumerate(periods):
+            subject = schedule.get(day, {}).get(period, EMPTY_NAME)
+            grid[i, j] = registry.entry(year, DEFAULT_SECTION, subject)
+    return grid
+
+
+# ========== VECTORIZED OPERATIONS ==========
+
+def split_by_year(lab_grid, registry):
+    """
+    Splits a lab grid (..., day, period) of entry ids into a (..., day,
+    period, year) grid. A cell keeps its entry only in the year it belongs
+    to; every other year sees EMPTY. Leading batch axes are carried through,
+    so many section grids can be split at once.
+    """
+    year_of = registry.year_of()[lab_grid]
+    year_axis = np.arange(len(registry.years), dtype=np.int8)
+    return np.where(year_of[..., None] == year_axis, lab_grid[..., None], EMPTY).astype(GRID_DTYPE)
+
+
+def empty_mask(grid):
+    """Boolean mask of free slots."""
+    return grid == EMPTY
+
+
+def fill_extra_subjects_grid(year_grid, extra_subjects):
+    """
+    Grid form of general.fill_extra_subjects. `year_grid` is (..., day,
+    period) for a single year; `extra_subjects` is an ordered list of
+    (entry_id, required_count). For each subject in turn, days that do not
+    already hold it and still have a free slot are eligible; the first
+    `required_count` of them receive the subject in their first free period.
+    The grid is modified in place and returned.
+    """
+    for eid, required_count in extra_subjects:
+        if required_count <= 0:
+            continue
+        free = year_grid == EMPTY
+        eligible = free.any(axis=-1) & ~(year_grid == eid).any(axis=-1)
+        chosen = eligible & (np.cumsum(eligible, axis=-1) <= required_count)
+        first_free = free.argmax(axis=-1)
+        idx = np.nonzero(chosen)
+        year_grid[idx + (first_free[idx],)] = eid
+    return year_grid
+
+
+def placed_counts(year_grid, num_entries):
+    """Occurrences of each entry id in a (..., day, period) grid."""
+    flat = year_grid.reshape(-1, year_grid.shape[-2] * year_grid.shape[-1])
+    offsets = np.arange(flat.shape[0])[:, None] * num_entries
+    counts = np.bincount((flat + offsets).ravel(), minlength=flat.shape[0] * num_entries)
+    return counts.reshape(year_grid.shape[:-2] + (num_entries,))
@@ -0,0 +1,185 @@
+import json
+import random
+
+from grid import DAYS, PERIODS, YEARS
+
+# ========== SYNTHETIC INSTANCE GENERATOR ==========
+# Seeded, realistic inputs for all three stages, shaped exactly like the
+# Firestore documents the stages read:
+#
+#   lab_classes     [[year, subject, required_count], ...]    (lab.py)
+#   extra_subjects  {year: {subject: count}}                  (general.py)
+#   candidates      {row: [(subject, credits, teacher), ...]} (depart.py)
+#   labs            {room: capacity}
+#
+# Rows are the years when sections == 1 (so the 3rd Year 'Free' pin in
+# cell_rules.json applies unchanged) and "<year> <section>" otherwise. Candidate
+# credits always add up to days * periods per row and respect the per-day
+# limit of the department model, and no teacher is given more than the
+# 18-period load cap, so generated department instances are not trivially
+# infeasible. When the teachers run out of capacity, further subjects are
+# left without a teacher.
+
+LANGUAGE_SUBJECTS = ["English", "Tamil"]
+FREE_SUBJECT = "Free"
+FREE_CREDITS = 4
+TEACHER_LOAD_CAP = 18
+MAX_PER_DAY = 2
+
+
+def row_labels(years, sections):
+    if len(sections) == 1:
+        return list(years)
+    return [f"{year} {section}" for year in years for section in sections]
+
+
+def _split_credits(total, parts, low, high, rng):
+    """Random integers in [low, high] summing to `total` (parts * low <= total <= parts * high)."""
+    credits = [low] * parts
+    remaining = total - low * parts
+    while remaining > 0:
+        i = rng.randrange(parts)
+        if credits[i] < high:
+            credits[i] += 1
+            remaining -= 1
+    return credits
+
+
+def generate_instance(
+    seed=0,
+    years=3,
+    sections=1,
+    teachers=8,
+    subjects_per_year=6,
+    lab_subjects_per_year=2,
+    min_credits=2,
+    max_credits=6,
+    labs=1,
+    lab_capacity=(30, 60),
+    shared_teacher_density=0.3,
+    num_days=len(DAYS),
+    num_periods=len(PERIODS),
+):
+    """
+    Returns an instance dict (see module comment) plus its "params".
+
+    shared_teacher_density is the probability that a subject is taught by a
+    teacher drawn from a small shared pool (faculty teaching several years or
+    sections) rather than by the least-loaded teacher overall.
+    """
+    params = dict(locals())
+    rng = random.Random(seed)
+    year_names = (YEARS + [f"{n}th Year" for n in range(4, 10)])[:years]
+    section_names = [chr(ord("A") + s) for s in range(sections)]
+    days = DAYS[:num_days] if num_days <= len(DAYS) else [f"Day {d}" for d in range(1, num_days + 1)]
+    periods = [f"Period {p}" for p in range(1, num_periods + 1)]
+    slots = num_days * num_periods
+    max_credits = min(max_credits, MAX_PER_DAY * num_days)
+
+    teacher_names = [f"teacher{t:02d}" for t in range(teachers)]
+    shared_pool = teacher_names[: max(1, teachers // 4)]
+    load = {t: 0 for t in teacher_names}
+
+    def pick_teacher(credits):
+        pool = shared_pool if rng.random() < shared_teacher_density else teacher_names
+        options = [t for t in pool if load[t] + credits <= TEACHER_LOAD_CAP]
+        if not options:
+            options = [t for t in teacher_names if load[t] + credits <= TEACHER_LOAD_CAP]
+        if not options:
+            return None
+        teacher = min(options, key=lambda t: (load[t], rng.random()))
+        load[teacher] += credits
+        return teacher
+
+    candidates = {}
+    lab_classes = []
+    extra_subjects = {}
+    for y, year in enumerate(year_names):
+        subject_names = [f"Y{y + 1}S{i + 1}" for i in range(subjects_per_year)]
+        lab_names = [f"Y{y + 1}Lab{i + 1}" for i in range(lab_subjects_per_year)]
+        with_free = year == "3rd Year" and sections == 1
+
+        for section in section_names:
+            row = year if sections == 1 else f"{year} {section}"
+            reserved = FREE_CREDITS if with_free else 0
+            names = LANGUAGE_SUBJECTS + subject_names + [f"{name} Lab" for name in lab_names]
+            parts = len(names)
+            low = min(min_credits, (slots - reserved) // parts)
+            high = max(max_credits, -(-(slots - reserved) // parts))
+            credits = _split_credits(slots - reserved, parts, low, min(high, MAX_PER_DAY * num_days), rng)
+            rows = []
+            for name, credit in zip(names, credits):
+                teacher = None if name in LANGUAGE_SUBJECTS else pick_teacher(credit)
+                rows.append((name, credit, teacher))
+            if with_free:
+                rows.append((FREE_SUBJECT, FREE_CREDITS, None))
+            candidates[row] = rows
+
+        for name in lab_names:
+            lab_classes.append([year, name, rng.randint(2, min(6, num_days))])
+        extra_subjects[year] = {name: rng.randint(3, num_days) for name in LANGUAGE_SUBJECTS}
+
+    # The lab model allows one class per slot, so keep the total within the grid.
+    while sum(c[2] for c in lab_classes) > slots and any(c[2] > 1 for c in lab_classes):
+        max(lab_classes, key=lambda c: c[2])[2] -= 1
+
+    lab_rooms = {f"Lab {i + 1}": rng.randint(*lab_capacity) for i in range(labs)}
+
+    return {
+        "params": params,
+        "years": year_names,
+        "sections": section_names,
+        "rows": row_labels(year_names, section_names),
+        "days": days,
+        "periods": periods,
+        "lab_classes": lab_classes,
+        "labs": lab_rooms,
+        "extra_subjects": extra_subjects,
+        "candidates": candidates,
+        "teacher_load": load,
+    }
+
+
+def save_instance(instance, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(instance, f, indent=2)
+    return path
+
+
+def load_instance(path):
+    with open(path, encoding="utf-8") as f:
+        instance = json.load(f)
+    instance["candidates"] = {
+        row: [tuple(c) for c in rows] for row, rows in instance["candidates"].items()
+    }
+    return instance
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic timetable instance as JSON.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--sections", type=int, default=1)
+    parser.add_argument("--teachers", type=int, default=8)
+    parser.add_argument("--subjects", type=int, default=6, help="subjects per year (besides languages and labs)")
+    parser.add_argument("--lab-subjects", type=int, default=2, help="lab subjects per year")
+    parser.add_argument("--labs", type=int, default=1, help="lab rooms")
+    parser.add_argument("--shared", type=float, default=0.3, help="shared-teacher density")
+    parser.add_argument("--out", default="-")
+    args = parser.parse_args()
+
+    instance = generate_instance(
+        seed=args.seed, years=args.years, sections=args.sections, teachers=args.teachers,
+        subjects_per_year=args.subjects, lab_subjects_per_year=args.lab_subjects,
+        labs=args.labs, shared_teacher_density=args.shared,
+    )
+    if args.out == "-":
+        print(json.dumps(instance, indent=2))
+    else:
+        print(f"Saved {save_instance(instance, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
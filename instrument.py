@@ -0,0 +1,203 @@
+import atexit
+import json
+import os
+import re
+import time
+import uuid
+from contextlib import nullcontext
+
+# ========== TIMING SPANS & SOLVER STATISTICS ==========
+# Disabled unless a sink is configured, either from the environment
+#
+#   TIMETABLE_METRICS=metrics.jsonl   one JSON object per span / solve
+#   TIMETABLE_PROM=timetable.prom     Prometheus text file (node_exporter
+#                                     textfile collector), rewritten on flush()
+#
+# or by calling enable(). While disabled, span() returns one shared no-op
+# context manager and the other calls return right away, so the stages can
+# leave them in place.
+#
+# Spans nest; a record's "span" is the slash-joined path, e.g. "lab/solve".
+#   {"type": "span", "run": ..., "span": "lab/fetch", "start": ..., "seconds": ...}
+#   {"type": "solver", "run": ..., "span": "lab/solve", "status": "OPTIMAL",
+#    "wall_time": ..., "presolve_time": ..., "conflicts": ..., "branches": ...}
+
+_NOOP = nullcontext()
+_recorder = None
+
+_SEARCH_START = re.compile(r"Starting search at ([0-9.]+)s")
+
+
+class Recorder:
+    def __init__(self, jsonl_path=None, prom_path=None, run_id=None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.stack = []
+        self.spans = {}    # path -> seconds (last value), for the Prometheus file
+        self.solves = {}   # path -> solver record
+        self._out = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+
+    def path(self, name=None):
+        parts = self.stack + ([name] if name else [])
+        return "/".join(parts)
+
+    def emit(self, record):
+        if self._out is not None:
+            self._out.write(json.dumps(dict(record, run=self.run_id)) + "\n")
+            self._out.flush()
+
+    def close(self):
+        self.write_prometheus()
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+
+    def write_prometheus(self):
+        if not self.prom_path:
+            return
+        lines = [
+            "# HELP timetable_span_seconds Wall-clock seconds spent in a pipeline phase.",
+            "# TYPE timetable_span_seconds gauge",
+        ]
+        lines += [f'timetable_span_seconds{{span="{path}"}} {seconds:.6f}' for path, seconds in self.spans.items()]
+        for field, kind, help_text in SOLVER_METRICS:
+            lines.append(f"# HELP timetable_solver_{field} {help_text}")
+            lines.append(f"# TYPE timetable_solver_{field} {kind}")
+            for path, record in self.solves.items():
+                if record.get(field) is not None:
+                    lines.append(f'timetable_solver_{field}{{span="{path}",status="{record["status"]}"}} {record[field]}')
+        # Write then rename, so the collector never reads a half-written file.
+        tmp_path = f"{self.prom_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prom_path)
+
+
+SOLVER_METRICS = [
+    ("wall_time", "gauge", "CP-SAT wall time in seconds."),
+    ("user_time", "gauge", "CP-SAT user time in seconds."),
+    ("presolve_time", "gauge", "Seconds from solve start until search started."),
+    ("deterministic_time", "gauge", "CP-SAT deterministic time."),
+    ("conflicts", "gauge", "CP-SAT conflicts."),
+    ("branches", "gauge", "CP-SAT branches."),
+    ("booleans", "gauge", "Boolean variables after presolve."),
+    ("restarts", "gauge", "CP-SAT restarts."),
+]
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "attrs", "start")
+
+    def __init__(self, recorder, name, attrs):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.recorder.stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        recorder = self.recorder
+        path = recorder.path()
+        recorder.stack.pop()
+        recorder.spans[path] = seconds
+        record = {"type": "span", "span": path, "start": time.time() - seconds, "seconds": seconds}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.attrs:
+            record.update(self.attrs)
+        recorder.emit(record)
+        return False
+
+
+def enable(jsonl_path=None, prom_path=None, run_id=None):
+    """Starts recording. Returns the Recorder; disable() flushes and stops it."""
+    global _recorder
+    disable()
+    _recorder = Recorder(jsonl_path, prom_path, run_id)
+    return _recorder
+
+
+def disable():
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+atexit.register(disable)
+
+
+def enabled():
+    return _recorder is not None
+
+
+def flush():
+    """Rewrites the Prometheus file with everything recorded so far."""
+    if _recorder is not None:
+        _recorder.write_prometheus()
+
+
+def span(name, **attrs):
+    """Context manager timing one phase: `with instrument.span("fetch"): ...`."""
+    if _recorder is None:
+        return _NOOP
+    return _Span(_recorder, name, attrs)
+
+
+def watch_solver(solver):
+    """
+    Captures the CP-SAT log of `solver` (without printing it) so solver_stats()
+    can report presolve time. Returns the list the log lines go to, or None.
+    """
+    if _recorder is None:
+        return None
+    lines = []
+    solver.parameters.log_search_progress = True
+    solver.parameters.log_to_stdout = False
+    solver.log_callback = lines.append
+    return lines
+
+
+def solver_stats(solver, status, log_lines=None, **attrs):
+    """Records CP-SAT's response statistics for the solve that just finished."""
+    if _recorder is None:
+        return None
+    response = solver.ResponseProto()
+    presolve_time = None
+    for line in log_lines or ():
+        match = _SEARCH_START.search(line)
+        if match:
+            presolve_time = float(match.group(1))
+            break
+    record = {
+        "type": "solver",
+        "span": _recorder.path(),
+        "status": solver.StatusName(status),
+        "wall_time": solver.WallTime(),
+        "user_time": solver.UserTime(),
+        "presolve_time": presolve_time,
+        "deterministic_time": response.deterministic_time,
+        "conflicts": solver.NumConflicts(),
+        "branches": solver.NumBranches(),
+        "booleans": response.num_booleans,
+        "restarts": response.num_restarts,
+    }
+    record.update(attrs)
+    _recorder.solves[record["span"]] = record
+    _recorder.emit(record)
+    return record
+
+
+def enable_from_env():
+    jsonl_path = os.environ.get("TIMETABLE_METRICS")
+    prom_path = os.environ.get("TIMETABLE_PROM")
+    if (jsonl_path or prom_path) and _recorder is None:
+        enable(jsonl_path, prom_path, os.environ.get("TIMETABLE_RUN_ID"))
+
+
+enable_from_env()
@@ -0,0 +1,303 @@
+import json
+import sqlite3
+import time
+
+# ========== SCHEDULING JOB QUEUES ==========
+# A job moves pending -> processing -> done | failed. Two backends share the
+# same small interface (enqueue / claim / mark_done / mark_failed / get /
+# status / spec):
+#
+#   SQLiteQueue     - local file, no network; used for tests and single-box runs
+#   FirestoreQueue  - the timetableLAB_request collection the Cloud Function
+#                     already writes to
+#
+# A claimed job is a plain dict: {"id", "kind", "department", "year", "payload"}.
+#
+# Coalescing: requests with the same (kind, department, year) key replace
+# each other. claim() waits until a key has been quiet for `debounce`
+# seconds, claims only its newest pending request and marks every older
+# pending or processing request for that key superseded. Workers check for
+# that status before publishing, so only the newest result is written.
+# Jobs without a department and year are never coalesced.
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+
+
+def coalesce_key(job):
+    """(kind, department, year), or None for jobs that must not be coalesced."""
+    if job.get("department") is None and job.get("year") is None:
+        return None
+    return (job["kind"], job.get("department"), job.get("year"))
+
+
+def plan_claims(pending, processing, now, debounce, limit):
+    """
+    Decides which jobs to claim and which to supersede.
+    `pending` / `processing` are lists of job dicts carrying "created_at".
+    Returns (to_claim, to_supersede), both lists of job dicts.
+    """
+    groups = {}
+    singles = []
+    for job in pending:
+        key = coalesce_key(job)
+        if key is None:
+            singles.append(job)
+        else:
+            groups.setdefault(key, []).append(job)
+
+    to_claim, to_supersede = [], []
+    for job in singles:
+        if job["created_at"] <= now - debounce:
+            to_claim.append(job)
+    for key, jobs in groups.items():
+        newest = max(jobs, key=lambda j: (j["created_at"], str(j["id"])))
+        if newest["created_at"] > now - debounce:
+            continue  # still inside the debounce window; wait for the burst to end
+        to_claim.append(newest)
+        to_supersede.extend(j for j in jobs if j is not newest)
+        to_supersede.extend(j for j in processing if coalesce_key(j) == key)
+
+    to_claim.sort(key=lambda j: j["created_at"])
+    claimed = to_claim[:limit]
+    # Only supersede for keys we actually claimed this round.
+    claimed_keys = {coalesce_key(j) for j in claimed}
+    to_supersede = [j for j in to_supersede if coalesce_key(j) in claimed_keys]
+    return claimed, to_supersede
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    department TEXT,
+    year TEXT,
+    payload TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+class SQLiteQueue:
+    """Job queue in a local SQLite file. Safe to share between processes."""
+
+    def __init__(self, path="jobs.db"):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, kind, payload=None, department=None, year=None):
+        now = time.time()
+        cur = self.conn.execute(
+            "INSERT INTO jobs (kind, department, year, payload, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, department, year, json.dumps(payload or {}), PENDING, now, now),
+        )
+        return cur.lastrowid
+
+    def spec(self):
+        """Picklable description used by pool processes to reopen the queue."""
+        return ("sqlite", self.path)
+
+    def claim(self, limit=1, debounce=0.0):
+        """
+        Atomically moves up to `limit` pending jobs to processing and returns
+        them, coalescing same-key requests (see plan_claims).
+        """
+        if limit <= 0:
+            return []
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY id", (PENDING, PROCESSING)
+            ).fetchall()
+            jobs = [dict(self._job(row), status=row["status"], created_at=row["created_at"]) for row in rows]
+            now = time.time()
+            claimed, superseded = plan_claims(
+                [j for j in jobs if j["status"] == PENDING],
+                [j for j in jobs if j["status"] == PROCESSING],
+                now, debounce, limit,
+            )
+            self.conn.executemany(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                [(SUPERSEDED, now, job["id"]) for job in superseded]
+                + [(PROCESSING, now, job["id"]) for job in claimed],
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [
+            {k: job[k] for k in ("id", "kind", "department", "year", "payload")}
+            for job in claimed
+        ]
+
+    def status(self, job_id):
+        row = self.conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else row["status"]
+
+    def has_pending(self):
+        return self.conn.execute("SELECT 1 FROM jobs WHERE status = ? LIMIT 1", (PENDING,)).fetchone() is not None
+
+    def _set_status(self, job_id, status, result=None, error=None):
+        # Only a job still in processing can finish; a superseded job keeps that status.
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (status, None if result is None else json.dumps(result), error, time.time(), job_id, PROCESSING),
+        )
+
+    def mark_done(self, job_id, result=None):
+        self._set_status(job_id, DONE, result=result)
+
+    def mark_failed(self, job_id, error):
+        self._set_status(job_id, FAILED, error=str(error))
+
+    def get(self, job_id):
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._job(row)
+        job.update(
+            status=row["status"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+        )
+        return job
+
+    def counts(self):
+        """{status: number of jobs}."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    @staticmethod
+    def _job(row):
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "department": row["department"],
+            "year": row["year"],
+            "payload": json.loads(row["payload"] or "{}"),
+        }
+
+
+def open_queue_spec(spec):
+    """Reopens a queue from its spec() inside another process."""
+    kind, location = spec
+    if kind == "sqlite":
+        return SQLiteQueue(location)
+    from firebase_db import get_db
+
+    return FirestoreQueue(get_db(), location)
+
+
+class FirestoreQueue:
+    """
+    Job queue over /timetableLAB_request documents ({status, type, year, ...}).
+    Every status change uses the document's update_time as a precondition,
+    so two workers can never both move the same request to processing, a
+    request that finished meanwhile is never marked superseded, and a
+    superseded request is never marked done or failed.
+    """
+
+    def __init__(self, db, collection="timetableLAB_request"):
+        self.db = db
+        self.collection = collection
+
+    def _ref(self, job_id):
+        return self.db.collection(self.collection).document(job_id)
+
+    def enqueue(self, kind, payload=None, department=None, year=None):
+        ref = self.db.collection(self.collection).document()
+        ref.set({"type": kind, "department": department, "year": year,
+                 "payload": payload or {}, "status": PENDING, "created_at": time.time()})
+        return ref.id
+
+    def spec(self):
+        return ("firestore", self.collection)
+
+    def claim(self, limit=1, debounce=0.0):
+        if limit <= 0:
+            return []
+        docs = {}
+        jobs = {PENDING: [], PROCESSING: []}
+        for status in (PENDING, PROCESSING):
+            for doc in self.db.collection(self.collection).where("status", "==", status).stream():
+                data = doc.to_dict()
+                docs[doc.id] = doc
+                jobs[status].append({
+                    "id": doc.id,
+                    "kind": data.get("type"),
+                    "department": data.get("department"),
+                    "year": data.get("year"),
+                    "payload": data.get("payload") or {},
+                    "created_at": data.get("created_at") or doc.create_time.timestamp(),
+                })
+        now = time.time()
+        planned, superseded = plan_claims(jobs[PENDING], jobs[PROCESSING], now, debounce, limit)
+        for job in superseded:
+            doc = docs[job["id"]]
+            try:
+                doc.reference.update(
+                    {"status": SUPERSEDED, "updated_at": now},
+                    option=self.db.write_option(last_update_time=doc.update_time),
+                )
+            except Exception:
+                continue  # it finished or changed since the snapshot; leave it
+
+        claimed = []
+        for job in planned:
+            doc = docs[job["id"]]
+            try:
+                doc.reference.update(
+                    {"status": PROCESSING, "updated_at": now},
+                    option=self.db.write_option(last_update_time=doc.update_time),
+                )
+            except Exception:
+                continue  # another worker got there first
+            claimed.append({k: job[k] for k in ("id", "kind", "department", "year", "payload")})
+        return claimed
+
+    def status(self, job_id):
+        doc = self._ref(job_id).get()
+        return doc.to_dict().get("status") if doc.exists else None
+
+    def has_pending(self):
+        query = self.db.collection(self.collection).where("status", "==", PENDING).limit(1)
+        return any(True for _ in query.stream())
+
+    def _set_status(self, job_id, fields):
+        # Only a job still in processing can finish; a superseded job keeps that status.
+        doc = self._ref(job_id).get()
+        if not doc.exists or doc.to_dict().get("status") != PROCESSING:
+            return False
+        try:
+            doc.reference.update(dict(fields, updated_at=time.time()),
+                                 option=self.db.write_option(last_update_time=doc.update_time))
+        except Exception:
+            return False  # superseded (or otherwise changed) since the read
+        return True
+
+    def mark_done(self, job_id, result=None):
+        self._set_status(job_id, {"status": DONE, "result": result})
+
+    def mark_failed(self, job_id, error):
+        self._set_status(job_id, {"status": FAILED, "error": str(error)})
+
+    def get(self, job_id):
+        doc = self._ref(job_id).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        data["id"] = job_id
+        return data
@@ -1,18 +1,18 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-import csv
-from ortools.sat.python import cp_model
-
-# Initialize Firebase
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+import instrument
+from alternatives import ALTERNATIVES, offer_alternatives
+from artifact import archive_artifact
+from departments import as_department
+from firebase_db import get_db
+from greedy import solve_lab_fast
+from lab_model import LabTimetableScheduler
+from publish import Manifest, PublishStats, publish_document
+from validate import check_lab
+from views import publish_views
 
 # Fetch classes from Firestore
-def fetch_classes_from_firestore():
-    classes_ref = db.collection("timetableLAB_request").document("classes")
+def fetch_classes_from_firestore(db=None, department=None):
+    db = db or get_db()
+    classes_ref = db.document(as_department(department).lab_classes_path)
     classes_doc = classes_ref.get()
     
     if not classes_doc.exists:
@@ -24,71 +24,84 @@ def fetch_classes_from_firestore():
     
     return classes_list
 
-# Timetable Model
-days = ["Day 1", "Day 2", "Day 3", "Day 4", "Day 5", "Day 6"]
-periods = [1, 2, 3, 4, 5]
-model = cp_model.CpModel()
-
-# Variables
-classes = fetch_classes_from_firestore()
-if not classes:
-    print("No classes found. Exiting.")
-    exit()
-
-timetable = {}
-for day in days:
-    for period in periods:
-        for cls in classes:
-            timetable[(day, period, cls[1])] = model.NewBoolVar(f"{day}_{period}_{cls[1]}")
-
-# Constraints
-for cls in classes:
-    num_periods_assigned = sum(timetable[(day, period, cls[1])] for day in days for period in periods)
-    model.Add(num_periods_assigned == cls[2])
-
-for day in days:
-    for cls in classes:
-        num_periods_assigned = sum(timetable[(day, period, cls[1])] for period in periods)
-        model.Add(num_periods_assigned <= 1)
-
-for day in days:
-    for period in periods:
-        num_classes_assigned = sum(timetable[(day, period, cls[1])] for cls in classes)
-        model.Add(num_classes_assigned <= 1)
-
-# Solve
-solver = cp_model.CpSolver()
-status = solver.Solve(model)
-
 # Function to push timetable to Firestore
-def push_timetable_to_firestore(timetable_solution):
-    timetable_ref = db.collection("2025").document("labsolutionBCA")
-    
+def push_timetable_to_firestore(timetable_solution, db=None, manifest=None, department=None):
+    """
+    Publishes one document per day, writing only the days (and periods)
+    that changed since the last publish. Returns publish.PublishStats.
+    """
+    db = db or get_db()
+    department = as_department(department)
+    manifest = manifest or Manifest()
+    stats = PublishStats()
+
     for day, periods in timetable_solution.items():
         try:
-            day_ref = timetable_ref.collection(day).document("schedule")
-            day_ref.set(periods)
-            print(f"✅ Successfully stored {day} in Firestore: {periods}")
+            changed = publish_document(db, department.lab_solution_path(day), periods, manifest, stats)
+            if changed:
+                print(f"✅ Successfully stored {day} in Firestore ({len(changed)} periods changed)")
+            else:
+                print(f"⏭ {day} unchanged; not rewritten")
         except Exception as e:
             print(f"❌ Error storing {day}: {e}")
+    manifest.save()
+    print(stats.summary())
+    return stats
 
-# Store solution if feasible
-if status == cp_model.FEASIBLE or status == cp_model.OPTIMAL:
-    timetable_solution = {}
-    
-    for day in days:
-        day_schedule = {}
-        for period in periods:
-            assigned = "Empty"
-            for cls in classes:
-                if solver.Value(timetable[(day, period, cls[1])]):
-                    assigned = f"{cls[0]}_{cls[1]}"
-                    break
-            day_schedule[f"Period {period}"] = assigned
-        timetable_solution[day] = day_schedule
+def run(db=None, should_publish=None, department=None):
+    """
+    Lab stage: fetch classes, solve, archive and publish.
+    Returns the {day: {period: cell}} solution, or None.
+    `should_publish`, if given, is asked right before writing; the worker uses
+    it to drop results of requests that were superseded mid-solve.
+    `department` (departments.py) picks the Firestore paths; default BCA/2025.
+    """
+    with instrument.span("lab"):
+        db = db or get_db()
+        department = as_department(department)
+        with instrument.span("fetch"):
+            classes = fetch_classes_from_firestore(db, department)
+        if not classes:
+            print("No classes found. Exiting.")
+            return None
+
+        scheduler = LabTimetableScheduler(classes)
+        # Greedy placement first; CP-SAT only if that cannot place every class.
+        timetable_solution = solve_lab_fast(scheduler)
+        if timetable_solution is None:
+            print("❌ No solution found.")
+            return None
+        print(f"✅ Timetable found ({scheduler.engine}).")
+        with instrument.span("validate"):
+            report = check_lab(scheduler, scheduler.cells)
+        if not report.ok:
+            print(f"❌ {report.summary()}")
+            return None
+
+        if should_publish is not None and not should_publish():
+            print("⏭ Request superseded; not publishing this timetable.")
+            return None
+
+        # Keep a compact binary copy of this solve alongside the Firestore documents
+        with instrument.span("archive"):
+            print(f"Archived solve to {archive_artifact(scheduler.to_artifact(), 'lab')}")
+
+        # Push to Firestore
+        with instrument.span("upload"):
+            push_timetable_to_firestore(timetable_solution, db, department=department)
+            manifest = Manifest()
+            stats = publish_views(db, lab_artifact=scheduler.to_artifact(), base=department.views_base,
+                                  manifest=manifest)
+            manifest.save()
+            print(f"Lab room views: {stats.summary()}")
+        # TIMETABLE_ALTERNATIVES=N: also store N-1 clearly different timetables to pick from.
+        if ALTERNATIVES > 1:
+            with instrument.span("alternatives"):
+                offer_alternatives(db, scheduler, "lab", department, manifest=manifest)
+                manifest.save()
+        print("✅ Timetable successfully stored in Firestore.")
+    instrument.flush()
+    return timetable_solution
 
-    # Push to Firestore
-    push_timetable_to_firestore(timetable_solution)
-    print("✅ Timetable successfully stored in Firestore.")
-else:
-    print("❌ No solution found.")
+if __name__ == "__main__":
+    run()
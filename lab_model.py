@@ -0,0 +1,160 @@
+import numpy as np
+from ortools.sat.python import cp_model
+
+import cancellation
+import instrument
+from artifact import LAB_FORMAT, TimetableArtifact
+from cellrules import compile_rules, load_rules
+from extract import decode_one_hot, solution_values
+from grid import DAYS
+from modelstats import FamilyTracker, report
+from registry import Registry
+
+LAB_PERIODS = [1, 2, 3, 4, 5]
+
+
+class LabTimetableScheduler:
+    """
+    Lab timetable model (the CP-SAT part of lab.py).
+
+    classes: [[year, subject, required_count], ...] as stored in
+    /timetableLAB_request/classes. Variables are keyed on registry entry ids,
+    so two years sharing a subject name stay separate.
+
+    rules: pinned/blocked cell rules (see cellrules.py); defaults to
+    cell_rules.json. Blocked slots leave the lab room empty.
+    """
+
+    def __init__(self, classes, days=DAYS, periods=LAB_PERIODS, registry=None, rules=None):
+        self.classes = classes
+        self.days = list(days)
+        self.periods = list(periods)
+        self.registry = registry or Registry()
+        self.rules = load_rules() if rules is None else rules
+        self.model = None
+        self.timetable = {}
+        self.cells = None
+        self.status = None
+        self.engine = None  # "greedy" or "cp-sat" when solved through greedy.solve_lab_fast()
+
+        # Intern (year, subject) once; duplicate rows add up.
+        self.required_counts = {}
+        for entry_id, required_count in self.registry.load_lab_classes(classes):
+            self.required_counts[entry_id] = self.required_counts.get(entry_id, 0) + required_count
+        self.entry_ids = list(self.required_counts)
+
+    def compiled_rules(self):
+        """cellrules.CompiledRules for the lab room (one row, candidates = classes)."""
+        registry = self.registry
+        candidates = [
+            (registry.year_name(entry_id), registry.sections.name(registry.entries[entry_id][1]),
+             registry.subject_name(entry_id))
+            for entry_id in self.entry_ids
+        ]
+        return compile_rules(self.rules, "lab", self.days, self.period_labels(), candidates)
+
+    def build_model(self):
+        """Builds the constraint model for timetable scheduling."""
+        model = cp_model.CpModel()
+        tracker = FamilyTracker(model)
+        timetable = {}
+        days, periods, entry_ids = self.days, self.periods, self.entry_ids
+        registry = self.registry
+        # Cell rules (cell_rules.json) compiled once: a class gets no variable where it is not
+        # allowed, and pinned slots must hold a class.
+        compiled = self.compiled_rules()
+        allowed = compiled.allowed
+        min_classes = compiled.pinned.astype(int)
+
+        # Variables
+        tracker.switch("assignment_vars")
+        for d, day in enumerate(days):
+            for p, period in enumerate(periods):
+                for k, entry_id in enumerate(entry_ids):
+                    if allowed[d, p, k]:
+                        timetable[(day, period, entry_id)] = model.NewBoolVar(f"{day}_{period}_{entry_id}")
+
+        # 1. Each class must have the required number of periods
+        for entry_id in entry_ids:
+            tracker.switch("required_count", registry.render_lab_cell(entry_id))
+            num_periods_assigned = [
+                timetable[(day, period, entry_id)] for day in days for period in periods
+                if (day, period, entry_id) in timetable
+            ]
+            model.Add(sum(num_periods_assigned) == self.required_counts[entry_id])
+
+        # 2. One subject should be placed only once per day
+        for day in days:
+            tracker.switch("once_per_day", day)
+            for entry_id in entry_ids:
+                num_periods_assigned = [
+                    timetable[(day, period, entry_id)] for period in periods if (day, period, entry_id) in timetable
+                ]
+                if num_periods_assigned:
+                    model.Add(sum(num_periods_assigned) <= 1)
+
+        # 3. Each period can only have one class assigned (exactly one in pinned slots)
+        for d, day in enumerate(days):
+            tracker.switch("one_per_period", day)
+            for p, period in enumerate(periods):
+                num_classes_assigned = [
+                    timetable[(day, period, entry_id)] for entry_id in entry_ids if (day, period, entry_id) in timetable
+                ]
+                if num_classes_assigned:
+                    model.AddLinearConstraint(sum(num_classes_assigned), int(min_classes[d, p]), 1)
+        tracker.close()
+
+        self.model = model
+        self.tracker = tracker
+        self.timetable = timetable
+        # Proto indices of the variables as a (day, period, class) array, for bulk extraction;
+        # -1 where a rule left the class without a variable.
+        self.timetable_index = np.full((len(days), len(periods), len(entry_ids)), -1, dtype=np.int64)
+        for d, day in enumerate(days):
+            for p, period in enumerate(periods):
+                for k, entry_id in enumerate(entry_ids):
+                    if (day, period, entry_id) in timetable:
+                        self.timetable_index[d, p, k] = timetable[(day, period, entry_id)].Index()
+        return model
+
+    def model_report(self):
+        """Variables/constraints/terms per rule (see modelstats.report)."""
+        if self.model is None:
+            self.build_model()
+        return report(self.tracker)
+
+    def solve(self, solver=None):
+        """
+        Solves the model. Returns the {day: {"Period N": cell}} solution, or
+        None when no timetable exists. The entry-id grid is kept in self.cells.
+        """
+        if self.model is None:
+            with instrument.span("build"):
+                self.build_model()
+        solver = solver or cp_model.CpSolver()
+        with instrument.span("solve"):
+            log_lines = instrument.watch_solver(solver)
+            with cancellation.stoppable(solver):
+                self.status = solver.Solve(self.model)
+            instrument.solver_stats(solver, self.status, log_lines)
+        if self.status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+        with instrument.span("extract"):
+            # Read every variable at once and decode the one-hot class axis with argmax.
+            self.cells = decode_one_hot(solution_values(solver), self.timetable_index, self.entry_ids)[None]
+            return self.solution()
+
+    def period_labels(self):
+        return [f"Period {period}" for period in self.periods]
+
+    def solution(self):
+        """Renders self.cells in the labsolution layout {day: {"Period N": "1st Year_C++"}}."""
+        rendered = {int(eid): self.registry.render_lab_cell(int(eid)) for eid in np.unique(self.cells)}
+        labels = self.period_labels()
+        return {
+            day: {label: rendered[int(self.cells[0, d, p])] for p, label in enumerate(labels)}
+            for d, day in enumerate(self.days)
+        }
+
+    def to_artifact(self):
+        return TimetableArtifact(self.cells, self.registry, ["Lab"], self.days, self.period_labels(), cell_format=LAB_FORMAT)
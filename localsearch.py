@@ -0,0 +1,295 @@
+import time
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+import cancellation
+import instrument
+from depart_model import MAX_CONSECUTIVE, MAX_PER_DAY, MAX_TEACHER_LOAD, TimetableScheduler
+from greedy import CP_SAT, LOCAL_SEARCH, SOFT, UNPLACED, greedy_department
+from grid import DAYS, PERIODS, YEARS
+from modelstats import empty_report
+from registry import NO_TEACHER
+from soft import SOFT_OPTIONS, SoftTimetableScheduler
+
+# ========== LOCAL-SEARCH ENGINE ==========
+# An alternative backend for instances too large for one CpModel (the whole
+# college with shared faculty). The timetable is an integer grid
+# (row, day, period) -> candidate index. Every row starts with each candidate
+# placed exactly `credits` times (from the greedy pass, the rest filled in),
+# and the only move is swapping two cells of the same row, so the counts
+# stay exact and never need a penalty.
+#
+# Penalty = per-day excess over 2 + teacher clashes + 3-period windows with
+#           more than 2 + placements in cells the rules/availability forbid.
+# Teacher load is fixed by the credits, so it is checked once up front.
+#
+# A swap changes two cells; each cell change touches one (row, subject, day)
+# counter and, per teacher, one (day, period) counter and at most three
+# window sums, so a move is evaluated in O(1) by applying it to the counters
+# and undoing it if rejected. Each step picks a cell (usually a conflicting
+# one), tries a few swap partners in its row and takes the best, accepted
+# simulated-annealing style; recently changed cells are tabu unless the move
+# reaches a new best. The
+# full penalty and the conflict mask are recomputed with NumPy every few
+# hundred moves to steer the sampling towards conflicting cells.
+#
+# LocalSearchScheduler has the TimetableScheduler interface (solve(),
+# solution(), iter_cells(), to_artifact()); department_scheduler() picks an
+# engine by instance size. It has no CP-SAT model: model_report() is empty,
+# and code that works on the model (repair, alternatives) checks
+# engine == LOCAL_SEARCH first. initial="random" skips the greedy seed (useful to
+# benchmark the search itself).
+
+# Above this many rows * days * periods, "auto" picks local search.
+MAX_CP_CELLS = 2000
+SEARCH_OPTIONS = ("time_limit", "max_iterations", "seed", "tabu_tenure", "partners", "initial_temperature",
+                  "final_temperature", "initial")
+
+
+class LocalSearchScheduler(TimetableScheduler):
+    def __init__(self, *args, time_limit=30.0, max_iterations=2_000_000, seed=0, tabu_tenure=10,
+                 partners=8, initial_temperature=1.0, final_temperature=0.05, initial="greedy", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.seed = seed
+        self.tabu_tenure = tabu_tenure
+        self.partners = partners
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.initial = initial
+        self.engine = LOCAL_SEARCH
+        self.penalty = None
+        self.iterations = 0
+
+    def model_report(self):
+        """The search builds no CP-SAT model, so the report is empty."""
+        return empty_report()
+
+    # ---------- state ----------
+
+    def _setup(self):
+        state = greedy_department(self)[1]
+        self.allowed = state.allowed
+        self.rng = np.random.default_rng(self.seed)
+        num_rows, num_days, num_periods = state.grid.shape
+        self.num_days, self.num_periods = num_days, num_periods
+        self.teacher_of_candidate = state.teachers
+        self._state = state
+
+        grid = state.grid.copy()
+        if self.initial == "random":
+            grid[grid >= 0] = UNPLACED
+        for y, entries in enumerate(state.entries):
+            missing = []
+            for k, (_, credits) in enumerate(entries):
+                missing += [k] * (credits - int((grid[y] == k).sum()))
+            free = np.argwhere(grid[y] == UNPLACED)
+            if len(missing) != len(free):
+                return None  # credits do not add up to the open cells; no timetable exists
+            self.rng.shuffle(missing)
+            for (d, p), k in zip(free, missing):
+                grid[y, d, p] = k
+        self.grid = grid
+
+        num_teachers = len(self.registry.teachers)
+        self.row_teachers = [np.array(t + [NO_TEACHER], dtype=np.int64) for t in state.teachers]
+        self.day_count = [np.zeros((len(entries) + 1, num_days), dtype=np.int64) for entries in state.entries]
+        self.busy = np.zeros((num_teachers, num_days, num_periods), dtype=np.int64)
+        for y in range(num_rows):
+            for d in range(num_days):
+                for p in range(num_periods):
+                    k = int(grid[y, d, p])
+                    if k >= 0:
+                        self.day_count[y][k, d] += 1
+                        self.busy[self.row_teachers[y][k], d, p] += 1
+        self.busy[NO_TEACHER] = 0
+        return grid
+
+    def _loads_ok(self):
+        load = np.zeros(len(self.registry.teachers), dtype=np.int64)
+        for y, entries in enumerate(self._state.entries):
+            for k, (_, credits) in enumerate(entries):
+                load[self.teacher_of_candidate[y][k]] += credits
+        load[NO_TEACHER] = 0
+        return (load <= MAX_TEACHER_LOAD).all()
+
+    # ---------- penalties ----------
+
+    def full_penalty(self):
+        """(total penalty, conflict mask (rows, days, periods)), computed from scratch with NumPy."""
+        grid = self.grid
+        conflict = np.zeros(grid.shape, dtype=bool)
+        total = 0
+        busy = np.zeros_like(self.busy)
+        teacher_grid = np.zeros(grid.shape, dtype=np.int64)
+        for y in range(grid.shape[0]):
+            row = grid[y]
+            placed = row >= 0
+            teacher_grid[y] = np.where(placed, self.row_teachers[y][np.where(placed, row, -1)], NO_TEACHER)
+            counts = np.zeros((len(self.row_teachers[y]), self.num_days), dtype=np.int64)
+            np.add.at(counts, (np.where(placed, row, -1), np.arange(self.num_days)[:, None]), placed.astype(np.int64))
+            excess = np.maximum(counts - MAX_PER_DAY, 0)
+            total += int(excess.sum())
+            conflict[y] |= placed & (excess[np.where(placed, row, -1), np.arange(self.num_days)[:, None]] > 0)
+            if self.allowed[self.years[y]].shape[2]:
+                ok = np.take_along_axis(self.allowed[self.years[y]], np.maximum(row, 0)[..., None], axis=2)[..., 0]
+                bad = placed & ~ok
+                total += int(bad.sum())
+                conflict[y] |= bad
+        days = np.arange(self.num_days)[None, :, None]
+        periods = np.arange(self.num_periods)[None, None, :]
+        np.add.at(busy, (teacher_grid, np.broadcast_to(days, grid.shape), np.broadcast_to(periods, grid.shape)), 1)
+        busy[NO_TEACHER] = 0
+        clash = np.maximum(busy - 1, 0)
+        total += int(clash.sum())
+        if self.num_periods >= 3:
+            windows = busy[:, :, :-2] + busy[:, :, 1:-1] + busy[:, :, 2:]
+            over = np.maximum(windows - MAX_CONSECUTIVE, 0)
+            total += int(over.sum())
+            hot = np.zeros(busy.shape, dtype=bool)
+            for offset in range(3):
+                hot[:, :, offset:offset + self.num_periods - 2] |= over > 0
+        else:
+            hot = np.zeros(busy.shape, dtype=bool)
+        hot |= clash > 0
+        hot[NO_TEACHER] = False
+        conflict |= hot[teacher_grid, np.broadcast_to(days, grid.shape), np.broadcast_to(periods, grid.shape)]
+        return total, conflict
+
+    def _window_penalty(self, teacher, d, p):
+        busy = self.busy[teacher, d]
+        total = 0
+        for start in range(max(0, p - 2), min(p, self.num_periods - 3) + 1):
+            total += max(0, int(busy[start] + busy[start + 1] + busy[start + 2]) - MAX_CONSECUTIVE)
+        return total
+
+    def _cell_penalty(self, y, d, p, k):
+        """Penalty terms touched by candidate k sitting in (y, d, p)."""
+        total = max(0, int(self.day_count[y][k, d]) - MAX_PER_DAY)
+        total += 0 if self.allowed[self.years[y]][d, p, k] else 1
+        teacher = self.row_teachers[y][k]
+        if teacher != NO_TEACHER:
+            total += max(0, int(self.busy[teacher, d, p]) - 1) + self._window_penalty(teacher, d, p)
+        return total
+
+    def _set(self, y, d, p, k):
+        """Puts candidate k in (y, d, p), updating counters. Returns the penalty delta."""
+        old = int(self.grid[y, d, p])
+        before = self._cell_penalty(y, d, p, old) + self._cell_penalty(y, d, p, k)
+        self.day_count[y][old, d] -= 1
+        self.day_count[y][k, d] += 1
+        t_old, t_new = self.row_teachers[y][old], self.row_teachers[y][k]
+        if t_old != NO_TEACHER:
+            self.busy[t_old, d, p] -= 1
+        if t_new != NO_TEACHER:
+            self.busy[t_new, d, p] += 1
+        self.grid[y, d, p] = k
+        after = self._cell_penalty(y, d, p, old) + self._cell_penalty(y, d, p, k)
+        # The allowed term of the removed candidate no longer applies.
+        after -= 0 if self.allowed[self.years[y]][d, p, old] else 1
+        before -= 0 if self.allowed[self.years[y]][d, p, k] else 1
+        return after - before
+
+    def _swap(self, y, a, b):
+        (d1, p1), (d2, p2) = a, b
+        k1, k2 = int(self.grid[y, d1, p1]), int(self.grid[y, d2, p2])
+        return self._set(y, d1, p1, k2) + self._set(y, d2, p2, k1)
+
+    # ---------- search ----------
+
+    def solve(self, solver=None):
+        """Same return value as TimetableScheduler.solve(); `solver` is ignored."""
+        with instrument.span("local_search"):
+            return self._search()
+
+    def _search(self):
+        self.cells = None
+        if self._setup() is None or not self._loads_ok():
+            self.status = cp_model.INFEASIBLE
+            return None
+        grid = self.grid
+        rng = self.rng
+        movable = [np.argwhere(grid[y] >= 0) for y in range(grid.shape[0])]
+        rows = [y for y in range(grid.shape[0]) if len(movable[y]) > 1]
+        penalty, conflict = self.full_penalty()
+        best, best_grid = penalty, grid.copy()
+        tabu_until = np.zeros(grid.shape, dtype=np.int64)
+        start = time.perf_counter()
+        ratio = self.final_temperature / self.initial_temperature
+        hot = np.argwhere(conflict)
+
+        iteration = 0
+        while penalty > 0 and rows and iteration < self.max_iterations:
+            iteration += 1
+            elapsed = time.perf_counter() - start
+            if elapsed > self.time_limit or cancellation.requested():
+                break
+            if iteration % 256 == 0:
+                penalty, conflict = self.full_penalty()
+                hot = np.argwhere(conflict)
+            # Geometric cooling over whichever budget runs out first.
+            progress = max(iteration / self.max_iterations, elapsed / self.time_limit)
+            temperature = self.initial_temperature * ratio ** progress
+
+            if len(hot) and rng.random() < 0.8:
+                y, d1, p1 = hot[rng.integers(len(hot))]
+            else:
+                y = rows[rng.integers(len(rows))]
+                d1, p1 = movable[y][rng.integers(len(movable[y]))]
+            # Best of a few swap partners for the chosen cell (tabu partners
+            # only if they reach a new best), then the annealing test.
+            choice, choice_delta = None, None
+            for d2, p2 in movable[y][rng.integers(len(movable[y]), size=self.partners)]:
+                if grid[y, d1, p1] == grid[y, d2, p2]:
+                    continue
+                delta = self._swap(y, (d1, p1), (d2, p2))
+                self._swap(y, (d1, p1), (d2, p2))
+                tabu = tabu_until[y, d2, p2] > iteration
+                if (tabu and penalty + delta >= best) or (choice is not None and delta >= choice_delta):
+                    continue
+                choice, choice_delta = (d2, p2), delta
+            if choice is None:
+                continue
+            if choice_delta > 0 and rng.random() >= np.exp(-choice_delta / temperature):
+                continue
+            self._swap(y, (d1, p1), choice)
+            penalty += choice_delta
+            tabu_until[y, d1, p1] = tabu_until[(y, *choice)] = iteration + self.tabu_tenure
+            if penalty < best:
+                best, best_grid = penalty, grid.copy()
+
+        self.iterations = iteration
+        self.grid = best_grid
+        self.penalty = best
+        if best > 0:
+            self.status = cp_model.UNKNOWN
+            return None
+        self._state.grid = best_grid
+        self.cells = self._state.cells()
+        self.status = cp_model.FEASIBLE
+        return self.solution()
+
+
+def department_scheduler(candidates, days=DAYS, periods=PERIODS, years=YEARS, engine="auto",
+                         max_cp_cells=MAX_CP_CELLS, **kwargs):
+    """
+    Picks the department engine: "cp-sat" (TimetableScheduler, solved greedy
+    first by solve_department_fast()), "local-search" (LocalSearchScheduler),
+    "soft" (soft.SoftTimetableScheduler, best timetable by a deadline) or
+    "auto" - local search once rows * days * periods exceeds `max_cp_cells`.
+    Options of the other engines (SEARCH_OPTIONS, soft.SOFT_OPTIONS) are dropped.
+    """
+    if engine == "auto":
+        engine = LOCAL_SEARCH if len(years) * len(days) * len(periods) > max_cp_cells else CP_SAT
+    if engine == LOCAL_SEARCH:
+        kwargs = {key: value for key, value in kwargs.items() if key in SEARCH_OPTIONS or key not in SOFT_OPTIONS}
+        return LocalSearchScheduler(candidates, days, periods, years, **kwargs)
+    if engine == SOFT:
+        kwargs = {key: value for key, value in kwargs.items() if key in SOFT_OPTIONS or key not in SEARCH_OPTIONS}
+        return SoftTimetableScheduler(candidates, days, periods, years, **kwargs)
+    if engine != CP_SAT:
+        raise ValueError(f"Unknown department engine {engine!r}")
+    kwargs = {key: value for key, value in kwargs.items() if key not in SEARCH_OPTIONS and key not in SOFT_OPTIONS}
+    return TimetableScheduler(candidates, days, periods, years, **kwargs)
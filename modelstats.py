@@ -0,0 +1,127 @@
+import json
+
+# ========== MODEL SIZE BY CONSTRAINT FAMILY ==========
+# Model builders call tracker.switch(family, key) whenever they move on to a
+# different rule (and, where useful, a different year or teacher). The
+# tracker only remembers how many variables/constraints the model had at each
+# switch, which is cheap; the proto is walked once, when a report is asked for.
+#
+# report() -> {
+#   "total":    {"variables", "constraints", "terms"},
+#   "families": {family: {"variables", "constraints", "terms"}},
+#   "by_key":   {family: {key: {"variables", "constraints", "terms"}}},
+# }
+# "terms" counts literal/variable occurrences: linear terms, clause literals
+# and enforcement literals.
+
+
+class FamilyTracker:
+    def __init__(self, model):
+        self.model = model
+        self.ranges = []  # (family, key, first constraint, end constraint, first variable, end variable)
+        self._open = None
+
+    def _counts(self):
+        proto = self.model.Proto()
+        return len(proto.constraints), len(proto.variables)
+
+    def switch(self, family, key=None):
+        """Everything added from now on belongs to (family, key)."""
+        constraints, variables = self._counts()
+        self._close(constraints, variables)
+        self._open = (family, key, constraints, variables)
+
+    def close(self):
+        self._close(*self._counts())
+
+    def _close(self, constraints, variables):
+        if self._open is None:
+            return
+        family, key, first_constraint, first_variable = self._open
+        if constraints > first_constraint or variables > first_variable:
+            self.ranges.append((family, key, first_constraint, constraints, first_variable, variables))
+        self._open = None
+
+
+def constraint_terms(constraint):
+    terms = len(constraint.enforcement_literal)
+    if constraint.has_linear():
+        terms += len(constraint.linear.vars)
+    elif constraint.has_bool_or():
+        terms += len(constraint.bool_or.literals)
+    elif constraint.has_bool_and():
+        terms += len(constraint.bool_and.literals)
+    elif constraint.has_at_most_one():
+        terms += len(constraint.at_most_one.literals)
+    elif constraint.has_exactly_one():
+        terms += len(constraint.exactly_one.literals)
+    return terms
+
+
+def _blank():
+    return {"variables": 0, "constraints": 0, "terms": 0}
+
+
+def empty_report():
+    """Report of an engine that builds no CP-SAT model."""
+    return {"total": _blank(), "families": {}, "by_key": {}}
+
+
+def report(tracker):
+    """Size report for the model behind `tracker` (see module comment)."""
+    tracker.close()
+    proto = tracker.model.Proto()
+    constraints = proto.constraints
+    families, by_key = {}, {}
+    for family, key, c0, c1, v0, v1 in tracker.ranges:
+        terms = sum(constraint_terms(constraints[i]) for i in range(c0, c1))
+        for bucket in (
+            families.setdefault(family, _blank()),
+            by_key.setdefault(family, {}).setdefault("" if key is None else str(key), _blank()),
+        ):
+            bucket["variables"] += v1 - v0
+            bucket["constraints"] += c1 - c0
+            bucket["terms"] += terms
+    total = {
+        "variables": len(proto.variables),
+        "constraints": len(constraints),
+        "terms": sum(f["terms"] for f in families.values()),
+    }
+    return {"total": total, "families": families, "by_key": by_key}
+
+
+def format_report(model_report):
+    lines = [f"{'family':<16} {'variables':>10} {'constraints':>12} {'terms':>10}"]
+    for family, size in model_report["families"].items():
+        lines.append(f"{family:<16} {size['variables']:>10} {size['constraints']:>12} {size['terms']:>10}")
+    total = model_report["total"]
+    lines.append(f"{'total':<16} {total['variables']:>10} {total['constraints']:>12} {total['terms']:>10}")
+    return "\n".join(lines)
+
+
+def main():
+    import argparse
+
+    from depart_model import TimetableScheduler
+    from instances import load_instance
+    from lab_model import LabTimetableScheduler
+
+    parser = argparse.ArgumentParser(description="Print lab and department model sizes per constraint family.")
+    parser.add_argument("instance", help="instance JSON written by instances.py")
+    parser.add_argument("--json", action="store_true", help="print the full report (with per-year/teacher keys) as JSON")
+    args = parser.parse_args()
+
+    instance = load_instance(args.instance)
+    lab = LabTimetableScheduler(instance["lab_classes"], days=instance["days"])
+    depart = TimetableScheduler(instance["candidates"], instance["days"], instance["periods"], instance["rows"])
+    reports = {"lab": lab.model_report(), "depart": depart.model_report()}
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for stage, model_report in reports.items():
+        print(f"== {stage} ==")
+        print(format_report(model_report))
+
+
+if __name__ == "__main__":
+    main()
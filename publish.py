@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+
+# ========== DIFF-BASED PUBLISHING ==========
+# Re-runs usually change a handful of cells, but rewriting a document costs
+# a billed write and fires every client listener on it. publish_document()
+# hashes each top-level field of the new payload, compares the hashes with
+# what was last published and:
+#
+#   nothing changed               no write at all
+#   some fields changed           set(merge=True) of just those fields
+#   unknown / fields removed /    set() of the whole document
+#   a changed map field
+#
+# The last published hashes come from a local manifest (publish_manifest.json
+# in the working directory, next to final_schedules/ and the artifacts) or,
+# with source="remote", from reading the document itself - a read is cheaper
+# than a write and fires no listeners, and it is right even when someone
+# else edited the document. TIMETABLE_PUBLISH_SOURCE sets the default.
+# PublishStats counts written and skipped documents and fields so each run
+# can report the writes it saved.
+#
+# Changed fields go out as set(merge=True) rather than update(), so field
+# names such as "1st Year" or "Period 1" need no field-path quoting. Merge
+# replaces string and list values whole but merges maps key by key, so a
+# changed map field (e.g. an index listing documents) rewrites the whole
+# document instead, unless the caller asked for merge=True.
+# delete_document() removes a document published earlier, e.g. the view of
+# a teacher who no longer teaches.
+
+MANIFEST_FILE = "publish_manifest.json"
+
+MANIFEST = "manifest"
+REMOTE = "remote"
+DEFAULT_SOURCE = os.environ.get("TIMETABLE_PUBLISH_SOURCE", MANIFEST)
+
+
+def content_hash(value):
+    """Stable short hash of a JSON-serializable value."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def field_hashes(data):
+    return {field: content_hash(value) for field, value in data.items()}
+
+
+class Manifest:
+    """{document path: {field: hash}} of what this machine last published."""
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self.documents = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.documents = json.load(f)
+
+    def get(self, doc_path):
+        return self.documents.get(doc_path)
+
+    def record(self, doc_path, hashes):
+        self.documents[doc_path] = hashes
+
+    def forget(self, doc_path):
+        self.documents.pop(doc_path, None)
+
+    def save(self):
+        if not self.path:
+            return None
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.documents, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+        return self.path
+
+
+class PublishStats:
+    def __init__(self):
+        self.documents_written = 0
+        self.documents_skipped = 0
+        self.fields_written = 0
+        self.fields_skipped = 0
+        self.documents_deleted = 0
+
+    def add(self, other):
+        self.documents_written += other.documents_written
+        self.documents_skipped += other.documents_skipped
+        self.fields_written += other.fields_written
+        self.fields_skipped += other.fields_skipped
+        self.documents_deleted += other.documents_deleted
+        return self
+
+    @property
+    def documents(self):
+        return self.documents_written + self.documents_skipped
+
+    def summary(self):
+        deleted = f" Deleted {self.documents_deleted} stale documents." if self.documents_deleted else ""
+        return (f"Wrote {self.documents_written}/{self.documents} documents "
+                f"({self.documents_skipped} writes saved), "
+                f"{self.fields_written} fields changed, {self.fields_skipped} unchanged.{deleted}")
+
+
+def publish_document(db, doc_path, data, manifest=None, stats=None, source=None, merge=False):
+    """
+    Writes `data` to `doc_path`, touching only what changed since the last
+    publish (see module comment). Returns the list of fields written.
+    merge=True never drops fields it does not know about (for documents
+    several writers add fields to, like an index).
+    """
+    stats = stats if stats is not None else PublishStats()
+    ref = db.document(doc_path)
+    new = field_hashes(data)
+    if (source or DEFAULT_SOURCE) == REMOTE:
+        snapshot = ref.get()
+        old = field_hashes(snapshot.to_dict()) if snapshot.exists else None
+    else:
+        old = manifest.get(doc_path) if manifest is not None else None
+
+    changed = [field for field, digest in new.items() if old is None or old.get(field) != digest]
+    maps = any(isinstance(data[field], dict) for field in changed)
+    if old is not None and (merge or (set(old) <= set(new) and not maps)):
+        stats.fields_skipped += len(new) - len(changed)
+        if not changed:
+            stats.documents_skipped += 1
+        else:
+            ref.set({field: data[field] for field in changed}, merge=True)
+            stats.documents_written += 1
+            stats.fields_written += len(changed)
+    else:
+        changed = list(data)
+        if merge:
+            ref.set(data, merge=True)
+        else:
+            ref.set(data)
+        stats.documents_written += 1
+        stats.fields_written += len(changed)
+    if manifest is not None:
+        manifest.record(doc_path, new)
+    return changed
+
+
+def delete_document(db, doc_path, manifest=None, stats=None):
+    """Deletes a previously published document and its manifest entry."""
+    db.document(doc_path).delete()
+    if manifest is not None:
+        manifest.forget(doc_path)
+    if stats is not None:
+        stats.documents_deleted += 1
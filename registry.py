@@ -0,0 +1,199 @@
+import numpy as np
+
+from grid import DEFAULT_SECTION, EMPTY, EMPTY_NAME, NO_YEAR, YEARS, remove_year_prefix
+
+# ========== SHARED ID REGISTRY ==========
+# Every stage used to pass subjects around as free strings
+# ("1st Year_C++ Lab", "C++ Lab", "c++ Lab (geetha)") and re-parse them.
+# The registry interns (year, section, subject, teacher) once at load time
+# and hands out a compact integer entry id. Models and grids are keyed on
+# those ids; strings are only produced again by the render_* methods.
+
+NO_TEACHER = 0
+NO_TEACHER_NAME = "No Teacher"
+
+
+class Interner:
+    """Bidirectional name <-> id table. Id order is first-seen order."""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def intern(self, name):
+        idx = self.ids.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.names.append(name)
+            self.ids[name] = idx
+        return idx
+
+    def id(self, name):
+        return self.ids[name]
+
+    def name(self, idx):
+        return self.names[idx]
+
+
+class Registry:
+    """
+    Interns (year, section, subject, teacher) tuples into entry ids.
+
+    Entry 0 is reserved for the empty cell and teacher 0 for "no teacher",
+    so zero-initialised grids and arrays are always valid. Per-entry
+    attributes are exposed as NumPy arrays (year_of, teacher_of, ...) so a
+    whole grid of entry ids can be mapped to years or teachers in one
+    indexing operation.
+    """
+
+    def __init__(self, years=YEARS):
+        self.years = Interner(years)
+        self.sections = Interner([DEFAULT_SECTION])
+        self.subjects = Interner([EMPTY_NAME])
+        self.teachers = Interner([None])
+        self.entries = [(NO_YEAR, 0, 0, NO_TEACHER)]
+        self._entry_ids = {}
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    # ---------- interning ----------
+
+    def entry(self, year, section, subject, teacher=None):
+        """Returns the entry id for the tuple, creating it on first sight."""
+        if subject is None or subject == EMPTY_NAME:
+            return EMPTY
+        key = (
+            self.years.intern(year),
+            self.sections.intern(section),
+            self.subjects.intern(subject),
+            self.teachers.intern(teacher),
+        )
+        return self._add(key)
+
+    def _add(self, key):
+        eid = self._entry_ids.get(key)
+        if eid is None:
+            eid = len(self.entries)
+            self.entries.append(key)
+            self._entry_ids[key] = eid
+            self._arrays = None
+        return eid
+
+    def parse_lab_cell(self, cell, section=DEFAULT_SECTION):
+        """
+        Interns a raw lab-solution cell such as '1st Year_C++ Lab'. Cells
+        that carry no known year prefix are kept whole under NO_YEAR.
+        """
+        if not cell or cell == EMPTY_NAME:
+            return EMPTY
+        for year in self.years.names:
+            if year in cell:
+                return self.entry(year, section, remove_year_prefix(cell))
+        return self._add((NO_YEAR, self.sections.intern(section), self.subjects.intern(cell), NO_TEACHER))
+
+    def load_lab_classes(self, classes, section=DEFAULT_SECTION):
+        """
+        Interns lab.py's [[year, subject, required_count], ...] list.
+        Returns [(entry_id, required_count), ...] in input order.
+        """
+        return [(self.entry(year, section, subject), count) for year, subject, count in classes]
+
+    def load_candidates(self, candidates, section=DEFAULT_SECTION):
+        """
+        Interns depart.py's {year: [(subject, credits, teacher), ...]}.
+        Returns {year: [(entry_id, credits), ...]} preserving candidate order.
+        """
+        return {
+            year: [(self.entry(year, section, subject, teacher), credits)
+                   for subject, credits, teacher in year_candidates]
+            for year, year_candidates in candidates.items()
+        }
+
+    # ---------- vectorized attribute lookup ----------
+
+    def _build_arrays(self):
+        table = np.asarray(self.entries, dtype=np.int32).reshape(-1, 4)
+        self._arrays = {
+            "year": table[:, 0].astype(np.int8),
+            "section": table[:, 1],
+            "subject": table[:, 2],
+            "teacher": table[:, 3],
+        }
+        return self._arrays
+
+    def _array(self, field):
+        return (self._arrays or self._build_arrays())[field]
+
+    def year_of(self):
+        return self._array("year")
+
+    def section_of(self):
+        return self._array("section")
+
+    def subject_of(self):
+        return self._array("subject")
+
+    def teacher_of(self):
+        return self._array("teacher")
+
+    # ---------- rendering (export edge only) ----------
+
+    def year_name(self, eid):
+        year_id = self.entries[eid][0]
+        return None if year_id == NO_YEAR else self.years.name(year_id)
+
+    def subject_name(self, eid):
+        return self.subjects.name(self.entries[eid][2])
+
+    def teacher_name(self, eid):
+        return self.teachers.name(self.entries[eid][3])
+
+    def subject_names(self):
+        """Object array mapping entry id -> subject name, for decoding grids."""
+        return np.asarray(self.subjects.names, dtype=object)[self.subject_of()]
+
+    def render_lab_cell(self, eid):
+        """'1st Year_C++ Lab' form used by the lab solution documents."""
+        if eid == EMPTY:
+            return EMPTY_NAME
+        year = self.year_name(eid)
+        subject = self.subject_name(eid)
+        return subject if year is None else f"{year}_{subject}"
+
+    def render_cell(self, eid):
+        """'c++ Lab (geetha)' form used by the final yearly timetables."""
+        teacher = self.teacher_name(eid)
+        return f"{self.subject_name(eid)} ({teacher if teacher is not None else NO_TEACHER_NAME})"
+
+    # ---------- persistence ----------
+
+    def to_tables(self):
+        """Plain-JSON name tables plus the (N, 4) entry table, for artifacts."""
+        return {
+            "years": self.years.names,
+            "sections": self.sections.names,
+            "subjects": self.subjects.names,
+            "teachers": self.teachers.names,
+        }, np.asarray(self.entries, dtype=np.int32).reshape(-1, 4)
+
+    @classmethod
+    def from_tables(cls, names, entries):
+        """Rebuilds a registry saved with to_tables(); entry ids are preserved."""
+        registry = cls(years=())
+        registry.years = Interner(names["years"])
+        registry.sections = Interner(names["sections"])
+        registry.subjects = Interner(names["subjects"])
+        registry.teachers = Interner(names["teachers"])
+        registry.entries = [tuple(int(v) for v in row) for row in entries]
+        registry._entry_ids = {key: eid for eid, key in enumerate(registry.entries) if eid != EMPTY}
+        return registry
@@ -0,0 +1,261 @@
+import numpy as np
+from ortools.sat.python import cp_model
+
+import cancellation
+import instrument
+from extract import candidate_table, decode_candidate_index, decode_one_hot, solution_values
+from greedy import LOCAL_SEARCH
+from grid import EMPTY
+
+# ========== LARGE-NEIGHBORHOOD REPAIR ==========
+# For last-minute changes (a teacher leaves, a room closes on a day, a cell
+# rule is added) without reshuffling every section. The caller builds a
+# scheduler from the *updated* inputs as usual and hands it the current
+# timetable as a TimetableArtifact (every solve is archived as one, and
+# scheduler.to_artifact() gives one too). Repair then:
+#
+#   1. maps the current cells onto the new model's candidates and picks a
+#      neighborhood: cells that are no longer allowed, cells of subjects whose
+#      count changed, cells of `teachers` / on `days` named by the caller;
+#   2. fixes every cell outside it to its current value, re-optimizes inside
+#      it (maximizing the cells that keep their current value, with the
+#      current timetable as a hint), within `time_limit` seconds per attempt;
+#   3. if that is infeasible, widens the neighborhood (whole affected days,
+#      then whole affected rows, then everything) and tries again.
+#
+# repair_department() / repair_lab() return a RepairResult; the scheduler is
+# left solved (cells, status), so solution()/to_artifact() work as after solve().
+
+
+class RepairResult:
+    def __init__(self, scheduler, current, neighborhood, level, status):
+        self.scheduler = scheduler
+        self.cells = scheduler.cells
+        self.status = status
+        self.level = level
+        self.neighborhood = int(neighborhood.sum())
+        self.changed = None if self.cells is None else int((self.cells != current).sum())
+        self.total = int(np.prod(neighborhood.shape))
+
+    @property
+    def ok(self):
+        return self.cells is not None
+
+    def summary(self):
+        if not self.ok:
+            return f"Repair failed ({self.status}) even after widening to level {self.level}."
+        return (f"Repaired at level {self.level}: neighborhood {self.neighborhood}/{self.total} cells, "
+                f"{self.changed} cells changed ({self.changed / self.total:.1%}).")
+
+
+def _widen(levels, attempt):
+    """Runs attempt(mask) for each distinct, growing neighborhood until one succeeds."""
+    tried = None
+    result = None
+    for level, mask in enumerate(levels):
+        if tried is not None and (mask == tried).all():
+            continue
+        tried = mask
+        result = attempt(level, mask)
+        if result.ok:
+            return result
+    return result
+
+
+def _run(model, solver, time_limit):
+    solver = solver or cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    log_lines = instrument.watch_solver(solver)
+    with cancellation.stoppable(solver):
+        status = solver.Solve(model)
+    instrument.solver_stats(solver, status, log_lines)
+    return solver, status
+
+
+def _check_layout(scheduler, current):
+    if list(current.days) != list(scheduler.days) or len(current.periods) != len(scheduler.periods):
+        raise ValueError("The current timetable and the scheduler must use the same days and periods.")
+
+
+def _day_rows_mask(mask):
+    """Whole (row, day) lines of every cell in `mask` (row, day, period)."""
+    return np.broadcast_to(mask.any(axis=2, keepdims=True), mask.shape).copy()
+
+
+# ---------- department (depart_model.TimetableScheduler) ----------
+
+def department_current_index(scheduler, current):
+    """
+    (rows, days, periods) array of the new scheduler's candidate index for
+    each cell of the `current` artifact; -1 where the cell has no counterpart.
+    """
+    _check_layout(scheduler, current)
+    old, new = current.registry, scheduler.registry
+    index = np.full((len(scheduler.years), len(scheduler.days), len(scheduler.periods)), -1, dtype=np.int64)
+    for y, year in enumerate(scheduler.years):
+        if year not in current.rows:
+            continue
+        lookup = {
+            (new.subject_name(entry_id), new.teacher_name(entry_id)): idx
+            for idx, (entry_id, _) in enumerate(scheduler.candidate_entries[year])
+        }
+        row = np.asarray(current.cells[current.rows.index(year)])
+        for eid in np.unique(row):
+            idx = lookup.get((old.subject_name(int(eid)), old.teacher_name(int(eid))), -1)
+            index[y][row == eid] = idx
+    return index
+
+
+def repair_department(scheduler, current, teachers=(), days=(), time_limit=10.0, solver=None):
+    """
+    Repairs the `current` artifact against `scheduler`'s (updated) inputs.
+    `teachers` / `days` name what changed (e.g. the teacher who left) and are
+    always part of the neighborhood.
+    """
+    if scheduler.engine == LOCAL_SEARCH:
+        raise ValueError("Repair needs a CP-SAT model; build a TimetableScheduler, not a local-search one.")
+    current_idx = department_current_index(scheduler, current)
+    _, num_days, num_periods = current_idx.shape
+    compiled = scheduler.compiled_rules()
+    allowed = scheduler.allowed_candidates(compiled)
+    blocked = np.zeros(current_idx.shape, dtype=bool)
+    for y, year in enumerate(scheduler.years):
+        for d, p in compiled[year].blocked:
+            blocked[y, d, p] = True
+
+    seed = np.zeros(current_idx.shape, dtype=bool)
+    teacher_grid = np.zeros(current_idx.shape, dtype=np.int64)
+    old_teacher = current.registry.teacher_of()
+    for y, year in enumerate(scheduler.years):
+        entries = scheduler.candidate_entries[year]
+        row = current_idx[y]
+        safe = np.where(row >= 0, row, 0)
+        cell_allowed = np.take_along_axis(allowed[year], safe[..., None], axis=2)[..., 0] if entries else row < 0
+        seed[y] |= (row < 0) | ~cell_allowed
+        for idx, (entry_id, credits) in enumerate(entries):
+            if (row == idx).sum() != credits:
+                seed[y] |= row == idx
+        if year in current.rows:
+            old_cells = np.asarray(current.cells[current.rows.index(year)])
+            teacher_grid[y] = old_teacher[old_cells]
+    focus_teachers = [current.registry.teachers.id(t) for t in teachers if t in current.registry.teachers]
+    seed |= np.isin(teacher_grid, focus_teachers)
+    for day in days:
+        if day in scheduler.days:
+            seed[:, scheduler.days.index(day), :] = True
+    seed &= ~blocked
+
+    # Level 1 also frees whole days of the touched rows and every slot of the
+    # teachers involved, since clash/window rules couple them across rows.
+    level1 = _day_rows_mask(seed)
+    touched_teachers = np.unique(teacher_grid[seed])
+    level1 |= np.isin(teacher_grid, touched_teachers[touched_teachers != 0])
+    level2 = np.broadcast_to(level1.any(axis=(1, 2), keepdims=True), seed.shape).copy()
+    levels = [seed, level1 & ~blocked, level2 & ~blocked, ~blocked]
+    current_cells = _current_department_cells(scheduler, current_idx)
+
+    def attempt(level, mask):
+        with instrument.span("repair", level=level, neighborhood=int(mask.sum())):
+            scheduler.build_model()
+            model, X, assign_bool = scheduler.model, scheduler.X, scheduler.assign_bool
+            keep = []
+            for y, year in enumerate(scheduler.years):
+                for d in range(num_days):
+                    for p in range(num_periods):
+                        idx = int(current_idx[y, d, p])
+                        if (year, d, p) not in X or idx < 0:
+                            continue
+                        model.AddHint(X[(year, d, p)], idx)
+                        if not mask[y, d, p]:
+                            model.Add(X[(year, d, p)] == idx)
+                        elif (year, d, p, idx) in assign_bool:
+                            keep.append(assign_bool[(year, d, p, idx)])
+            model.Maximize(sum(keep))
+            used, status = _run(model, solver, time_limit)
+            scheduler.status = status
+            scheduler.cells = None
+            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                scheduler.cells = decode_candidate_index(
+                    solution_values(used), scheduler.X_index, scheduler.entry_table, fixed=scheduler.block_cells
+                )
+        return RepairResult(scheduler, current_cells, mask, level, used.StatusName(status))
+
+    return _widen(levels, attempt)
+
+
+def _current_department_cells(scheduler, index):
+    """The current timetable as entry ids of the new scheduler (EMPTY where unmapped)."""
+    safe = np.where(index >= 0, index, 0)
+    rows = np.arange(index.shape[0])[:, None, None]
+    table = candidate_table([[entry_id for entry_id, _ in scheduler.candidate_entries[year]] for year in scheduler.years])
+    cells = table[rows, safe]
+    return np.where(index >= 0, cells, EMPTY)
+
+
+# ---------- lab (lab_model.LabTimetableScheduler) ----------
+
+def lab_current_index(scheduler, current):
+    """(days, periods) array of the class index in `scheduler.entry_ids`; -1 for empty or unknown."""
+    _check_layout(scheduler, current)
+    old, new = current.registry, scheduler.registry
+    lookup = {
+        (new.year_name(entry_id), new.subject_name(entry_id)): k for k, entry_id in enumerate(scheduler.entry_ids)
+    }
+    cells = np.asarray(current.cells[0])
+    index = np.full(cells.shape, -1, dtype=np.int64)
+    for eid in np.unique(cells):
+        if eid != EMPTY:
+            index[cells == eid] = lookup.get((old.year_name(int(eid)), old.subject_name(int(eid))), -1)
+    return index, cells
+
+
+def repair_lab(scheduler, current, days=(), time_limit=10.0, solver=None):
+    """Lab counterpart of repair_department(); `days` names closed/changed days."""
+    current_idx, _ = lab_current_index(scheduler, current)
+    compiled = scheduler.compiled_rules()
+    allowed = compiled.allowed
+
+    occupied = current_idx >= 0
+    safe = np.where(occupied, current_idx, 0)
+    still_allowed = np.take_along_axis(allowed, safe[..., None], axis=2)[..., 0] if scheduler.entry_ids else occupied
+    # Empty slots and slots of removed classes are always in the neighborhood:
+    # filling them moves nobody.
+    seed = ~occupied | (occupied & ~still_allowed)
+    for k, entry_id in enumerate(scheduler.entry_ids):
+        if (current_idx == k).sum() != scheduler.required_counts[entry_id]:
+            seed |= current_idx == k
+    seed |= compiled.pinned
+    for day in days:
+        if day in scheduler.days:
+            seed[scheduler.days.index(day)] = True
+    level1 = np.broadcast_to(((seed & occupied) | compiled.pinned).any(axis=1, keepdims=True), seed.shape) | seed
+    levels = [seed, level1, np.ones_like(seed)]
+    ids = np.asarray(scheduler.entry_ids, dtype=np.int64)
+    current_cells = (np.where(occupied, ids[safe], EMPTY) if len(ids) else np.full(occupied.shape, EMPTY))[None]
+
+    def attempt(level, mask):
+        with instrument.span("repair", level=level, neighborhood=int(mask.sum())):
+            scheduler.build_model()
+            model, timetable = scheduler.model, scheduler.timetable
+            keep = []
+            for d, day in enumerate(scheduler.days):
+                for p, period in enumerate(scheduler.periods):
+                    k = int(current_idx[d, p])
+                    for kk, entry_id in enumerate(scheduler.entry_ids):
+                        var = timetable.get((day, period, entry_id))
+                        if var is None:
+                            continue
+                        model.AddHint(var, int(kk == k))
+                        if not mask[d, p]:
+                            model.Add(var == int(kk == k))
+                        elif kk == k:
+                            keep.append(var)
+            model.Maximize(sum(keep))
+            used, status = _run(model, solver, time_limit)
+            scheduler.status = status
+            scheduler.cells = None
+            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                scheduler.cells = decode_one_hot(solution_values(used), scheduler.timetable_index, scheduler.entry_ids)[None]
+        return RepairResult(scheduler, current_cells, mask[None], level, used.StatusName(status))
+
+    return _widen(levels, attempt)
@@ -0,0 +1,338 @@
+import csv
+import json
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from grid import DEFAULT_SECTION, EMPTY
+from registry import NO_TEACHER_NAME
+
+# ========== SEMESTER CALENDAR ==========
+# The timetables repeat a "Day 1 ... Day 6" day-order cycle; this module
+# puts the cycle on real dates. Every working day (a teaching weekday that
+# is not a holiday or inside a break) takes the next day order:
+#
+#   holidays   {date: name}          no classes; the day order waits for the
+#                                    next working day
+#   breaks     [(start, end, name)]  e.g. exam weeks; like holidays, per day
+#   skip       [date, ...]           the day order of that date is used up
+#                                    without classes (a cancelled day)
+#   overrides  {date: "Day 3"}       follow this day order; the cycle
+#                                    continues from it (also makes a
+#                                    non-teaching weekday a working day)
+#
+# SemesterCalendar resolves all of that once, into one int8 per date of the
+# semester, so day_order(date) is a single array lookup. sessions() then
+# walks the dates lazily and yields Session tuples
+# (date, period, year, section, subject, teacher, room) from the solved
+# cycle, whose rows are expanded once per day order; write_csv() and
+# write_ics() stream those straight into a file, so a whole semester's feed
+# never sits in memory.
+#
+# A semester file holds the same rules as JSON:
+#
+#   {"start": "2025-06-16", "end": "2025-10-31", "weekdays": [0, 1, 2, 3, 4, 5],
+#    "holidays": {"2025-08-15": "Independence Day"},
+#    "breaks": [["2025-09-22", "2025-09-27", "Mid-term exams"]],
+#    "skip": ["2025-07-12"], "overrides": {"2025-08-16": "Day 2"}}
+#
+#   python semester.py semester.json --day-order 2025-07-01
+#   python semester.py semester.json --csv sessions.csv --ics 1st_year.ics --year "1st Year"
+
+NO_CLASSES = -1
+SKIPPED = -2
+
+WEEKDAYS = (0, 1, 2, 3, 4, 5)  # Monday to Saturday
+DAY_START = "09:00"
+PERIOD_MINUTES = 50
+BREAK_MINUTES = 10
+
+SESSION_FIELDS = ("date", "period", "year", "section", "subject", "teacher", "room")
+
+
+class Session(tuple):
+    """(date, period, year, section, subject, teacher, room) - one class on one date."""
+
+    __slots__ = ()
+
+    def __new__(cls, *values):
+        return tuple.__new__(cls, values)
+
+    date = property(lambda self: self[0])
+    period = property(lambda self: self[1])
+    year = property(lambda self: self[2])
+    section = property(lambda self: self[3])
+    subject = property(lambda self: self[4])
+    teacher = property(lambda self: self[5])
+    room = property(lambda self: self[6])
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+class SemesterCalendar:
+    def __init__(self, start, end, day_orders, holidays=None, breaks=(), skip=(), overrides=None,
+                 weekdays=WEEKDAYS):
+        self.start, self.end = parse_date(start), parse_date(end)
+        if self.end < self.start:
+            raise ValueError(f"Semester ends ({self.end}) before it starts ({self.start})")
+        self.day_orders = list(day_orders)
+        self.weekdays = frozenset(weekdays)
+        self.closed = {}  # date -> reason there are no classes
+        for when, name in (holidays or {}).items():
+            self.closed[parse_date(when)] = name
+        for first, last, name in breaks:
+            day = parse_date(first)
+            while day <= parse_date(last):
+                self.closed.setdefault(day, name)
+                day += timedelta(days=1)
+        self.skip = {parse_date(when) for when in skip}
+        self.overrides = {}
+        for when, order in (overrides or {}).items():
+            if order not in self.day_orders:
+                raise ValueError(f"Unknown day order {order!r} for {when}; expected one of {self.day_orders}")
+            self.overrides[parse_date(when)] = self.day_orders.index(order)
+        self._index = self._build_index()
+
+    def _build_index(self):
+        """int8 per date: day-order index, NO_CLASSES or SKIPPED."""
+        index = np.full((self.end - self.start).days + 1, NO_CLASSES, dtype=np.int8)
+        cycle = 0
+        for offset in range(len(index)):
+            day = self.start + timedelta(days=offset)
+            if day in self.overrides:
+                cycle = self.overrides[day]
+            elif day in self.closed or day.weekday() not in self.weekdays:
+                continue
+            index[offset] = SKIPPED if day in self.skip else cycle
+            cycle = (cycle + 1) % len(self.day_orders)
+        return index
+
+    def __contains__(self, when):
+        return self.start <= parse_date(when) <= self.end
+
+    def _offset(self, when):
+        when = parse_date(when)
+        if not self.start <= when <= self.end:
+            raise KeyError(f"{when} is outside the semester ({self.start} to {self.end})")
+        return (when - self.start).days
+
+    def day_order(self, when):
+        """'Day N' followed on a date, or None when there are no classes."""
+        order = int(self._index[self._offset(when)])
+        return self.day_orders[order] if order >= 0 else None
+
+    def status(self, when):
+        """Why a date has (no) classes: its day order, the holiday/break name, 'skipped' or 'weekend'."""
+        order = int(self._index[self._offset(when)])
+        if order >= 0:
+            return self.day_orders[order]
+        if order == SKIPPED:
+            return "skipped"
+        return self.closed.get(parse_date(when), "weekend")
+
+    def teaching_days(self, start=None, end=None):
+        """Yields (date, day order) for every date with classes, in order."""
+        first = self._offset(start) if start is not None else 0
+        last = self._offset(end) if end is not None else len(self._index) - 1
+        for offset in np.flatnonzero(self._index[first:last + 1] >= 0).tolist():
+            yield self.start + timedelta(days=first + offset), self.day_orders[self._index[first + offset]]
+
+    def count(self, order=None):
+        """Teaching days in the semester, or those following one day order."""
+        if order is None:
+            return int((self._index >= 0).sum())
+        return int((self._index == self.day_orders.index(order)).sum())
+
+    def sessions(self, artifact, lab_artifact=None, start=None, end=None, years=None, teacher=None):
+        """
+        Lazily yields a Session per class of a department artifact on every
+        teaching day. Rooms come from the lab artifact (the lab room holding
+        that year's class in the slot); other classes have room "".
+        """
+        per_order = expand_cycle(artifact, lab_artifact, years, teacher)
+        for day, order in self.teaching_days(start, end):
+            for period, year, section, subject, name, room in per_order.get(order, ()):
+                yield Session(day, period, year, section, subject, name, room)
+
+
+def expand_cycle(artifact, lab_artifact=None, years=None, teacher=None):
+    """{day order: [(period, year, section, subject, teacher, room), ...]} of one cycle."""
+    registry = artifact.registry
+    rooms = {}
+    if lab_artifact is not None:
+        lab_cells = np.asarray(lab_artifact.cells)
+        for r, room in enumerate(lab_artifact.rows):
+            for d, p in zip(*np.nonzero(lab_cells[r] != EMPTY)):
+                year = lab_artifact.registry.year_name(int(lab_cells[r, d, p]))
+                rooms[(lab_artifact.days[d], lab_artifact.periods[p], year)] = room
+    cells = np.asarray(artifact.cells)
+    per_order = {}
+    for d, order in enumerate(artifact.days):
+        classes = per_order.setdefault(order, [])
+        for p, period in enumerate(artifact.periods):
+            for r, row in enumerate(artifact.rows):
+                eid = int(cells[r, d, p])
+                if eid == EMPTY:
+                    continue
+                year = registry.year_name(eid) or row
+                name = registry.teacher_name(eid)
+                name = name if name is not None else NO_TEACHER_NAME
+                if (years is not None and year not in years) or (teacher is not None and name != teacher):
+                    continue
+                section = registry.sections.name(registry.entries[eid][1]) or DEFAULT_SECTION
+                classes.append((period, year, section, registry.subject_name(eid), name,
+                                rooms.get((order, period, year), "")))
+    return per_order
+
+
+def load_semester(path, day_orders):
+    """SemesterCalendar from a semester JSON file (see module comment)."""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    return SemesterCalendar(
+        spec["start"], spec["end"], day_orders, holidays=spec.get("holidays"), breaks=spec.get("breaks", ()),
+        skip=spec.get("skip", ()), overrides=spec.get("overrides"), weekdays=spec.get("weekdays", WEEKDAYS),
+    )
+
+
+# ---------- streaming feeds ----------
+
+def period_times(periods, day_start=DAY_START, period_minutes=PERIOD_MINUTES, break_minutes=BREAK_MINUTES):
+    """{period: (start, end) as timedelta from midnight} for back-to-back periods."""
+    hours, minutes = map(int, day_start.split(":"))
+    begin = timedelta(hours=hours, minutes=minutes)
+    times = {}
+    for period in periods:
+        times[period] = (begin, begin + timedelta(minutes=period_minutes))
+        begin += timedelta(minutes=period_minutes + break_minutes)
+    return times
+
+
+def write_csv(sessions, f):
+    """Streams sessions to an open text file as CSV (SESSION_FIELDS). Returns the number written."""
+    writer = csv.writer(f)
+    writer.writerow(SESSION_FIELDS)
+    written = 0
+    for session in sessions:
+        writer.writerow((session.date.isoformat(),) + tuple(session[1:]))
+        written += 1
+    return written
+
+
+def _ics_text(value):
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _ics_line(line):
+    """Folds a content line at 75 octets (RFC 5545 3.1)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, chunk = [], b""
+    for char in line:
+        b = char.encode("utf-8")
+        if len(chunk) + len(b) > (75 if not parts else 74):
+            parts.append(chunk.decode("utf-8"))
+            chunk = b""
+        chunk += b
+    parts.append(chunk.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def write_ics(sessions, f, times, name="Timetable", tz=None):
+    """
+    Streams sessions to an open text file (newline="") as an iCalendar feed,
+    one VEVENT per session. `times` maps period -> (start, end) timedelta
+    (see period_times). Times are floating local times unless `tz` (an IANA
+    name such as "Asia/Kolkata") is given; then they are converted to UTC, so
+    the feed needs no VTIMEZONE component. Returns the number written.
+    """
+    f.write(_ics_line("BEGIN:VCALENDAR"))
+    f.write(_ics_line("VERSION:2.0"))
+    f.write(_ics_line("PRODID:-//timetable//semester.py//EN"))
+    f.write(_ics_line(f"X-WR-CALNAME:{_ics_text(name)}"))
+    if tz:
+        f.write(_ics_line(f"X-WR-TIMEZONE:{tz}"))
+    zone = ZoneInfo(tz) if tz else None
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    def when(moment):
+        if zone is None:
+            return moment.strftime("%Y%m%dT%H%M%S")
+        return moment.replace(tzinfo=zone).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    written = 0
+    for session in sessions:
+        begin, finish = times[session.period]
+        day = datetime.combine(session.date, datetime.min.time())
+        uid = "-".join(str(part).replace(" ", "_") for part in
+                       (session.date.isoformat(), session.period, session.year, session.section))
+        summary = session.subject if session.teacher == NO_TEACHER_NAME else f"{session.subject} ({session.teacher})"
+        for line in (
+            "BEGIN:VEVENT",
+            f"UID:{_ics_text(uid)}@timetable",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{when(day + begin)}",
+            f"DTEND:{when(day + finish)}",
+            f"SUMMARY:{_ics_text(summary)}",
+            f"DESCRIPTION:{_ics_text(f'{session.year} {session.section}, {session.period}')}",
+        ) + ((f"LOCATION:{_ics_text(session.room)}",) if session.room else ()) + ("END:VEVENT",):
+            f.write(_ics_line(line))
+        written += 1
+    f.write(_ics_line("END:VCALENDAR"))
+    return written
+
+
+def main():
+    import argparse
+
+    from artifact import ARTIFACT_DIR, load_artifact
+    from freeslots import latest_artifact
+
+    parser = argparse.ArgumentParser(description="Put the day-order timetable on the semester's dates.")
+    parser.add_argument("semester", help="semester JSON (see semester.py)")
+    parser.add_argument("--artifact", help="department .tta (default: newest in --archive-dir)")
+    parser.add_argument("--lab-artifact", help="lab .tta for rooms (default: newest in --archive-dir)")
+    parser.add_argument("--archive-dir", default=ARTIFACT_DIR)
+    parser.add_argument("--day-order", metavar="DATE", help="print the day order followed on DATE")
+    parser.add_argument("--year", action="append", help="only this year (repeatable)")
+    parser.add_argument("--teacher", help="only this teacher's classes")
+    parser.add_argument("--csv", metavar="PATH", help="write the sessions as CSV")
+    parser.add_argument("--ics", metavar="PATH", help="write the sessions as an iCalendar feed")
+    parser.add_argument("--day-start", default=DAY_START)
+    parser.add_argument("--period-minutes", type=int, default=PERIOD_MINUTES)
+    parser.add_argument("--break-minutes", type=int, default=BREAK_MINUTES)
+    parser.add_argument("--timezone")
+    args = parser.parse_args()
+
+    artifact = load_artifact(args.artifact) if args.artifact else latest_artifact("depart", args.archive_dir)
+    if artifact is None:
+        parser.error("No department solve archived yet; pass --artifact.")
+    lab = load_artifact(args.lab_artifact) if args.lab_artifact else latest_artifact("lab", args.archive_dir)
+    calendar = load_semester(args.semester, artifact.days)
+
+    if args.day_order:
+        print(f"{args.day_order}: {calendar.status(args.day_order)}")
+    filters = dict(lab_artifact=lab, years=args.year, teacher=args.teacher)
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            print(f"Wrote {write_csv(calendar.sessions(artifact, **filters), f)} sessions to {args.csv}")
+    if args.ics:
+        times = period_times(artifact.periods, args.day_start, args.period_minutes, args.break_minutes)
+        with open(args.ics, "w", newline="", encoding="utf-8") as f:
+            count = write_ics(calendar.sessions(artifact, **filters), f, times, tz=args.timezone)
+            print(f"Wrote {count} events to {args.ics}")
+    if not (args.day_order or args.csv or args.ics):
+        print(f"{calendar.count()} teaching days from {calendar.start} to {calendar.end}: "
+              + ", ".join(f"{order} x{calendar.count(order)}" for order in calendar.day_orders))
+
+
+if __name__ == "__main__":
+    main()
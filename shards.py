@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from export import default_shard_name
+from grid import DEFAULT_SECTION, label_key
+from publish import PublishStats, content_hash, delete_document, publish_document
+
+# ========== SHARDED TIMETABLE DOCUMENTS ==========
+# /2025/generaltimetable holds every year in one document, so every reader
+# downloads the whole department and the document grows towards Firestore's
+# 1 MiB limit with each section. The sharded layout keeps one small document
+# per (year, section) plus an index:
+#
+#   <base>/sections/1st_Year_A   {"year": "1st Year", "section": "A",
+#                                 "days": ["Day 1", ...],
+#                                 "Day 1": [{"periodName", "subject", "teacher"}, ...],
+#                                 ...}
+#   <base>/meta/index            {"1st_Year_A": {"year", "section", "hash"}, ...}
+#
+# A shard's id is derived from (year, section), so a client reading one
+# section fetches exactly one document - no index read needed - and its load
+# time does not depend on how many sections the department has. The index
+# lists what exists, and its per-shard content hash lets clients keep a
+# cached shard without reading it again.
+#
+# write_shards() publishes the shards in parallel (diffed per day field, see
+# publish.py), then rewrites the index, then deletes the shards of sections
+# the new timetables no longer have, so a reader that follows the index never
+# finds a missing shard and a removed section does not keep serving its old
+# week. The timetables passed are the department's complete set.
+
+BASE = "2025/generaltimetable"
+SHARD_COLLECTION = "sections"
+INDEX_PATH = "meta/index"
+
+
+def shard_id(year, section=DEFAULT_SECTION):
+    """'1st Year', 'A' -> '1st_Year_A'."""
+    return default_shard_name(year, section or DEFAULT_SECTION, ext="")
+
+
+def shard_path(year, section=DEFAULT_SECTION, base=BASE):
+    return f"{base}/{SHARD_COLLECTION}/{shard_id(year, section)}"
+
+
+def shard_payload(year, section, day_list):
+    """One year/section in the generaltimetable day-list layout -> shard document."""
+    payload = {"year": year, "section": section, "days": [day["dayName"] for day in day_list]}
+    for day in day_list:
+        payload[day["dayName"]] = day["periods"]
+    return payload
+
+
+def day_list_from_shard(payload):
+    """Shard document -> generaltimetable day-list layout."""
+    days = payload.get("days") or sorted(
+        (key for key in payload if key not in ("year", "section", "days")), key=label_key
+    )
+    return [{"dayName": day, "periods": payload[day]} for day in days]
+
+
+def publish_many(db, documents, manifest=None, max_workers=8):
+    """
+    Publishes {doc path: payload} in parallel through publish_document().
+    Returns (per-document {path: fields written}, combined PublishStats).
+    """
+    items = list(documents.items())
+
+    def write(item):
+        path, payload = item
+        stats = PublishStats()
+        return path, publish_document(db, path, payload, manifest, stats), stats
+
+    total = PublishStats()
+    changed = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        for path, fields, stats in pool.map(write, items):
+            changed[path] = fields
+            total.add(stats)
+    return changed, total
+
+
+def write_shards(db, timetables, base=BASE, manifest=None, max_workers=8):
+    """
+    Publishes {(year, section): day_list} - every section of the department -
+    as shard documents plus their index, deleting shards of sections no
+    longer listed. Returns publish.PublishStats for all documents.
+    """
+    documents, index = {}, {}
+    for (year, section), day_list in timetables.items():
+        payload = shard_payload(year, section, day_list)
+        documents[shard_path(year, section, base)] = payload
+        index[shard_id(year, section)] = {"year": year, "section": section, "hash": content_hash(payload)}
+    stale = sorted(set(read_index(db, base)) - set(index))
+    _, total = publish_many(db, documents, manifest, max_workers)
+    publish_document(db, f"{base}/{INDEX_PATH}", index, manifest, total)
+    for shard in stale:
+        delete_document(db, f"{base}/{SHARD_COLLECTION}/{shard}", manifest, total)
+    return total
+
+
+def read_index(db, base=BASE):
+    """{shard id: {"year", "section", "hash"}} of every published shard."""
+    doc = db.document(f"{base}/{INDEX_PATH}").get()
+    return doc.to_dict() if doc.exists else {}
+
+
+def read_section(db, year, section=DEFAULT_SECTION, base=BASE):
+    """One year/section's day list (one document read), or None if it was never published."""
+    doc = db.document(shard_path(year, section, base)).get()
+    return day_list_from_shard(doc.to_dict()) if doc.exists else None
+
+
+def read_sections(db, keys, base=BASE, max_workers=8):
+    """{(year, section): day_list} for the requested keys, read in parallel; missing ones are left out."""
+    keys = list(keys)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keys)))) as pool:
+        day_lists = pool.map(lambda key: read_section(db, key[0], key[1], base), keys)
+        return {key: day_list for key, day_list in zip(keys, day_lists) if day_list is not None}
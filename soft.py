@@ -0,0 +1,230 @@
+import time
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+import instrument
+from depart_model import MAX_CONSECUTIVE, MAX_PER_DAY, MAX_TEACHER_LOAD, RELAXABLE, TimetableScheduler
+from greedy import SOFT, greedy_department
+from registry import NO_TEACHER
+from validate import check_department
+
+# ========== SOFT-CONSTRAINT DEPARTMENT SOLVES ==========
+# With every rule hard, a slightly over-constrained request (a 6-credit
+# subject on a week too tight for "at most 2 a day") ends in "No solution
+# found!" after the full search. SoftTimetableScheduler always returns the
+# best timetable it finds within `time_limit` seconds, with a breakdown of
+# what it costs:
+#
+#   teacher_gap   free periods between a teacher's first and last class of a day
+#   spread        extra copies of a subject on one day (doubles)
+#   per_day       copies of a subject beyond MAX_PER_DAY on one day    (relaxable)
+#   consecutive   periods beyond MAX_CONSECUTIVE in any 3 in a row      (relaxable)
+#   teacher_load  periods beyond MAX_TEACHER_LOAD in a week             (relaxable)
+#
+# Quality levels, best first:
+#
+#   optimal    every rule holds; gaps and spread proven minimal
+#   feasible   every rule holds; best gaps/spread found by the deadline
+#   relaxed    the rules were PROVEN infeasible, so the `relaxable` limits
+#              became penalties (weights far above the quality terms)
+#   none       no timetable by the deadline, and infeasibility not proven
+#
+# A limit is never relaxed on a timeout alone - only after CP-SAT proves the
+# hard model infeasible - unless relax_unproven=True asks for a relaxed
+# answer whenever the hard search runs out of its share (`hard_share`) of the
+# budget. Counts, clashes, cell rules and availability always stay hard.
+#
+# The greedy pass seeds every solve as a hint; when it alone finds a valid
+# timetable, that is the fallback answer and the search gets the whole
+# budget to improve on it. solve() leaves the grid in self.cells like the
+# other engines; self.level, self.breakdown and self.relaxed say what it is
+# worth.
+
+OPTIMAL_LEVEL = "optimal"
+FEASIBLE_LEVEL = "feasible"
+RELAXED_LEVEL = "relaxed"
+NO_LEVEL = "none"
+
+TEACHER_GAP = "teacher_gap"
+SPREAD = "spread"
+DEFAULT_WEIGHTS = {TEACHER_GAP: 3, SPREAD: 1, "per_day": 100, "consecutive": 100, "teacher_load": 100}
+
+SOFT_OPTIONS = ("time_limit", "weights", "relaxable", "relax_unproven", "hard_share")
+
+
+class SoftTimetableScheduler(TimetableScheduler):
+    def __init__(self, candidates, *args, time_limit=30.0, weights=None, relaxable=RELAXABLE, relax_unproven=False,
+                 hard_share=0.5, **kwargs):
+        super().__init__(candidates, *args, **kwargs)
+        self.time_limit = time_limit
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.relaxable = tuple(relaxable)
+        self.relax_unproven = relax_unproven
+        self.hard_share = hard_share
+        self.engine = SOFT
+        self.level = None
+        self.relaxed = ()
+        self.breakdown = None
+        self.objective = None
+
+    def build_model(self):
+        model = super().build_model()
+        self._add_quality_terms(model)
+        model.Minimize(sum(
+            self.weights[rule] * sum(terms) for rule, terms in self.penalties.items() if terms
+        ))
+        return model
+
+    def _add_quality_terms(self, model):
+        num_days, num_periods = len(self.days), len(self.periods)
+        # Doubles: a subject's second copy on a day.
+        for year in self.years:
+            for idx in range(len(self.candidate_entries[year])):
+                for d in range(num_days):
+                    same_day = [self.assign_bool[(year, d, p, idx)] for p in range(num_periods)
+                                if (year, d, p, idx) in self.assign_bool]
+                    if len(same_day) > 1:
+                        double = model.NewIntVar(0, len(same_day) - 1, f"spread_{year}_{idx}_{d}")
+                        model.Add(sum(same_day) - 1 <= double)
+                        self.penalties.setdefault(SPREAD, []).append(double)
+        # Gaps: started[p] / pending[p] say the teacher has a class at or before /
+        # at or after p; a free period with both is a gap. Only lower bounds are
+        # needed - the objective pushes every one of them down.
+        for teacher, slots in self.teacher_assignments.items():
+            for d in range(num_days):
+                busy = [sum(slots.get((d, p), [])) for p in range(num_periods)]
+                if sum(1 for p in range(num_periods) if (d, p) in slots) < 2:
+                    continue
+                started = [model.NewBoolVar(f"started_{teacher}_{d}_{p}") for p in range(num_periods)]
+                pending = [model.NewBoolVar(f"pending_{teacher}_{d}_{p}") for p in range(num_periods)]
+                for p in range(num_periods):
+                    if (d, p) in slots:
+                        model.Add(started[p] >= busy[p])
+                        model.Add(pending[p] >= busy[p])
+                    if p:
+                        model.Add(started[p] >= started[p - 1])
+                        model.Add(pending[p - 1] >= pending[p])
+                for p in range(1, num_periods - 1):
+                    gap = model.NewBoolVar(f"gap_{teacher}_{d}_{p}")
+                    model.Add(started[p - 1] + pending[p + 1] - busy[p] - 1 <= gap)
+                    self.penalties.setdefault(TEACHER_GAP, []).append(gap)
+
+    def _attempt(self, relax, limit, hint):
+        """One CP-SAT run with `relax` limits as penalties. Returns the solver status."""
+        self.relax = frozenset(relax)
+        self.model = None
+        with instrument.span("build"):
+            self.build_model()
+        if hint is not None:
+            for (year, d, p), var in self.X.items():
+                value = int(hint[self.years.index(year), d, p])
+                if value >= 0:
+                    self.model.AddHint(var, value)
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(limit, 0.01)
+        if super().solve(solver) is not None:
+            # Not solver.ObjectiveValue(): below OPTIMAL the gap/spread variables
+            # (lower bounds only) may carry slack, so count the grid itself.
+            self.objective = total_penalty(penalty_breakdown(self, self.cells), self.weights)
+        return self.status
+
+    def solve(self, solver=None):
+        """
+        Best timetable within self.time_limit (see module comment). Returns the
+        {year: {section: rows}} solution like TimetableScheduler.solve(), or
+        None at level "none".
+        """
+        deadline = time.perf_counter() + self.time_limit
+        with instrument.span("greedy"):
+            ok, state = greedy_department(self)
+            hint = state.grid
+            # A valid greedy timetable is the incumbent: the search can only improve on it.
+            incumbent = state.cells() if ok and check_department(self, state.cells()).ok else None
+        self.cells, self.relaxed, self.objective = None, (), None
+
+        with instrument.span("soft_hard"):
+            share = 1.0 if incumbent is not None else self.hard_share
+            status = self._attempt((), self.time_limit * share, hint)
+        if status == cp_model.FEASIBLE and deadline - time.perf_counter() > 0:
+            # Keep improving gaps/spread from the best timetable so far.
+            best = (self.cells.copy(), self.objective)
+            with instrument.span("soft_improve"):
+                status = self._attempt((), deadline - time.perf_counter(), self._candidate_grid(self.cells))
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE) or self.objective > best[1]:
+                self.cells, self.objective = best
+                status = cp_model.FEASIBLE
+        if incumbent is not None:
+            greedy_objective = total_penalty(penalty_breakdown(self, incumbent), self.weights)
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE) or greedy_objective < self.objective:
+                self.cells, self.objective = incumbent, greedy_objective
+                status = cp_model.FEASIBLE
+
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            self.status = status
+            self.level = OPTIMAL_LEVEL if status == cp_model.OPTIMAL else FEASIBLE_LEVEL
+        elif status == cp_model.INFEASIBLE or (self.relax_unproven and self.relaxable):
+            if status == cp_model.INFEASIBLE:
+                print(f"Hard rules proven infeasible; relaxing {', '.join(self.relaxable)}.")
+            with instrument.span("soft_relaxed"):
+                status = self._attempt(self.relaxable, deadline - time.perf_counter(), hint)
+            self.relaxed = self.relaxable
+            self.level = RELAXED_LEVEL if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else NO_LEVEL
+        else:
+            self.level = NO_LEVEL
+
+        if self.level == NO_LEVEL:
+            self.cells = None
+            return None
+        self.breakdown = penalty_breakdown(self, self.cells)
+        print(f"Soft solve: {self.level} - {format_breakdown(self.breakdown, self.weights)}")
+        return self.solution()
+
+    def _candidate_grid(self, cells):
+        """Entry-id grid -> candidate-index grid (-1 where no candidate), for hints."""
+        grid = np.full(cells.shape, -1, dtype=np.int64)
+        for y, year in enumerate(self.years):
+            lookup = {entry_id: idx for idx, (entry_id, _) in reversed(list(enumerate(self.candidate_entries[year])))}
+            for (d, p), eid in np.ndenumerate(cells[y]):
+                grid[y, d, p] = lookup.get(int(eid), -1)
+        return grid
+
+
+def penalty_breakdown(scheduler, cells):
+    """Units of each penalty in a (rows, days, periods) entry-id grid, computed from the grid itself."""
+    cells = np.asarray(cells)
+    num_days, num_periods = cells.shape[1], cells.shape[2]
+    registry = scheduler.registry
+    per_day = spread = 0
+    for y, year in enumerate(scheduler.years):
+        entry_ids = [entry_id for entry_id, _ in scheduler.candidate_entries[year]]
+        for entry_id in set(entry_ids):
+            on_day = (cells[y] == entry_id).sum(axis=1)
+            per_day += int(np.maximum(on_day - MAX_PER_DAY, 0).sum())
+            spread += int(np.maximum(on_day - 1, 0).sum())
+
+    teachers = registry.teacher_of()[cells]
+    busy = np.zeros((len(registry.teachers), num_days, num_periods), dtype=np.int64)
+    np.add.at(busy, (teachers, np.arange(num_days)[:, None], np.arange(num_periods)), 1)
+    busy[NO_TEACHER] = 0
+    consecutive = 0
+    if num_periods >= 3:
+        windows = busy[..., :-2] + busy[..., 1:-1] + busy[..., 2:]
+        consecutive = int(np.maximum(windows - MAX_CONSECUTIVE, 0).sum())
+    load = int(np.maximum(busy.sum(axis=(1, 2)) - MAX_TEACHER_LOAD, 0).sum())
+    # Gaps: free periods strictly between the first and the last class of a teacher's day.
+    taught = busy > 0
+    started = np.maximum.accumulate(taught, axis=2)
+    pending = np.maximum.accumulate(taught[..., ::-1], axis=2)[..., ::-1]
+    gaps = int((started & pending & ~taught).sum())
+    return {TEACHER_GAP: gaps, SPREAD: spread, "per_day": per_day, "consecutive": consecutive, "teacher_load": load}
+
+
+def total_penalty(breakdown, weights=None):
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    return sum(weights[rule] * units for rule, units in breakdown.items())
+
+
+def format_breakdown(breakdown, weights=None):
+    parts = ", ".join(f"{rule} {units}" for rule, units in breakdown.items() if units)
+    return f"penalty {total_penalty(breakdown, weights)} ({parts or 'no violations'})"
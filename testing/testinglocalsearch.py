@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from artifact import load_artifact, render_csv, save_artifact
+from depart_model import TimetableScheduler
+from export import CsvSink, export_cells
+from instances import generate_instance
+from localsearch import LocalSearchScheduler
+
+# Checks for the local search's incremental penalties and the artifact
+# round trip, on small generated instances (instances.py).
+#   python testing/testinglocalsearch.py
+
+SEEDS = range(5)
+SWAPS = 400
+
+
+def _instance(seed):
+    return generate_instance(seed=seed, years=3, sections=2, teachers=6)
+
+
+def test_swap_deltas_match_full_penalty():
+    for seed in SEEDS:
+        instance = _instance(seed)
+        scheduler = LocalSearchScheduler(instance["candidates"], instance["days"], instance["periods"],
+                                         instance["rows"], seed=seed, initial="random")
+        assert scheduler._setup() is not None
+        running = scheduler.full_penalty()[0]
+        rng = np.random.default_rng(seed)
+        for step in range(SWAPS):
+            y = int(rng.integers(scheduler.grid.shape[0]))
+            movable = np.argwhere(scheduler.grid[y] >= 0)
+            a, b = movable[rng.choice(len(movable), 2, replace=False)]
+            running += scheduler._swap(y, tuple(a), tuple(b))
+            full = scheduler.full_penalty()[0]
+            assert running == full, f"seed {seed}, swap {step}: running {running} != full {full}"
+
+
+def test_artifact_round_trip_renders_like_csv_sink():
+    for seed in SEEDS:
+        instance = _instance(seed)
+        scheduler = TimetableScheduler(instance["candidates"], instance["days"], instance["periods"], instance["rows"])
+        if scheduler.solve() is None:
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            path = save_artifact(scheduler.to_artifact(), os.path.join(tmp, "depart.tta"))
+            loaded = load_artifact(path, mmap=True)
+            assert isinstance(loaded.cells, np.memmap)
+            assert np.array_equal(loaded.cells, scheduler.cells)
+
+            sink = CsvSink(os.path.join(tmp, "sink"), filename=lambda year, section: f"{year.replace(' ', '_')}_final.csv")
+            export_cells(scheduler.iter_cells(), sink)
+            rendered = render_csv(loaded, os.path.join(tmp, "rendered"))
+            assert [os.path.basename(p) for p in rendered] == [os.path.basename(p) for p in sink.paths]
+            for expected, actual in zip(sink.paths, rendered):
+                with open(expected, encoding="utf-8") as a, open(actual, encoding="utf-8") as b:
+                    assert a.read() == b.read(), f"{actual} differs from {expected}"
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} checks passed.")
@@ -0,0 +1,143 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ortools.sat.python import cp_model
+
+import cancellation
+from jobqueue import DONE, FAILED, PENDING, PROCESSING, SUPERSEDED, SQLiteQueue
+from worker import _watch_superseded
+
+# Checks for the job queue and in-flight cancellation; no network needed.
+#   python testing/testingqueue.py
+
+
+def _queue(tmp):
+    return SQLiteQueue(os.path.join(tmp, "jobs.db"))
+
+
+def test_coalescing_keeps_newest():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp)
+        old = [queue.enqueue("depart", {"n": n}, "BCA", "1st Year") for n in range(3)]
+        other_year = queue.enqueue("depart", {}, "BCA", "2nd Year")
+        other_kind = queue.enqueue("lab", {}, "BCA", "1st Year")
+        claimed = {job["id"] for job in queue.claim(limit=5)}
+        assert claimed == {old[-1], other_year, other_kind}, claimed
+        assert [queue.status(job_id) for job_id in old] == [SUPERSEDED, SUPERSEDED, PROCESSING]
+        queue.close()
+
+
+def test_newer_request_supersedes_running_job():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp)
+        running = queue.enqueue("depart", {}, "BCA", "1st Year")
+        assert [job["id"] for job in queue.claim()] == [running]
+        newer = queue.enqueue("depart", {}, "BCA", "1st Year")
+        assert [job["id"] for job in queue.claim()] == [newer]
+        assert queue.status(running) == SUPERSEDED
+        queue.close()
+
+
+def test_debounce_waits_for_quiet_key():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp)
+        job_id = queue.enqueue("depart", {}, "BCA", "1st Year")
+        assert queue.claim(debounce=60) == []
+        assert queue.status(job_id) == PENDING
+        queue.close()
+
+
+def test_finished_status_only_from_processing():
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp)
+        superseded = queue.enqueue("depart", {}, "BCA", "1st Year")
+        queue.claim()
+        newer = queue.enqueue("depart", {}, "BCA", "1st Year")
+        queue.claim()
+        queue.mark_done(superseded, {"ok": True})
+        queue.mark_failed(superseded, "late")
+        assert queue.status(superseded) == SUPERSEDED
+        pending = queue.enqueue("lab", {})
+        queue.mark_done(pending)
+        assert queue.status(pending) == PENDING
+        queue.mark_failed(newer, "no solution")
+        queue.mark_done(newer, {"ok": True})
+        assert queue.status(newer) == FAILED
+        queue.close()
+
+
+class _RecordingSolver:
+    def __init__(self):
+        self.parameters = cp_model.CpSolver().parameters
+        self.stopped = 0
+
+    def StopSearch(self):
+        self.stopped += 1
+
+
+def test_request_stops_registered_solvers():
+    cancellation.reset()
+    solver = _RecordingSolver()
+    with cancellation.stoppable(solver):
+        cancellation.request()
+    assert solver.stopped == 1
+    late = _RecordingSolver()
+    late.parameters.max_time_in_seconds = 30
+    with cancellation.stoppable(late):
+        assert late.parameters.max_time_in_seconds == 0
+    cancellation.reset()
+    assert not cancellation.requested()
+
+
+def _hard_model():
+    model = cp_model.CpModel()
+    xs = [model.NewIntVar(0, 200, f"x{i}") for i in range(80)]
+    model.AddAllDifferent(xs)
+    for a, b in zip(xs, xs[1:]):
+        model.Add(3 * a != b + 1)
+    model.Maximize(sum((i % 7) * x for i, x in enumerate(xs)))
+    return model
+
+
+def test_request_stops_running_cp_sat_solve():
+    cancellation.reset()
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = 60
+    threading.Timer(0.5, cancellation.request).start()
+    start = time.perf_counter()
+    with cancellation.stoppable(solver):
+        solver.Solve(_hard_model())
+    cancellation.reset()
+    assert time.perf_counter() - start < 10
+
+
+def test_watcher_requests_stop_when_superseded():
+    cancellation.reset()
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = _queue(tmp)
+        job_id = queue.enqueue("depart", {}, "BCA", "1st Year")
+        queue.claim()
+        finished = threading.Event()
+        watcher = threading.Thread(target=_watch_superseded, args=(queue.spec(), job_id, finished, 0.05))
+        watcher.start()
+        queue.enqueue("depart", {}, "BCA", "1st Year")
+        queue.claim()
+        watcher.join(timeout=5)
+        finished.set()
+        assert cancellation.requested()
+        assert queue.status(job_id) != DONE
+        queue.close()
+    cancellation.reset()
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_")]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} checks passed.")
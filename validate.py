@@ -0,0 +1,371 @@
+import os
+import re
+
+import numpy as np
+
+from artifact import FINAL_FORMAT, LAB_FORMAT, TimetableArtifact
+from availability import teacher_masks
+from csvio import read_table
+from departments import as_department
+from depart_model import MAX_CONSECUTIVE, MAX_PER_DAY, MAX_TEACHER_LOAD, TimetableScheduler
+from grid import DEFAULT_SECTION, EMPTY, EMPTY_NAME, YEARS, schedule_to_grid
+from lab_model import LabTimetableScheduler
+from registry import NO_TEACHER, NO_TEACHER_NAME, Registry
+
+# ========== TIMETABLE VALIDATOR ==========
+# Checks a produced timetable against the rules the models encode, without
+# trusting whoever produced it (a solver, the greedy pass, general.py's
+# filler, or someone editing a CSV by hand). Everything is turned into an
+# entry-id grid first; each rule is then one vectorized count (bincount /
+# window sums) over the whole grid, and only the cells that break a rule are
+# turned into Violation records.
+#
+#   check_department(scheduler, cells)   every depart_model rule, plus the
+#                                        cell rules and teacher availability
+#   check_lab(scheduler, cells)          every lab_model rule
+#   check_general(year_grids, ...)       general.py's filler: extra subjects
+#                                        placed as requested, once per day
+#
+# validate_department() / validate_lab() / validate_general() take an artifact (from the CSVs,
+# the Firestore documents, or scheduler.to_artifact()) and the request that
+# produced it; read_final_csvs() / from_generaltimetable() /
+# from_labsolution() do the loading.
+#
+#   python validate.py Final_Yearly_Timetables --instance instance.json
+#   python validate.py Final_Yearly_Timetables --firestore
+#   python validate.py --firestore --generaltimetable
+
+# Rule names used in Violation.rule.
+EMPTY_CELL = "empty_cell"
+UNKNOWN = "unknown_entry"
+BLOCKED_CELL = "blocked_cell"
+CELL_RULE = "cell_rule"
+UNAVAILABLE = "teacher_unavailable"
+COUNT = "count"
+PER_DAY = "per_day"
+TEACHER_CLASH = "teacher_clash"
+CONSECUTIVE = "consecutive"
+TEACHER_LOAD = "teacher_load"
+PINNED_EMPTY = "pinned_empty"
+
+_FINAL_CELL = re.compile(r"^(.*) \((.*)\)$")
+
+
+class Violation:
+    __slots__ = ("rule", "row", "day", "period", "detail")
+
+    def __init__(self, rule, row=None, day=None, period=None, detail=""):
+        self.rule = rule
+        self.row = row
+        self.day = day
+        self.period = period
+        self.detail = detail
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        where = ", ".join(str(v) for v in (self.row, self.day, self.period) if v is not None)
+        return f"{self.rule}({where}): {self.detail}" if where else f"{self.rule}: {self.detail}"
+
+
+class ValidationReport:
+    def __init__(self, violations=()):
+        self.violations = list(violations)
+
+    @property
+    def ok(self):
+        return not self.violations
+
+    def by_rule(self):
+        counts = {}
+        for violation in self.violations:
+            counts[violation.rule] = counts.get(violation.rule, 0) + 1
+        return counts
+
+    def summary(self, limit=20):
+        if self.ok:
+            return "Timetable is valid."
+        lines = [f"{len(self.violations)} violation(s): "
+                 + ", ".join(f"{rule} {n}" for rule, n in sorted(self.by_rule().items()))]
+        lines += [f"  {violation!r}" for violation in self.violations[:limit]]
+        if len(self.violations) > limit:
+            lines.append(f"  ... and {len(self.violations) - limit} more")
+        return "\n".join(lines)
+
+
+def _window_sums(busy):
+    """Sums of every 3 consecutive periods along the last axis."""
+    return busy[..., :-2] + busy[..., 1:-1] + busy[..., 2:]
+
+
+# ---------- department ----------
+
+def check_department(scheduler, cells):
+    """
+    Checks a (rows, days, periods) entry-id grid against a depart_model
+    TimetableScheduler's candidates, cell rules and availability.
+    """
+    registry = scheduler.registry
+    days, periods, years = scheduler.days, scheduler.periods, scheduler.years
+    cells = np.asarray(cells)
+    num_rows, num_days, num_periods = cells.shape
+    compiled = scheduler.compiled_rules()
+    masks = teacher_masks(scheduler.availability, registry, num_days, num_periods)
+    teacher_of = registry.teacher_of()
+    violations = []
+
+    def where(y, d, p):
+        return dict(row=years[y], day=days[d], period=periods[p])
+
+    index = np.full(cells.shape, -1, dtype=np.int64)
+    blocked = np.zeros(cells.shape, dtype=bool)
+    for y, year in enumerate(years):
+        entries = scheduler.candidate_entries[year]
+        lookup = np.full(len(registry), -1, dtype=np.int64)
+        entry_ids = np.array([entry_id for entry_id, _ in entries], dtype=np.int64)
+        lookup[entry_ids] = np.arange(len(entries))
+        row = cells[y]
+        index[y] = lookup[row]
+        for (d, p), label in compiled[year].blocked.items():
+            blocked[y, d, p] = True
+            if row[d, p] != registry.entry(year, scheduler.section, label):
+                violations.append(Violation(BLOCKED_CELL, **where(y, d, p),
+                                            detail=f"expected '{label}', found {registry.render_cell(int(row[d, p]))}"))
+        open_cells = ~blocked[y]
+        for d, p in zip(*np.nonzero(open_cells & (row == EMPTY))):
+            violations.append(Violation(EMPTY_CELL, **where(y, d, p), detail="no class placed"))
+        for d, p in zip(*np.nonzero(open_cells & (row != EMPTY) & (index[y] < 0))):
+            violations.append(Violation(UNKNOWN, **where(y, d, p),
+                                        detail=f"{registry.render_cell(int(row[d, p]))} is not a candidate of {year}"))
+        if not len(entries):
+            continue
+
+        placed = index[y] >= 0
+        safe = np.maximum(index[y], 0)
+        rule_ok = np.take_along_axis(compiled[year].allowed, safe[..., None], axis=2)[..., 0]
+        for d, p in zip(*np.nonzero(placed & ~rule_ok)):
+            violations.append(Violation(CELL_RULE, **where(y, d, p),
+                                        detail=f"{registry.render_cell(int(row[d, p]))} not allowed here"))
+        available = masks[teacher_of[row], np.arange(num_days)[:, None], np.arange(num_periods)]
+        for d, p in zip(*np.nonzero(placed & ~available)):
+            violations.append(Violation(UNAVAILABLE, **where(y, d, p),
+                                        detail=f"{registry.teacher_name(int(row[d, p]))} is unavailable"))
+
+        counts = np.bincount(index[y][placed], minlength=len(entries))
+        for k in np.nonzero(counts != [credits for _, credits in entries])[0]:
+            entry_id, credits = entries[k]
+            violations.append(Violation(COUNT, row=year,
+                                        detail=f"{registry.render_cell(entry_id)} placed {counts[k]} of {credits}"))
+        per_day = np.zeros((len(entries), num_days), dtype=np.int64)
+        np.add.at(per_day, (index[y][placed], np.nonzero(placed)[0]), 1)
+        for k, d in zip(*np.nonzero(per_day > MAX_PER_DAY)):
+            violations.append(Violation(PER_DAY, row=year, day=days[d],
+                                        detail=f"{registry.render_cell(entries[k][0])} {per_day[k, d]} times"))
+
+    # Teacher rules couple every row. busy[t, d, p] = classes of teacher t in the slot.
+    teachers = teacher_of[cells]
+    busy = np.zeros((len(registry.teachers), num_days, num_periods), dtype=np.int64)
+    np.add.at(busy, (teachers, np.arange(num_days)[:, None], np.arange(num_periods)), 1)
+    busy[NO_TEACHER] = 0
+    for t, d, p in zip(*np.nonzero(busy > 1)):
+        violations.append(Violation(TEACHER_CLASH, day=days[d], period=periods[p],
+                                    detail=f"{registry.teachers.name(t)} teaches {busy[t, d, p]} classes"))
+    if num_periods >= 3:
+        windows = _window_sums(busy)
+        for t, d, p in zip(*np.nonzero(windows > MAX_CONSECUTIVE)):
+            violations.append(Violation(CONSECUTIVE, day=days[d], period=periods[p],
+                                        detail=f"{registry.teachers.name(t)} has {windows[t, d, p]} of 3 periods"))
+    load = busy.sum(axis=(1, 2))
+    for t in np.nonzero(load > MAX_TEACHER_LOAD)[0]:
+        violations.append(Violation(TEACHER_LOAD, detail=f"{registry.teachers.name(t)} teaches {load[t]} periods"))
+    return ValidationReport(violations)
+
+
+def validate_department(artifact, candidates, availability=None, rules=None, section=DEFAULT_SECTION):
+    """
+    Checks a department artifact against the request that produced it
+    ({row: [(subject, credits, teacher), ...]}, as depart.fetch_candidates).
+    """
+    scheduler = TimetableScheduler(candidates, artifact.days, artifact.periods, artifact.rows,
+                                   registry=artifact.registry, section=section,
+                                   availability=availability, rules=rules)
+    return check_department(scheduler, artifact.cells)
+
+
+# ---------- lab ----------
+
+def check_lab(scheduler, cells):
+    """Checks a (days, periods) lab entry-id grid against a LabTimetableScheduler."""
+    registry = scheduler.registry
+    days, periods = scheduler.days, scheduler.period_labels()
+    cells = np.asarray(cells).reshape(len(days), len(periods))
+    compiled = scheduler.compiled_rules()
+    violations = []
+
+    lookup = np.full(len(registry), -1, dtype=np.int64)
+    lookup[np.array(scheduler.entry_ids, dtype=np.int64)] = np.arange(len(scheduler.entry_ids))
+    index = lookup[cells]
+    for d, p in zip(*np.nonzero((cells != EMPTY) & (index < 0))):
+        violations.append(Violation(UNKNOWN, day=days[d], period=periods[p],
+                                    detail=f"{registry.render_lab_cell(int(cells[d, p]))} was not requested"))
+    for d, p in zip(*np.nonzero(compiled.pinned & (index < 0))):
+        violations.append(Violation(PINNED_EMPTY, day=days[d], period=periods[p], detail="pinned slot left empty"))
+    placed = index >= 0
+    if scheduler.entry_ids:
+        rule_ok = np.take_along_axis(compiled.allowed, np.maximum(index, 0)[..., None], axis=2)[..., 0]
+        for d, p in zip(*np.nonzero(placed & ~rule_ok)):
+            violations.append(Violation(CELL_RULE, day=days[d], period=periods[p],
+                                        detail=f"{registry.render_lab_cell(int(cells[d, p]))} not allowed here"))
+    counts = np.bincount(index[placed], minlength=len(scheduler.entry_ids))
+    for k, entry_id in enumerate(scheduler.entry_ids):
+        if counts[k] != scheduler.required_counts[entry_id]:
+            violations.append(Violation(COUNT, detail=f"{registry.render_lab_cell(entry_id)} placed "
+                                                      f"{counts[k]} of {scheduler.required_counts[entry_id]}"))
+    per_day = np.zeros((len(scheduler.entry_ids), len(days)), dtype=np.int64)
+    np.add.at(per_day, (index[placed], np.nonzero(placed)[0]), 1)
+    for k, d in zip(*np.nonzero(per_day > 1)):
+        violations.append(Violation(PER_DAY, day=days[d],
+                                    detail=f"{registry.render_lab_cell(scheduler.entry_ids[k])} {per_day[k, d]} times"))
+    return ValidationReport(violations)
+
+
+def validate_lab(artifact, classes, rules=None):
+    """Checks a lab artifact against the [[year, subject, required_count], ...] request."""
+    periods = [int(str(label).split()[-1]) for label in artifact.periods]
+    scheduler = LabTimetableScheduler(classes, artifact.days, periods, registry=artifact.registry, rules=rules)
+    return check_lab(scheduler, artifact.cells[0])
+
+
+# ---------- general ----------
+
+def check_general(year_grids, registry, extra_subjects, days, periods, years=YEARS):
+    """
+    Checks general.py's output: (days, periods, years) entry-id grids against
+    /general_request/extra_subject ({year: {subject: count}}). The filler puts
+    each extra subject at most once per day and should place all of them.
+    """
+    violations = []
+    subject_of = registry.subject_of()
+    for y, year in enumerate(years):
+        subjects = subject_of[year_grids[:, :, y]]
+        for subject, requested in (extra_subjects.get(year) or {}).items():
+            if subject not in registry.subjects:
+                placed_days = np.zeros(len(days), dtype=np.int64)
+            else:
+                placed_days = (subjects == registry.subjects.id(subject)).sum(axis=1)
+            if placed_days.sum() != requested:
+                violations.append(Violation(COUNT, row=year, detail=f"{subject} placed {placed_days.sum()} of {requested}"))
+            for d in np.nonzero(placed_days > 1)[0]:
+                violations.append(Violation(PER_DAY, row=year, day=days[d], detail=f"{subject} {placed_days[d]} times"))
+    return ValidationReport(violations)
+
+
+def validate_general(artifact, extra_subjects):
+    """Checks a general-stage artifact (e.g. from_generaltimetable()) against the extra-subject request."""
+    return check_general(artifact.cells.transpose(1, 2, 0), artifact.registry, extra_subjects,
+                         artifact.days, artifact.periods, artifact.rows)
+
+
+# ---------- loading ----------
+
+def parse_final_cell(cell):
+    """'c++ Lab (geetha)' -> ('c++ Lab', 'geetha'); 'No Teacher' -> None."""
+    match = _FINAL_CELL.match(cell.strip())
+    if not match:
+        return cell.strip(), None
+    subject, teacher = match.groups()
+    return subject, (None if teacher in (NO_TEACHER_NAME, "") else teacher)
+
+
+def read_final_csvs(folder, years=YEARS, suffix="_final", registry=None, section=DEFAULT_SECTION):
+    """Final_Yearly_Timetables/<year>_final.csv files -> department TimetableArtifact."""
+    registry = registry or Registry()
+    grids, days, periods = [], None, None
+    for year in years:
+        index, columns, rows = read_table(os.path.join(folder, f"{year.replace(' ', '_')}{suffix}.csv"))
+        days, periods = days or index, periods or columns
+        grids.append([[registry.entry(year, section, *parse_final_cell(cell)) for cell in row] for row in rows])
+    cells = np.array(grids, dtype=np.int32).reshape(len(years), len(days), len(periods))
+    return TimetableArtifact(cells, registry, years, days, periods, cell_format=FINAL_FORMAT)
+
+
+def from_generaltimetable(doc, registry=None, section=DEFAULT_SECTION):
+    """
+    The /2025/generaltimetable layout {year: [{"dayName", "periods": [...]}]}
+    (also artifact.render_firestore's department output) -> TimetableArtifact.
+    """
+    registry = registry or Registry()
+    years = list(doc)
+    days = [day["dayName"] for day in doc[years[0]]] if years else []
+    periods = [period["periodName"] for period in doc[years[0]][0]["periods"]] if days else []
+    cells = np.full((len(years), len(days), len(periods)), EMPTY, dtype=np.int32)
+    for y, year in enumerate(years):
+        for d, day in enumerate(doc[year]):
+            for p, period in enumerate(day["periods"]):
+                subject = period.get("subject") or EMPTY_NAME
+                cells[y, d, p] = registry.entry(year, section, subject, period.get("teacher") or None)
+    return TimetableArtifact(cells, registry, years, days, periods, cell_format=FINAL_FORMAT)
+
+
+def from_labsolution(schedule_data, registry=None):
+    """The /2025/labsolutionBCA {day: {period: cell}} documents -> lab TimetableArtifact."""
+    registry = registry or Registry()
+    grid, days, periods = schedule_to_grid(schedule_data, registry)
+    return TimetableArtifact(grid[None], registry, ["Lab"], days, periods, cell_format=LAB_FORMAT)
+
+
+def fetch_generaltimetable(db, department=None):
+    doc = db.document(as_department(department).general_timetable_path).get()
+    return doc.to_dict() if doc.exists else {}
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Validate produced timetables against their request.")
+    parser.add_argument("folder", nargs="?", default="Final_Yearly_Timetables",
+                        help="Final_Yearly_Timetables directory (ignored with --generaltimetable)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--instance", help="instances.py JSON with the candidates")
+    source.add_argument("--firestore", action="store_true", help="read the request (and availability) from Firestore")
+    parser.add_argument("--generaltimetable", action="store_true",
+                        help="check the /2025/generaltimetable document against the extra subjects "
+                             "instead of the CSVs (needs --firestore)")
+    parser.add_argument("--department", help="department whose Firestore paths to read (default BCA)")
+    parser.add_argument("--academic-year")
+    parser.add_argument("--limit", type=int, default=20, help="violations to print")
+    args = parser.parse_args()
+    if args.generaltimetable and not args.firestore:
+        parser.error("--generaltimetable needs --firestore")
+
+    if args.instance:
+        from instances import load_instance
+
+        instance = load_instance(args.instance)
+        artifact = read_final_csvs(args.folder, instance["rows"])
+        report = validate_department(artifact, instance["candidates"])
+    else:
+        from firebase_db import get_db
+
+        db = get_db()
+        department = as_department(args.department, args.academic_year)
+        if args.generaltimetable:
+            from general import fetch_extra_subjects
+
+            report = validate_general(from_generaltimetable(fetch_generaltimetable(db, department)),
+                                      fetch_extra_subjects(db, department))
+        else:
+            from availability import fetch_availability
+            from depart import fetch_candidates
+
+            artifact = read_final_csvs(args.folder)
+            availability = fetch_availability(db, artifact.days, artifact.periods)
+            report = validate_department(artifact, fetch_candidates(db, department), availability=availability)
+    print(report.summary(args.limit))
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import numpy as np
+
+from grid import DEFAULT_SECTION, EMPTY
+from publish import PublishStats, delete_document, publish_document
+from registry import NO_TEACHER
+from shards import publish_many
+
+# ========== MATERIALIZED TEACHER / LAB-ROOM VIEWS ==========
+# Timetables are stored per year, so a teacher's week means scanning every
+# year and parsing "subject (teacher)" strings. The publish stage instead
+# builds an inverted index teacher -> (row, day, period, entry) in one
+# vectorized pass over the solved id grid and writes one document per
+# teacher (and one per lab room from the lab solution):
+#
+#   <base>/teachers/<teacher>  {"teacher": "geetha", "load": 14,
+#                               "days": [...], "periods": [...],
+#                               "Day 1": [{"periodName", "year", "section", "subject"}, ...], ...}
+#   <base>/labs/<room>         {"room": "Lab", "days": [...], "periods": [...],
+#                               "Day 1": [{"periodName", "year", "subject"}, ...], ...}
+#   <base>/meta/index          {"teachers": {doc id: name}, "labs": {doc id: room}}
+#
+# Each view is a single read; free periods have empty year/subject. Views
+# go through publish_many(), so a re-run only rewrites the days that changed.
+# The published teachers (or lab rooms) are the whole set: views of teachers
+# missing from the new solution are deleted and dropped from the index.
+
+BASE = "2025/views"
+TEACHERS = "teachers"
+LABS = "labs"
+INDEX_PATH = "meta/index"
+
+
+def doc_id(name):
+    """Firestore-safe document id for a teacher or room name."""
+    return str(name).replace("/", "_").strip() or "_"
+
+
+def teacher_index(cells, registry):
+    """
+    Inverted index of a (rows, days, periods) entry-id grid:
+    {teacher id: (rows, days, periods, entry ids)} as parallel arrays, sorted
+    by row, day, period. Cells without a teacher are left out.
+    """
+    cells = np.asarray(cells)
+    teachers = registry.teacher_of()[cells]
+    r, d, p = np.nonzero(teachers != NO_TEACHER)
+    owner = teachers[r, d, p]
+    order = np.argsort(owner, kind="stable")
+    owner, r, d, p = owner[order], r[order], d[order], p[order]
+    ids, starts = np.unique(owner, return_index=True)
+    bounds = list(starts[1:]) + [len(owner)]
+    return {
+        int(t): (r[a:b], d[a:b], p[a:b], cells[r[a:b], d[a:b], p[a:b]])
+        for t, a, b in zip(ids, starts, bounds)
+    }
+
+
+def _empty_days(days, periods, keys):
+    return {day: [dict({"periodName": period}, **{key: "" for key in keys}) for period in periods] for day in days}
+
+
+def teacher_views(artifact):
+    """{teacher name: view payload} for a department artifact (rows = years)."""
+    registry, days, periods = artifact.registry, artifact.days, artifact.periods
+    views = {}
+    for teacher, (rows, ds, ps, eids) in teacher_index(artifact.cells, registry).items():
+        name = registry.teachers.name(teacher)
+        grid = _empty_days(days, periods, ("year", "section", "subject"))
+        for r, d, p, eid in zip(rows.tolist(), ds.tolist(), ps.tolist(), eids.tolist()):
+            section = registry.sections.name(registry.entries[eid][1]) or DEFAULT_SECTION
+            grid[days[d]][p].update(year=artifact.rows[r], section=section, subject=registry.subject_name(eid))
+        views[name] = dict({"teacher": name, "load": len(rows), "days": days, "periods": periods}, **grid)
+    return views
+
+
+def lab_views(artifact):
+    """{room: view payload} for a lab artifact (rows = lab rooms)."""
+    registry, days, periods = artifact.registry, artifact.days, artifact.periods
+    views = {}
+    for r, room in enumerate(artifact.rows):
+        grid = _empty_days(days, periods, ("year", "subject"))
+        cells = np.asarray(artifact.cells[r])
+        for d, p in zip(*np.nonzero(cells != EMPTY)):
+            eid = int(cells[d, p])
+            grid[days[d]][p].update(year=registry.year_name(eid) or "", subject=registry.subject_name(eid))
+        views[room] = dict({"room": room, "days": days, "periods": periods}, **grid)
+    return views
+
+
+def read_index(db, base=BASE):
+    """{"teachers": {doc id: name}, "labs": {doc id: room}} as last published."""
+    doc = db.document(f"{base}/{INDEX_PATH}").get()
+    return doc.to_dict() if doc.exists else {}
+
+
+def publish_views(db, teacher_artifact=None, lab_artifact=None, base=BASE, manifest=None, max_workers=8):
+    """
+    Writes the teacher and/or lab-room views and replaces their index
+    entries; views of the same kind missing from the new solution are
+    deleted. The other kind's index entries are kept. Returns PublishStats.
+    """
+    published = {}
+    if teacher_artifact is not None:
+        published[TEACHERS] = teacher_views(teacher_artifact)
+    if lab_artifact is not None:
+        published[LABS] = lab_views(lab_artifact)
+    if not published:
+        return PublishStats()
+    index = read_index(db, base)
+    documents, stale = {}, []
+    for kind, views in published.items():
+        entries = {doc_id(name): name for name in views}
+        documents.update({f"{base}/{kind}/{view}": views[name] for view, name in entries.items()})
+        stale += [f"{base}/{kind}/{view}" for view in sorted(set(index.get(kind) or {}) - set(entries))]
+        index[kind] = entries
+    _, stats = publish_many(db, documents, manifest, max_workers)
+    # Index first, so a reader following it never meets a deleted view.
+    publish_document(db, f"{base}/{INDEX_PATH}", index, manifest, stats)
+    for path in stale:
+        delete_document(db, path, manifest, stats)
+    return stats
+
+
+def read_teacher_view(db, teacher, base=BASE):
+    doc = db.document(f"{base}/{TEACHERS}/{doc_id(teacher)}").get()
+    return doc.to_dict() if doc.exists else None
+
+
+def read_lab_view(db, room, base=BASE):
+    doc = db.document(f"{base}/{LABS}/{doc_id(room)}").get()
+    return doc.to_dict() if doc.exists else None
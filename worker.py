@@ -0,0 +1,305 @@
+import argparse
+import json
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cancellation
+import instrument
+from jobqueue import SUPERSEDED, FirestoreQueue, SQLiteQueue, open_queue_spec
+
+# ========== LONG-RUNNING SCHEDULING WORKER ==========
+# Replaces the per-request Cloud Run call in functions/index.js: the worker
+# pulls pending requests from a queue and runs them on a process pool whose
+# processes import ortools/NumPy (and, for Firestore jobs, initialize
+# Firebase) once, at start-up. Each request then only pays for its solve.
+#
+# Job kinds:
+#   lab, general, depart   - run that stage against Firestore (lab.run() etc.)
+#   pipeline               - lab -> general -> depart
+#   lab_solve              - payload {"classes": [[year, subject, count], ...]}
+#   depart_solve           - payload {"candidates": {year: [[subject, credits, teacher], ...]},
+#                            optional "availability" in the availability.py stored form,
+#                            "engine" and "time_limit"; engine "soft" results also carry
+#                            "level", "relaxed" and "breakdown" (soft.py)}
+# Both *_solve kinds take an optional "rules" list (cellrules.py); without it
+# cell_rules.json applies. The four Firestore kinds take optional
+# "department" / "academic_year" payload keys (departments.py); without them
+# the BCA 2025 paths are used.
+# The *_solve kinds need no network and return the solution in the result.
+#
+# Bursts of requests for the same (kind, department, year) are coalesced by
+# the queue (see jobqueue.plan_claims). Superseded jobs that have not started
+# are cancelled. A job already solving is stopped too: while it runs, its pool
+# process polls the queue every CANCEL_POLL seconds and, once the job is
+# superseded, stops the solver (cancellation.py), so the stage ends without a
+# timetable. The stages also check `should_publish` right before writing
+# anything, so a job superseded after its solve still publishes nothing.
+
+CANCEL_POLL = 1.0  # seconds between superseded checks of a running job
+
+_warm = {}
+
+
+def warm_up(init_firebase=False):
+    """Pool initializer: pay the heavy imports once per process."""
+    from ortools.sat.python import cp_model  # noqa: F401
+    import numpy  # noqa: F401
+    import depart_model  # noqa: F401
+    import greedy  # noqa: F401
+    import localsearch  # noqa: F401
+    import lab_model  # noqa: F401
+
+    if init_firebase:
+        from firebase_db import get_db
+
+        _warm["db"] = get_db()
+
+
+def _db():
+    if "db" not in _warm:
+        from firebase_db import get_db
+
+        _warm["db"] = get_db()
+    return _warm["db"]
+
+
+def _run_stage(name, should_publish=None, payload=None):
+    import importlib
+
+    from departments import as_department
+
+    payload = payload or {}
+    department = as_department(payload.get("department"), payload.get("academic_year"))
+    result = importlib.import_module(name).run(_db(), should_publish=should_publish, department=department)
+    return {"stage": name, "ok": result is not None}
+
+
+def _lab_solve(payload, should_publish=None):
+    from greedy import solve_lab_fast
+    from lab_model import LabTimetableScheduler
+
+    scheduler = LabTimetableScheduler(payload["classes"], rules=payload.get("rules"))
+    solution = solve_lab_fast(scheduler)
+    return {"ok": solution is not None, "solution": solution, "engine": scheduler.engine}
+
+
+def _depart_solve(payload, should_publish=None):
+    from availability import parse_availability
+    from greedy import SOFT, solve_department_fast
+    from grid import DAYS, PERIODS
+    from localsearch import department_scheduler
+
+    candidates = {year: [tuple(c) for c in rows] for year, rows in payload["candidates"].items()}
+    options = ("days", "periods", "years", "rules", "engine", "time_limit")
+    kwargs = {key: payload[key] for key in options if key in payload}
+    if payload.get("availability"):
+        kwargs["availability"] = parse_availability(
+            payload["availability"], kwargs.get("days", DAYS), kwargs.get("periods", PERIODS)
+        )
+    scheduler = department_scheduler(candidates, **kwargs)
+    solution = solve_department_fast(scheduler)
+    result = {"ok": solution is not None, "solution": solution, "engine": scheduler.engine}
+    if scheduler.engine == SOFT:
+        result.update(level=scheduler.level, relaxed=list(scheduler.relaxed), breakdown=scheduler.breakdown)
+    return result
+
+
+def _pipeline(payload, should_publish=None):
+    results = []
+    for stage in ("lab", "general", "depart"):
+        results.append(_run_stage(stage, should_publish, payload))
+        if not results[-1]["ok"]:
+            break
+    return {"ok": all(r["ok"] for r in results), "stages": results}
+
+
+HANDLERS = {
+    "lab": lambda payload, should_publish=None: _run_stage("lab", should_publish, payload),
+    "general": lambda payload, should_publish=None: _run_stage("general", should_publish, payload),
+    "depart": lambda payload, should_publish=None: _run_stage("depart", should_publish, payload),
+    "pipeline": _pipeline,
+    "lab_solve": _lab_solve,
+    "depart_solve": _depart_solve,
+}
+
+
+def _publish_guard(queue_spec, job_id):
+    """Returns a callable that is False once `job_id` has been superseded."""
+    if queue_spec is None:
+        return None
+
+    def should_publish():
+        queues = _warm.setdefault("queues", {})
+        if queue_spec not in queues:
+            queues[queue_spec] = open_queue_spec(queue_spec)
+        return queues[queue_spec].status(job_id) != SUPERSEDED
+
+    return should_publish
+
+
+def _watch_superseded(queue_spec, job_id, finished, interval=CANCEL_POLL):
+    """Watcher thread: stops this process's solves once `job_id` is superseded."""
+    queue = open_queue_spec(queue_spec)  # own handle: SQLite connections stay in their thread
+    try:
+        while not finished.wait(interval):
+            if queue.status(job_id) == SUPERSEDED:
+                cancellation.request()
+                return
+    finally:
+        if hasattr(queue, "close"):
+            queue.close()
+
+
+def run_job(kind, payload, queue_spec=None, job_id=None):
+    """Executes one job inside a pool process. Returns a JSON-serializable result."""
+    handler = HANDLERS.get(kind)
+    if handler is None:
+        raise ValueError(f"Unknown job kind: {kind!r}")
+    cancellation.reset()
+    finished = threading.Event()
+    watcher = None
+    if queue_spec is not None:
+        watcher = threading.Thread(target=_watch_superseded, args=(queue_spec, job_id, finished), daemon=True)
+        watcher.start()
+    try:
+        with instrument.span(kind, job=job_id):
+            return handler(payload, should_publish=_publish_guard(queue_spec, job_id))
+    finally:
+        finished.set()
+        if watcher is not None:
+            watcher.join()
+        cancellation.reset()
+
+
+class Worker:
+    """
+    Pulls jobs from `queue` and keeps up to `max_workers` of them running on
+    a warm process pool, writing processing/done/failed back to the queue.
+    """
+
+    def __init__(self, queue, max_workers=2, poll_interval=1.0, init_firebase=False, debounce=0.0):
+        self.queue = queue
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, initializer=warm_up, initargs=(init_firebase,))
+        self.running = {}
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def submit(self, job):
+        future = self.pool.submit(run_job, job["kind"], job["payload"], self.queue.spec(), job["id"])
+        self.running[future] = job
+        print(f"▶ job {job['id']} ({job['kind']}) processing")
+        return future
+
+    def finish(self, future):
+        job = self.running.pop(future)
+        if self.queue.status(job["id"]) == SUPERSEDED:
+            print(f"⏭ job {job['id']} ({job['kind']}) superseded; result discarded")
+            return False
+        try:
+            result = future.result()
+        except Exception as e:
+            self.queue.mark_failed(job["id"], "".join(traceback.format_exception_only(type(e), e)).strip())
+            print(f"❌ job {job['id']} ({job['kind']}) failed: {e}")
+            return False
+        if result.get("ok"):
+            self.queue.mark_done(job["id"], result)
+            print(f"✅ job {job['id']} ({job['kind']}) done")
+        else:
+            self.queue.mark_failed(job["id"], "No solution found.")
+            print(f"❌ job {job['id']} ({job['kind']}) failed: no solution")
+        return True
+
+    def cancel_superseded(self):
+        """
+        Drops superseded jobs that have not started running yet. Running ones
+        stop their own solves (see run_job) and are discarded by finish().
+        """
+        for future, job in list(self.running.items()):
+            if self.queue.status(job["id"]) == SUPERSEDED and future.cancel():
+                self.running.pop(future)
+                print(f"⏭ job {job['id']} ({job['kind']}) superseded before it started")
+
+    def step(self, timeout=None):
+        """Claims jobs into free pool slots and records whatever finishes within `timeout`."""
+        for job in self.queue.claim(self.max_workers - len(self.running), self.debounce):
+            self.submit(job)
+        self.cancel_superseded()
+        if not self.running:
+            return 0
+        done, _ = wait(list(self.running), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            self.finish(future)
+        return len(done)
+
+    def drain(self):
+        """Runs until the queue has no pending jobs and nothing is running. Returns jobs finished."""
+        processed = 0
+        while True:
+            processed += self.step(timeout=self.poll_interval)
+            if not self.running:
+                jobs = self.queue.claim(self.max_workers, self.debounce)
+                if not jobs:
+                    if self._waiting_on_debounce():
+                        time.sleep(self.poll_interval)
+                        continue
+                    return processed
+                for job in jobs:
+                    self.submit(job)
+
+    def _waiting_on_debounce(self):
+        return self.debounce > 0 and self.queue.has_pending()
+
+    def serve(self):
+        """Polls forever."""
+        while True:
+            if self.step(timeout=self.poll_interval) == 0 and not self.running:
+                time.sleep(self.poll_interval)
+
+
+def open_queue(kind, path):
+    if kind == "sqlite":
+        return SQLiteQueue(path)
+    from firebase_db import get_db
+
+    return FirestoreQueue(get_db())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduling worker: runs queued timetable requests on a warm process pool.")
+    parser.add_argument("--queue", choices=["sqlite", "firestore"], default="sqlite")
+    parser.add_argument("--db", default="jobs.db", help="SQLite queue file (sqlite queue only)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds between queue polls")
+    parser.add_argument("--debounce", type=float, default=2.0,
+                        help="seconds a department/year must be quiet before its newest request is solved")
+    parser.add_argument("--once", action="store_true", help="drain the queue and exit")
+    parser.add_argument("--enqueue", metavar="KIND", help="add a job of this kind and exit")
+    parser.add_argument("--payload", default="{}", help="JSON payload for --enqueue")
+    parser.add_argument("--department")
+    parser.add_argument("--year")
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue, args.db)
+    if args.enqueue:
+        job_id = queue.enqueue(args.enqueue, json.loads(args.payload), args.department, args.year)
+        print(f"Queued job {job_id} ({args.enqueue}).")
+        return
+
+    worker = Worker(queue, args.workers, args.poll, init_firebase=args.queue == "firestore", debounce=args.debounce)
+    try:
+        if args.once:
+            print(f"Processed {worker.drain()} job(s).")
+        else:
+            worker.serve()
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()